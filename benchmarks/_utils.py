@@ -0,0 +1,72 @@
+from collections.abc import Callable, Coroutine
+from datetime import datetime, timezone
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Any
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """Drives a coroutine that never suspends without an event loop, so the
+    loop overhead does not end up in the measurement."""
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("coroutine suspended")
+
+
+def ns_per_op(fn: Callable[[], Any], number: int = 200_000, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+
+def allocated_bytes(fn: Callable[[], Any]) -> tuple[Any, int]:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def print_table(rows: list[dict[str, Any]]) -> None:
+    columns = list(rows[0])
+    widths = [max(len(str(c)), *(len(str(r[c])) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+def percentiles(samples: list[float], *points: float) -> list[float]:
+    ordered = sorted(samples)
+    return [ordered[min(len(ordered) - 1, int(p * len(ordered)))] for p in points]
+
+
+def environment() -> dict[str, Any]:
+    """What a result depends on besides the code, stored next to it."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
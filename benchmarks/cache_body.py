@@ -0,0 +1,87 @@
+"""Requests per second served from the cache, with and without `cache_body`.
+
+Both routes use a constant ETag so that only the cost of encoding is compared.
+
+Run with `python -m benchmarks.cache_body`.
+"""
+
+import asyncio
+import time
+
+from fastapi import FastAPI
+import httpx
+
+from benchmarks._utils import print_table
+from ultra_cache.decorator import UltraCache
+from ultra_cache.storage.inmemory import InMemoryStorage
+
+
+def _payload(items: int) -> dict:
+    return {
+        "items": [
+            {"id": i, "name": f"item {i}", "price": i * 1.25, "tags": ["new", "sale"]}
+            for i in range(items)
+        ],
+        "total": items,
+    }
+
+
+def _etag(value) -> str:
+    return '"v1"'
+
+
+def _app(items: int) -> FastAPI:
+    app = FastAPI()
+    cache = UltraCache(storage=InMemoryStorage())
+    payload = _payload(items)
+
+    @app.get("/object")
+    @cache(hash_fn=_etag)
+    async def read_object():
+        return payload
+
+    @app.get("/body")
+    @cache(cache_body=True, hash_fn=_etag)
+    async def read_body():
+        return payload
+
+    return app
+
+
+async def _requests_per_second(
+    client: httpx.AsyncClient, path: str, seconds: float
+) -> float:
+    await client.get(path)  # fills the cache
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        for _ in range(10):
+            response = await client.get(path)
+            assert response.headers["X-Cache"] == "HIT"
+        count += 10
+    return count / elapsed
+
+
+async def main(seconds: float = 2.0) -> None:
+    rows = []
+    for items in [10, 100, 1000]:
+        transport = httpx.ASGITransport(app=_app(items))
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            cached_object = await _requests_per_second(client, "/object", seconds)
+            cached_body = await _requests_per_second(client, "/body", seconds)
+        rows.append(
+            {
+                "items": items,
+                "object (req/s)": round(cached_object),
+                "cache_body (req/s)": round(cached_body),
+                "speedup": round(cached_body / cached_object, 2),
+            }
+        )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""Cost of building a key, md5 over the repr vs canonical structural hashing.
+
+Run with `python -m benchmarks.cache_key`.
+"""
+
+from pydantic import BaseModel
+
+from benchmarks._utils import ns_per_op, print_table
+from ultra_cache.build_cache_key import CanonicalBuildCacheKey, DefaultBuildCacheKey
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    tags: list[str]
+
+
+class Body(BaseModel):
+    items: list[Item]
+    filters: dict[str, str]
+
+
+def read_item(item_id: int, q: str = ""):
+    pass
+
+
+def search(body: Body, page: int = 1):
+    pass
+
+
+def main() -> None:
+    body = Body(
+        items=[Item(id=i, name=f"item {i}", tags=["a", "b"]) for i in range(200)],
+        filters={"color": "red", "size": "xl"},
+    )
+    cases = [
+        ("scalar kwargs", read_item, (), {"item_id": 1, "q": "shoes"}),
+        ("pydantic body (200 items)", search, (), {"body": body, "page": 2}),
+    ]
+    builders = [DefaultBuildCacheKey(), CanonicalBuildCacheKey()]
+
+    rows = []
+    for name, func, args, kwargs in cases:
+        row = {"arguments": name}
+        for builder in builders:
+            row[f"{type(builder).__name__} (us)"] = round(
+                ns_per_op(lambda: builder(func, args, kwargs), 2000) / 1000, 2
+            )
+        rows.append(row)
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
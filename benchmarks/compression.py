@@ -0,0 +1,70 @@
+"""Compression ratio and CPU time added per hit for large JSON responses.
+
+Run with `python -m benchmarks.compression`.
+"""
+
+from benchmarks._utils import ns_per_op, print_table
+from ultra_cache.compression import (
+    Compression,
+    Compressor,
+    GzipCompressor,
+    Lz4Compressor,
+    ZstdCompressor,
+)
+from ultra_cache.serializers import JsonSerializer
+
+
+def _payload(items: int) -> bytes:
+    return JsonSerializer().dumps(
+        {
+            "items": [
+                {
+                    "id": i,
+                    "name": f"item {i}",
+                    "description": "a typical product description " * 3,
+                    "price": i * 1.25,
+                    "tags": ["new", "sale"] if i % 2 else ["featured"],
+                }
+                for i in range(items)
+            ],
+            "total": items,
+        }
+    )
+
+
+def _compressors() -> list[Compressor]:
+    compressors: list[Compressor] = [GzipCompressor(level=1), GzipCompressor()]
+    for compressor_cls in [ZstdCompressor, Lz4Compressor]:
+        try:
+            compressors.append(compressor_cls())
+        except ImportError:
+            pass
+    return compressors
+
+
+def main() -> None:
+    rows = []
+    for items in [1000, 10_000]:
+        payload = _payload(items)
+        for compressor in _compressors():
+            compression = Compression(compressor, threshold=0)
+            data = compression.compress(payload)
+            rows.append(
+                {
+                    "payload (KB)": len(payload) // 1024,
+                    "compressor": f"{type(compressor).__name__}({compressor.level})",
+                    "ratio": round(len(data) / len(payload), 3),
+                    "compress (us)": round(
+                        ns_per_op(lambda: compression.compress(payload), 20, 3) / 1000
+                    ),
+                    "decompress per hit (us)": round(
+                        ns_per_op(lambda: compression.decompress(data), 20, 3) / 1000
+                    ),
+                }
+            )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
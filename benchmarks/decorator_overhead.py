@@ -0,0 +1,71 @@
+"""Per-request overhead of the decorator itself, over calling the endpoint.
+
+Calls go straight to the decorated function, without FastAPI, and hit an
+`InMemoryStorage`, so nothing but the wrapper is measured.
+
+Run with `python -m benchmarks.decorator_overhead`.
+"""
+
+from fastapi import Request, Response
+
+from benchmarks._utils import ns_per_op, print_table, run_sync
+from ultra_cache.decorator import UltraCache
+from ultra_cache.storage.inmemory import InMemoryStorage
+
+
+def _request(headers: list[tuple[bytes, bytes]]) -> Request:
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+async def read_item(item_id: int, q: str = ""):
+    return {"id": item_id, "q": q}
+
+
+def main() -> None:
+    cached_read_item = UltraCache(storage=InMemoryStorage())(ttl=60)(read_item)
+
+    cases = [
+        ("no headers", []),
+        ("cache-control", [(b"cache-control", b"max-age=30")]),
+        ("if-none-match", [(b"if-none-match", b'"other"')]),
+        # what a browser typically sends along
+        ("10 other headers", [(f"x-header-{i}".encode(), b"value") for i in range(10)]),
+    ]
+    rows = []
+    for name, headers in cases:
+        # FastAPI builds both per request either way, so does the baseline
+        direct = ns_per_op(
+            lambda: (
+                _request(headers),
+                Response(),
+                run_sync(read_item(1, q="shoes")),
+            ),
+            number=50_000,
+        )
+        run_sync(
+            cached_read_item(
+                1, q="shoes", request=_request(headers), response=Response()
+            )
+        )
+        cached = ns_per_op(
+            lambda: run_sync(
+                cached_read_item(
+                    1, q="shoes", request=_request(headers), response=Response()
+                )
+            ),
+            number=50_000,
+        )
+        rows.append(
+            {
+                "headers": name,
+                "direct (ns)": round(direct),
+                "cache hit (ns)": round(cached),
+                "overhead (ns)": round(cached - direct),
+            }
+        )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
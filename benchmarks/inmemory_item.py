@@ -0,0 +1,87 @@
+"""Hit path cost and memory per entry of InMemoryStorage.
+
+Compares the current storage with the previous datetime based item, copied
+below. Run with `python -m benchmarks.inmemory_item`.
+"""
+
+from datetime import timedelta
+from typing import Union
+
+from benchmarks._utils import allocated_bytes, ns_per_op, print_table, run_sync
+from ultra_cache.storage.inmemory import InMemoryStorage, InMemoryStorageItem
+from ultra_cache.utils import utc_now
+
+ENTRIES = 100_000
+
+
+class LegacyInMemoryStorageItem:
+    def __init__(self, data, ttl: Union[int, float, None] = None) -> None:
+        self._data = data
+        self._ttl = ttl
+        self._start = utc_now()
+
+    @property
+    def expired(self) -> bool:
+        if self._ttl is None:
+            return False
+
+        return (utc_now() - self._start) > timedelta(seconds=self._ttl)
+
+    @property
+    def value(self):
+        if self.expired:
+            return None
+
+        return self._data
+
+
+class LegacyInMemoryStorage:
+    def __init__(self) -> None:
+        self.storage = {}
+
+    async def save(self, key, value, ttl=None) -> None:
+        self.storage[key] = LegacyInMemoryStorageItem(value, ttl)
+
+    async def get(self, key):
+        item = self.storage.get(key, None)
+
+        if item is None:
+            return None
+
+        return item.value
+
+
+def _bytes_per_item(item_cls: type) -> float:
+    items, size = allocated_bytes(lambda: [item_cls(None, 60) for _ in range(ENTRIES)])
+    return size / len(items)
+
+
+def main() -> None:
+    rows = []
+    for name, storage, item_cls in [
+        ("before", LegacyInMemoryStorage(), LegacyInMemoryStorageItem),
+        ("after", InMemoryStorage(), InMemoryStorageItem),
+    ]:
+        run_sync(storage.save("key", {"id": 1}, ttl=60))
+        run_sync(storage.save("forever", {"id": 1}))
+        rows.append(
+            {
+                "storage": name,
+                "get ttl (ns/op)": round(
+                    ns_per_op(lambda: run_sync(storage.get("key")))
+                ),
+                "get no ttl (ns/op)": round(
+                    ns_per_op(lambda: run_sync(storage.get("forever")))
+                ),
+                "get miss (ns/op)": round(
+                    ns_per_op(lambda: run_sync(storage.get("missing")))
+                ),
+                "item (bytes)": round(_bytes_per_item(item_cls)),
+            }
+        )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Encode/decode cost and payload size of the built-in serializers.
+
+Run with `python -m benchmarks.serializers`.
+"""
+
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from benchmarks._utils import ns_per_op, print_table
+from ultra_cache.serializers import (
+    JsonSerializer,
+    MsgpackSerializer,
+    PickleSerializer,
+    PydanticSerializer,
+    Serializer,
+)
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    price: float
+    tags: list[str]
+    created_at: datetime
+
+
+class Page(BaseModel):
+    items: list[Item]
+    total: int
+
+
+def _page(size: int) -> Page:
+    return Page(
+        items=[
+            Item(
+                id=i,
+                name=f"item {i}",
+                price=i * 1.5,
+                tags=["a", "b", "c"],
+                created_at=datetime(2024, 1, 1),
+            )
+            for i in range(size)
+        ],
+        total=size,
+    )
+
+
+def _serializers() -> dict[str, Serializer]:
+    serializers: dict[str, Serializer] = {
+        "json (orjson)": JsonSerializer(),
+        "json (stdlib)": JsonSerializer(use_orjson=False),
+        "pickle": PickleSerializer(),
+        "pydantic": PydanticSerializer(Page),
+    }
+    try:
+        serializers["msgpack"] = MsgpackSerializer()
+    except ImportError:
+        pass
+    return serializers
+
+
+def main() -> None:
+    rows = []
+    for size in [1, 100, 1000]:
+        model = _page(size)
+        payloads = {"dict": model.model_dump(mode="json"), "model": model}
+        number = max(10, 20_000 // size)
+
+        for name, serializer in _serializers().items():
+            for kind, value in payloads.items():
+                if name == "pydantic" and kind == "dict":
+                    continue
+                data = serializer.dumps(value)
+                rows.append(
+                    {
+                        "items": size,
+                        "serializer": name,
+                        "value": kind,
+                        "encode (us)": round(
+                            ns_per_op(lambda: serializer.dumps(value), number) / 1000, 2
+                        ),
+                        "decode (us)": round(
+                            ns_per_op(lambda: serializer.loads(data), number) / 1000, 2
+                        ),
+                        "size (bytes)": len(data),
+                    }
+                )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
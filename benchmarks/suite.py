@@ -0,0 +1,244 @@
+"""Benchmarks of the hot paths, written out as JSON so runs can be compared.
+
+- hit and miss latency of a cached FastAPI route, over httpx's ASGITransport
+- `DefaultBuildCacheKey` by argument size
+- `_default_hash_fn` by payload size
+- storage throughput by number of concurrent tasks, against fakeredis unless
+  `--redis-url` points to a server
+
+Run with `python -m benchmarks.suite --output results.json`, and compare to an
+earlier run with `--compare baseline.json`. `--quick` shortens every case.
+"""
+
+import argparse
+import asyncio
+from collections.abc import Callable
+import json
+import time
+from typing import Any, Union
+
+from fakeredis import FakeAsyncRedis
+from fastapi import FastAPI
+import httpx
+from redis.asyncio import Redis
+
+from benchmarks._utils import environment, ns_per_op, percentiles, print_table
+from ultra_cache.build_cache_key import DefaultBuildCacheKey
+from ultra_cache.decorator import UltraCache, _default_hash_fn
+from ultra_cache.storage.base import BaseStorage
+from ultra_cache.storage.inmemory import InMemoryStorage
+from ultra_cache.storage.redis import RedisStorage
+
+Results = list[dict[str, Any]]
+
+
+def _payload(items: int) -> dict:
+    return {
+        "items": [
+            {"id": i, "name": f"item {i}", "price": i * 1.25, "tags": ["new", "sale"]}
+            for i in range(items)
+        ],
+        "total": items,
+    }
+
+
+def _app(items: int) -> FastAPI:
+    app = FastAPI()
+    cache = UltraCache(storage=InMemoryStorage())
+    payload = _payload(items)
+
+    @app.get("/items/{item_id}")
+    @cache(ttl=600)
+    async def read_items(item_id: int):
+        return payload
+
+    return app
+
+
+async def _latencies(
+    client: httpx.AsyncClient, paths: list[str], expected: str
+) -> list[float]:
+    samples = []
+    for path in paths:
+        start = time.perf_counter()
+        response = await client.get(path)
+        samples.append(time.perf_counter() - start)
+        assert response.headers["X-Cache"] == expected
+    return samples
+
+
+async def bench_endpoint(requests: int) -> Results:
+    results = []
+    for items in [1, 100, 1000]:
+        transport = httpx.ASGITransport(app=_app(items))
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            # every request of a new id misses, then each of them hits
+            paths = [f"/items/{i}" for i in range(requests)]
+            misses = await _latencies(client, paths, "MISS")
+            hits = await _latencies(client, paths, "HIT")
+
+        for outcome, samples in [("miss", misses), ("hit", hits)]:
+            p50, p99 = percentiles(samples, 0.5, 0.99)
+            results.append(
+                {
+                    "name": f"endpoint {outcome}",
+                    "param": f"{items} items",
+                    "p50_us": round(p50 * 1e6, 1),
+                    "p99_us": round(p99 * 1e6, 1),
+                    "mean_us": round(sum(samples) / len(samples) * 1e6, 1),
+                }
+            )
+    return results
+
+
+def _read_items(item_ids: list[int], q: str):
+    pass
+
+
+def bench_build_cache_key(number: int) -> Results:
+    build_cache_key = DefaultBuildCacheKey()
+    results = []
+    for size in [1, 100, 10_000]:
+        kwargs = {"item_ids": list(range(size)), "q": "shoes"}
+        ns = ns_per_op(
+            lambda: build_cache_key(_read_items, (), kwargs), max(number // size, 10)
+        )
+        results.append(
+            {"name": "DefaultBuildCacheKey", "param": f"{size} ids", "ns_op": round(ns)}
+        )
+    return results
+
+
+def bench_hash_fn(number: int) -> Results:
+    results = []
+    for items in [1, 100, 1000]:
+        payload = _payload(items)
+        ns = ns_per_op(lambda: _default_hash_fn(payload), max(number // items, 10))
+        results.append(
+            {"name": "_default_hash_fn", "param": f"{items} items", "ns_op": round(ns)}
+        )
+    return results
+
+
+async def _ops_per_second(
+    storage: BaseStorage, concurrency: int, operations: int
+) -> float:
+    """Runs a 9:1 mix of reads and writes over 1000 keys from `concurrency`
+    tasks at once."""
+    value = _payload(10)
+    for key in range(1000):
+        await storage.save(f"key:{key}", value, ttl=600)
+
+    remaining = operations
+
+    async def _worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            key = f"key:{remaining % 1000}"
+            if remaining % 10 == 0:
+                await storage.save(key, value, ttl=600)
+            else:
+                await storage.get(key)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    return operations / (time.perf_counter() - start)
+
+
+async def bench_storage(operations: int, redis_url: Union[str, None] = None) -> Results:
+    storages: dict[str, Callable[[], BaseStorage]] = {
+        "InMemoryStorage": InMemoryStorage,
+        # a connection per task, so that tasks do not queue for the pool
+        "RedisStorage": lambda: RedisStorage(
+            Redis.from_url(redis_url, max_connections=256)
+            if redis_url
+            else FakeAsyncRedis(max_connections=256),
+            prefix="benchmark",
+        ),
+    }
+    results = []
+    for name, create in storages.items():
+        for concurrency in [1, 16, 128]:
+            storage = create()
+            try:
+                ops = await _ops_per_second(storage, concurrency, operations)
+            finally:
+                await storage.clear()
+            results.append(
+                {
+                    "name": name,
+                    "param": f"{concurrency} tasks",
+                    "ops_s": round(ops),
+                }
+            )
+    return results
+
+
+METRICS = {
+    "p50_us": "lower",
+    "p99_us": "lower",
+    "mean_us": "lower",
+    "ns_op": "lower",
+    "ops_s": "higher",
+}
+
+
+def compare(results: Results, baseline: Results) -> Results:
+    """Ratio of each metric to the baseline, above 1 is an improvement."""
+    previous = {(r["name"], r["param"]): r for r in baseline}
+    rows = []
+    for result in results:
+        before = previous.get((result["name"], result["param"]))
+        if before is None:
+            continue
+        for metric, better in METRICS.items():
+            if metric not in result or not before.get(metric):
+                continue
+            ratio = result[metric] / before[metric]
+            rows.append(
+                {
+                    "name": result["name"],
+                    "param": result["param"],
+                    "metric": metric,
+                    "before": before[metric],
+                    "after": result[metric],
+                    "speedup": round(ratio if better == "higher" else 1 / ratio, 2),
+                }
+            )
+    return rows
+
+
+async def main(args: argparse.Namespace) -> None:
+    scale = 10 if args.quick else 1
+    groups = [
+        await bench_endpoint(requests=1000 // scale),
+        bench_build_cache_key(number=100_000 // scale),
+        bench_hash_fn(number=100_000 // scale),
+        await bench_storage(operations=20_000 // scale, redis_url=args.redis_url),
+    ]
+    results = []
+    for group in groups:
+        print_table(group)
+        print()
+        results.extend(group)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print_table(compare(results, baseline))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    parser.add_argument("--redis-url", help="benchmark this Redis, not fakeredis")
+    parser.add_argument("--quick", action="store_true", help="shorter runs")
+    asyncio.run(main(parser.parse_args()))
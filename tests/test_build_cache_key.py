@@ -1,4 +1,5 @@
-from ultra_cache.build_cache_key import DefaultBuildCacheKey
+from fastapi import Request
+from ultra_cache.build_cache_key import CanonicalBuildCacheKey, DefaultBuildCacheKey
 from pydantic import BaseModel
 
 
@@ -107,3 +108,84 @@ def test_build_cache_key_same_pydantic_models():
 
     key2 = build_cache_key(_sample_fn, (Model(x="1", y=1)), kwargs)
     assert key1 == key2
+
+
+def _request(headers=(), query_string=b""):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "headers": list(headers),
+            "query_string": query_string,
+        }
+    )
+
+
+def test_canonical_build_cache_key_prefix():
+    def _sample_fn(a, b):
+        pass
+
+    key = CanonicalBuildCacheKey()(_sample_fn, (1, 2), {})
+    assert key.startswith(f"{__name__}:{_sample_fn.__qualname__}:")
+
+    key = CanonicalBuildCacheKey(hash_tag=True)(_sample_fn, (1, 2), {})
+    assert key.startswith(f"{{{__name__}:{_sample_fn.__qualname__}}}:")
+
+
+def test_canonical_build_cache_key_equal_inputs():
+    class Model(BaseModel):
+        x: str
+        y: int
+
+    def _sample_fn(a, b, c=None):
+        pass
+
+    build_cache_key = CanonicalBuildCacheKey()
+
+    key = build_cache_key(_sample_fn, (1,), {"b": {2, 3}, "c": Model(x="1", y=1)})
+    assert key == build_cache_key(
+        _sample_fn, (), {"c": Model(x="1", y=1), "b": {3, 2}, "a": 1}
+    )
+    assert key != build_cache_key(
+        _sample_fn, (1,), {"b": {2, 3}, "c": Model(x="2", y=1)}
+    )
+    assert key != build_cache_key(_sample_fn, (1, {2, 3}), {})
+
+
+def test_canonical_build_cache_key_params():
+    def _sample_fn(item_id, session):
+        pass
+
+    build_cache_key = CanonicalBuildCacheKey(params=["item_id"])
+
+    key = build_cache_key(_sample_fn, (1, object()), {})
+    assert key == build_cache_key(_sample_fn, (1, object()), {})
+    assert key != build_cache_key(_sample_fn, (2, object()), {})
+
+
+def test_canonical_build_cache_key_request():
+    def _sample_fn():
+        pass
+
+    build_cache_key = CanonicalBuildCacheKey(
+        headers=["Accept-Language"], query_params=["page"]
+    )
+
+    key = build_cache_key(
+        _sample_fn,
+        (),
+        {},
+        request=_request([(b"accept-language", b"en"), (b"x-other", b"1")], b"page=1"),
+    )
+    assert key == build_cache_key(
+        _sample_fn,
+        (),
+        {},
+        request=_request([(b"accept-language", b"en")], b"page=1&sort=asc"),
+    )
+    assert key != build_cache_key(
+        _sample_fn, (), {}, request=_request([(b"accept-language", b"de")], b"page=1")
+    )
+    assert key != build_cache_key(
+        _sample_fn, (), {}, request=_request([(b"accept-language", b"en")], b"page=2")
+    )
@@ -0,0 +1,85 @@
+import math
+
+from ultra_cache.cache_control import (
+    MAX_DELTA_SECONDS,
+    CacheControl,
+    parse_cache_control,
+)
+
+
+def test_parse():
+    assert parse_cache_control("MAX-AGE=10, No-Store") == (
+        ("max-age", "10"),
+        ("no-store", None),
+    )
+    assert parse_cache_control(" private , max-age = 5 ,,") == (
+        ("private", None),
+        ("max-age", "5"),
+    )
+
+
+def test_parse_quoted():
+    assert parse_cache_control('no-cache="Set-Cookie, X-Foo", max-age=10') == (
+        ("no-cache", "Set-Cookie, X-Foo"),
+        ("max-age", "10"),
+    )
+    assert parse_cache_control(r'ext="a \"b\"", max-age=1') == (
+        ("ext", 'a "b"'),
+        ("max-age", "1"),
+    )
+
+
+def test_parse_first_directive_wins():
+    assert parse_cache_control("max-age=10, max-age=20") == (("max-age", "10"),)
+
+
+def test_parse_is_memoized():
+    parse_cache_control.cache_clear()
+    parse_cache_control("max-age=10")
+    parse_cache_control("max-age=10")
+    assert parse_cache_control.cache_info().hits == 1
+
+
+def test_seconds():
+    cache_control = CacheControl.from_string(
+        "max-age=abc, s-maxage=99999999999, min-fresh=-1, stale-if-error=5"
+    )
+    assert cache_control.max_age is None
+    assert cache_control.s_maxage == MAX_DELTA_SECONDS
+    assert cache_control.min_fresh is None
+    assert cache_control.stale_if_error == 5
+
+
+def test_request_directives():
+    cache_control = CacheControl.from_string("max-stale, only-if-cached, no-cache")
+    assert cache_control.max_stale == math.inf
+    assert cache_control.only_if_cached
+    assert cache_control.no_cache
+    assert not cache_control.no_store
+    assert CacheControl.from_string("max-stale=5").max_stale == 5
+    assert CacheControl.from_string("").max_stale is None
+
+
+def test_response_directives():
+    cache_control = CacheControl.from_string("private, must-revalidate, public")
+    assert cache_control.private
+    assert cache_control.public
+    assert cache_control.must_revalidate
+
+
+def test_to_response_header():
+    cache_control = CacheControl.from_string(
+        'no-cache="set-cookie, x-foo", max-stale=10, min-fresh=5, only-if-cached'
+    )
+    cache_control.setdefault("max-age", 60)
+    assert cache_control.to_response_header() == (
+        'no-cache="set-cookie, x-foo", max-age=60'
+    )
+    assert CacheControl({"no-store": None}).to_response_header() == "no-store"
+
+
+def test_copy():
+    cache_control = CacheControl.from_string("max-age=10")
+    copy = cache_control.copy()
+    copy.set("max-age", "20")
+    assert cache_control.max_age == 10
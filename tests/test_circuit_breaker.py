@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from freezegun import freeze_time
+
+from ultra_cache.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from ultra_cache.utils import utc_now
+
+
+def test_opens_after_failures_in_a_row():
+    breaker = CircuitBreaker(failure_threshold=3)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.trips == 1
+
+
+def test_probes_after_recovery_time():
+    with freeze_time(utc_now()) as frozen_time:
+        breaker = CircuitBreaker(failure_threshold=1, recovery_time=30)
+        breaker.record_failure()
+
+        frozen_time.tick(timedelta(seconds=30))
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+        # one probe at a time
+        assert not breaker.allow()
+
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.trips == 1
+
+        frozen_time.tick(timedelta(seconds=30))
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+
+def test_replaces_a_lost_probe():
+    with freeze_time(utc_now()) as frozen_time:
+        breaker = CircuitBreaker(failure_threshold=1, recovery_time=30)
+        breaker.record_failure()
+
+        frozen_time.tick(timedelta(seconds=30))
+        assert breaker.allow()
+        frozen_time.tick(timedelta(seconds=29))
+        assert not breaker.allow()
+        frozen_time.tick(timedelta(seconds=1))
+        assert breaker.allow()
@@ -0,0 +1,71 @@
+import pytest
+
+from ultra_cache.compression import (
+    Compression,
+    GzipCompressor,
+    Lz4Compressor,
+    ZstdCompressor,
+    best_available,
+    decompress,
+)
+
+payload = b'{"items": [' + b'{"id": 1, "name": "item"},' * 1000 + b"]}"
+
+
+def _compressors():
+    yield GzipCompressor()
+    for compressor_cls in [ZstdCompressor, Lz4Compressor]:
+        try:
+            yield compressor_cls()
+        except ImportError:
+            pass
+
+
+@pytest.mark.parametrize("compressor", list(_compressors()), ids=type)
+def test_compression_round_trip(compressor):
+    compression = Compression(compressor, threshold=100)
+
+    data = compression.compress(payload)
+
+    assert data[0] == compressor.id
+    assert len(data) < len(payload)
+    assert compression.decompress(data) == payload
+    assert decompress(data) == payload
+
+
+def test_compression_below_threshold():
+    compression = Compression(GzipCompressor(), threshold=100)
+
+    data = compression.compress(b"small")
+
+    assert data == b"\x00small"
+    assert compression.decompress(data) == b"small"
+    assert compression.skipped == 1
+    assert compression.compressed == 0
+
+
+def test_compression_reads_other_algorithms():
+    written = Compression(GzipCompressor(), threshold=0).compress(payload)
+
+    assert Compression(threshold=0).decompress(written) == payload
+
+
+def test_compression_stats():
+    compression = Compression(GzipCompressor(), threshold=0)
+    compression.decompress(compression.compress(payload))
+
+    stats = compression.stats
+    assert stats["compressed"] == 1
+    assert stats["decompressed"] == 1
+    assert stats["bytes_in"] == len(payload)
+    assert 0 < stats["ratio"] < 0.5
+    assert stats["compress_seconds"] > 0
+
+
+def test_decompress_unknown_algorithm():
+    with pytest.raises(ValueError):
+        decompress(b"\xffdata")
+
+
+def test_best_available():
+    assert best_available().id in {1, 2, 3}
@@ -1,10 +1,28 @@
-from ultra_cache.build_cache_key import DefaultBuildCacheKey
-from ultra_cache.decorator import UltraCache
+import asyncio
+from datetime import timedelta
+import math
+import time
+from unittest.mock import ANY, Mock
+from fakeredis import FakeAsyncRedis
+from ultra_cache.build_cache_key import CanonicalBuildCacheKey, DefaultBuildCacheKey
+from ultra_cache.decorator import (
+    UltraCache,
+    _default_hash_fn,
+    _does_etag_match,
+    _recompute_early,
+)
+from ultra_cache.storage.base import CacheEntry
+from ultra_cache.sync_runner import SyncRunner
 from ultra_cache.storage.inmemory import InMemoryStorage
+from ultra_cache.storage.redis import RedisStorage
 import pytest
-from fastapi import Request, Response
+from fastapi import HTTPException, Request, Response
+from freezegun import freeze_time
+from pydantic import BaseModel
 from pytest_mock.plugin import MockerFixture
 
+from ultra_cache.utils import parse_http_date, utc_now
+
 
 class FnWithArgs:
     "Utility class for testing and mocking"
@@ -56,8 +74,8 @@ def key_builder():
 sample_args = (1, 2)
 
 
-def sample_request():
-    return Request({"type": "http", "headers": {}, "method": "GET"})
+def sample_request(*headers: tuple[bytes, bytes]):
+    return Request({"type": "http", "headers": list(headers), "method": "GET"})
 
 
 def sample_response():
@@ -120,8 +138,8 @@ async def test_decorator_cached(
     key_builder: DefaultBuildCacheKey,
     mocker: MockerFixture,
 ):
-    spy_on_save = mocker.spy(storage, "save")
-    spy_on_get = mocker.spy(storage, "get")
+    spy_on_save = mocker.spy(storage, "save_entry")
+    spy_on_get = mocker.spy(storage, "get_entry")
     spy_on_fn = mocker.spy(
         fn_with_args, "fn"
     )  # Weird syntax, but did not find any alternative
@@ -142,9 +160,909 @@ async def test_decorator_cached(
     # Note: no request and response in args/kwargs
     key = key_builder(fn_with_args.fn, sample_args, kwargs={})
 
-    spy_on_save.assert_called_once_with(key=key, value=(False), ttl=None)
+    spy_on_save.assert_called_once_with(
+        key,
+        CacheEntry(
+            False,
+            created_at=ANY,
+            etag=ANY,
+            compute_time=ANY,
+        ),
+        serializer=None,
+    )
     spy_on_fn.assert_called_once_with(*fn_with_args.args, **fn_with_args.kwargs)
 
     expected = await storage.get(key)
     assert result is False
     assert expected is False
+
+
+@pytest.mark.anyio
+async def test_decorator_etag_computed_once(storage: InMemoryStorage):
+    hash_fn = Mock(return_value='W/"1"')
+
+    async def _fn(p1, p2):
+        return {"sum": p1 + p2}
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(hash_fn=hash_fn)(_fn)
+
+    for _ in range(3):
+        response = Response()
+        await cached_fn(*sample_args, request=sample_request(), response=response)
+        assert response.headers["ETag"] == 'W/"1"'
+
+    hash_fn.assert_called_once_with({"sum": 3})
+
+
+def test_default_hash_fn():
+    class Item(BaseModel):
+        id: int
+
+    assert _default_hash_fn({"a": 1, "b": [1, 2]}) == _default_hash_fn(
+        {"b": [1, 2], "a": 1}
+    )
+    assert _default_hash_fn({"a": 1}) != _default_hash_fn({"a": 2})
+    assert _default_hash_fn(Item(id=1)) == _default_hash_fn({"id": 1})
+    # must not depend on the process, unlike hash()
+    assert _default_hash_fn("value") == 'W/"214efeaa7376b718a773f648a49d2850"'
+    # rendered with string keys, with or without orjson
+    assert _default_hash_fn({1: "a"}) == _default_hash_fn({"1": "a"})
+
+
+@pytest.mark.anyio
+async def test_decorator_non_string_keys(storage: InMemoryStorage):
+    async def _fn(p1, p2):
+        return {p1: "a", p2: "b"}
+
+    cached_fn = UltraCache(storage=storage)(ttl=60)(_fn)
+
+    for expected in ["MISS", "HIT"]:
+        response = Response()
+        result = await cached_fn(
+            *sample_args, request=sample_request(), response=response
+        )
+        assert result == {1: "a", 2: "b"}
+        assert response.headers["X-Cache"] == expected
+        assert response.headers["ETag"] == _default_hash_fn({"1": "a", "2": "b"})
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        (None, False),
+        ("*", True),
+        ('W/"1"', True),
+        ('"1"', True),
+        ('"0", W/"1"', True),
+        ('"2"', False),
+    ],
+)
+def test_does_etag_match(if_none_match, expected):
+    assert _does_etag_match('W/"1"', if_none_match) is expected
+
+
+@pytest.mark.anyio
+async def test_decorator_key_from_headers(storage: InMemoryStorage):
+    async def _fn(item_id: int):
+        return item_id
+
+    cache = UltraCache(storage=storage)
+    build_cache_key = CanonicalBuildCacheKey(headers=["accept-language"])
+    cached_fn = cache(build_cache_key=build_cache_key)(_fn)
+
+    for language, status in [(b"en", "MISS"), (b"de", "MISS"), (b"en", "HIT")]:
+        request = Request(
+            {
+                "type": "http",
+                "headers": [(b"accept-language", language)],
+                "method": "GET",
+            }
+        )
+        response = Response()
+        await cached_fn(1, request=request, response=response)
+        assert response.headers["X-Cache"] == status
+
+
+@pytest.mark.anyio
+async def test_decorator_stats(storage: InMemoryStorage):
+    async def _fn(p1, p2):
+        return p1 == p2
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache()(_fn)
+
+    for _ in range(3):
+        await cached_fn(
+            *sample_args, request=sample_request(), response=sample_response()
+        )
+
+    assert cache.stats.to_dict() == {
+        "hits": 2,
+        "misses": 1,
+        "coalesced": 0,
+        "stale": 0,
+        "early_recomputes": 0,
+    }
+
+
+@pytest.mark.anyio
+async def test_decorator_single_flight(storage: InMemoryStorage):
+    calls = 0
+
+    async def _slow_fn(p1, p2):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return p1 + p2
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(single_flight=True)(_slow_fn)
+
+    results = await asyncio.gather(
+        *[
+            cached_fn(*sample_args, request=sample_request(), response=Response())
+            for _ in range(5)
+        ]
+    )
+
+    assert results == [3] * 5
+    assert calls == 1
+    assert cache.stats.misses == 5
+    assert cache.stats.coalesced == 4
+
+
+@pytest.mark.anyio
+async def test_decorator_single_flight_timeout(storage: InMemoryStorage):
+    calls = 0
+
+    async def _slow_fn(p1, p2):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return p1 + p2
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(single_flight=True, single_flight_timeout=0.01)(_slow_fn)
+
+    await asyncio.gather(
+        *[
+            cached_fn(*sample_args, request=sample_request(), response=Response())
+            for _ in range(3)
+        ]
+    )
+
+    assert calls == 3
+    assert cache.stats.coalesced == 0
+
+
+@pytest.mark.anyio
+async def test_decorator_single_flight_distributed():
+    pytest.importorskip("lupa")
+    calls = 0
+
+    async def _slow_fn(p1, p2):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return p1 + p2
+
+    # two caches sharing one redis instance behave like two processes
+    redis_instance = FakeAsyncRedis()
+    caches = [UltraCache(storage=RedisStorage(redis_instance)) for _ in range(2)]
+    cached_fns = [
+        cache(single_flight_distributed=True, single_flight_timeout=1)(_slow_fn)
+        for cache in caches
+    ]
+
+    await asyncio.gather(
+        *[
+            cached_fn(*sample_args, request=sample_request(), response=Response())
+            for cached_fn in cached_fns
+        ]
+    )
+
+    assert calls == 1
+    assert sum(cache.stats.coalesced for cache in caches) == 1
+
+
+@pytest.mark.anyio
+async def test_decorator_stale_while_revalidate(storage: InMemoryStorage):
+    calls = 0
+
+    async def _fn(p1, p2):
+        nonlocal calls
+        calls += 1
+        return calls
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(ttl=60, stale_while_revalidate=30)(_fn)
+
+    with freeze_time(utc_now()) as frozen_time:
+        await cached_fn(*sample_args, request=sample_request(), response=Response())
+
+        frozen_time.tick(timedelta(seconds=70))
+        response = Response()
+        result = await cached_fn(
+            *sample_args, request=sample_request(), response=response
+        )
+
+        assert result == 1
+        assert response.headers["X-Cache"] == "STALE"
+        assert response.headers["Age"] == "70"
+        assert "stale-while-revalidate=30" in response.headers["Cache-Control"]
+
+        await asyncio.gather(*cache._revalidations.values())
+
+        response = Response()
+        result = await cached_fn(
+            *sample_args, request=sample_request(), response=response
+        )
+
+    assert result == 2
+    assert calls == 2
+    assert response.headers["X-Cache"] == "HIT"
+    assert cache.stats.stale == 1
+
+
+@pytest.mark.anyio
+async def test_decorator_stale_while_revalidate_expired(storage: InMemoryStorage):
+    calls = 0
+
+    async def _fn(p1, p2):
+        nonlocal calls
+        calls += 1
+        return calls
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(ttl=60, stale_while_revalidate=30)(_fn)
+
+    with freeze_time(utc_now()) as frozen_time:
+        await cached_fn(*sample_args, request=sample_request(), response=Response())
+
+        frozen_time.tick(timedelta(seconds=100))
+        response = Response()
+        result = await cached_fn(
+            *sample_args, request=sample_request(), response=response
+        )
+
+    assert result == 2
+    assert response.headers["X-Cache"] == "MISS"
+
+
+@pytest.mark.anyio
+async def test_decorator_stale_if_error(storage: InMemoryStorage):
+    fail = False
+
+    async def _fn(p1, p2):
+        if fail:
+            raise RuntimeError("backend down")
+        return p1 + p2
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(ttl=60, stale_if_error=300)(_fn)
+
+    with freeze_time(utc_now()) as frozen_time:
+        await cached_fn(*sample_args, request=sample_request(), response=Response())
+
+        fail = True
+        frozen_time.tick(timedelta(seconds=100))
+        response = Response()
+        result = await cached_fn(
+            *sample_args, request=sample_request(), response=response
+        )
+        assert result == 3
+        assert response.headers["X-Cache"] == "STALE"
+
+        frozen_time.tick(timedelta(seconds=900))
+        with pytest.raises(RuntimeError):
+            await cached_fn(*sample_args, request=sample_request(), response=Response())
+
+
+@pytest.mark.anyio
+async def test_decorator_stale_if_error_client_error(storage: InMemoryStorage):
+    status_code = None
+
+    async def _fn(p1, p2):
+        if status_code is not None:
+            raise HTTPException(status_code=status_code)
+        return p1 + p2
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(ttl=1, stale_if_error=600)(_fn)
+
+    with freeze_time(utc_now()) as frozen_time:
+        await cached_fn(*sample_args, request=sample_request(), response=Response())
+        frozen_time.tick(timedelta(seconds=10))
+
+        # e.g. deleted meanwhile, the answer is meant for the client
+        status_code = 404
+        with pytest.raises(HTTPException) as e:
+            await cached_fn(*sample_args, request=sample_request(), response=Response())
+        assert e.value.status_code == 404
+
+        status_code = 503
+        response = Response()
+        result = await cached_fn(
+            *sample_args, request=sample_request(), response=response
+        )
+        assert result == 3
+        assert response.headers["X-Cache"] == "STALE"
+
+
+@pytest.mark.anyio
+async def test_decorator_serializer():
+    class Item(BaseModel):
+        id: int
+
+    async def _fn(item_id: int) -> Item:
+        return Item(id=item_id)
+
+    cache = UltraCache(storage=RedisStorage(FakeAsyncRedis()))
+    cached_fn = cache(serializer="pydantic", hash_fn=lambda item: f"W/{item.id}")(_fn)
+
+    miss = await cached_fn(1, request=sample_request(), response=Response())
+    response = Response()
+    hit = await cached_fn(1, request=sample_request(), response=response)
+
+    assert response.headers["X-Cache"] == "HIT"
+    assert hit == miss == Item(id=1)
+
+
+@pytest.fixture(params=[InMemoryStorage, RedisStorage])
+def body_storage(request):
+    if request.param is RedisStorage:
+        return RedisStorage(FakeAsyncRedis())
+    return InMemoryStorage()
+
+
+@pytest.mark.anyio
+async def test_decorator_cache_body(body_storage):
+    calls = 0
+
+    async def _fn(item_id: int):
+        nonlocal calls
+        calls += 1
+        return {"id": item_id, "name": "ü"}
+
+    cache = UltraCache(storage=body_storage)
+    cached_fn = cache(cache_body=True, hash_fn=lambda x: '"etag"')(_fn)
+
+    miss = await cached_fn(1, request=sample_request(), response=Response())
+    response = Response()
+    response.headers["X-Custom"] = "1"
+    hit = await cached_fn(1, request=sample_request(), response=response)
+
+    assert calls == 1
+    assert isinstance(hit, Response)
+    assert hit.body == miss.body == '{"id":1,"name":"ü"}'.encode()
+    assert hit.headers["content-type"] == "application/json"
+    assert hit.headers["content-length"] == str(len(hit.body))
+    assert hit.headers["X-Cache"] == "HIT"
+    assert hit.headers["X-Custom"] == "1"
+    assert hit.headers["ETag"] == '"etag"'
+
+
+@pytest.mark.anyio
+async def test_decorator_cache_body_not_modified(storage: InMemoryStorage):
+    async def _fn(item_id: int):
+        return {"id": item_id}
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(cache_body=True, hash_fn=lambda x: '"etag"')(_fn)
+
+    await cached_fn(1, request=sample_request(), response=Response())
+    request = Request(
+        {"type": "http", "headers": [(b"if-none-match", b'"etag"')], "method": "GET"}
+    )
+    hit = await cached_fn(1, request=request, response=Response())
+
+    assert hit.status_code == 304
+    assert hit.body == b""
+    assert hit.headers["ETag"] == '"etag"'
+
+
+@pytest.mark.anyio
+async def test_decorator_cache_body_response(storage: InMemoryStorage):
+    async def _fn():
+        return Response("<p>hi</p>", media_type="text/html")
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(cache_body=True)(_fn)
+
+    await cached_fn(request=sample_request(), response=Response())
+    hit = await cached_fn(request=sample_request(), response=Response())
+
+    assert hit.body == b"<p>hi</p>"
+    assert hit.headers["content-type"] == "text/html; charset=utf-8"
+
+
+def test_decorator_cache_body_with_serializer(storage: InMemoryStorage):
+    with pytest.raises(ValueError):
+        UltraCache(storage=storage)(cache_body=True, serializer="json")
+
+
+@pytest.mark.anyio
+async def test_prefill(storage: InMemoryStorage):
+    running = 0
+    max_running = 0
+
+    async def _fn(item_id: int, r: Request):
+        nonlocal running, max_running
+        if item_id == 13:
+            raise RuntimeError("unlucky")
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"id": item_id}
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(ttl=60)(_fn)
+
+    arguments = [{"item_id": i} for i in range(20)]
+    filled = await cache.prefill(cached_fn, arguments, concurrency=4)
+
+    assert filled == 19
+    assert max_running == 4
+    response = Response()
+    await cached_fn(item_id=5, r=sample_request(), response=response)
+    assert response.headers["X-Cache"] == "HIT"
+
+    assert await cache.prefill(cached_fn, arguments[:5]) == 0
+    assert await cache.prefill(cached_fn, arguments[:5], refresh=True) == 5
+
+
+@pytest.mark.anyio
+async def test_prefill_requires_decorated_function(storage: InMemoryStorage):
+    async def _fn(item_id: int):
+        return item_id
+
+    with pytest.raises(ValueError):
+        await UltraCache(storage=storage).prefill(_fn, [{"item_id": 1}])
+
+
+@pytest.mark.anyio
+async def test_invalidate_endpoint():
+    async def _items(item_id: int):
+        return item_id
+
+    async def _users(user_id: int):
+        return user_id
+
+    cache = UltraCache(storage=RedisStorage(FakeAsyncRedis()))
+    cached_items = cache(tag_endpoint=True)(_items)
+    cached_users = cache(tag_endpoint=True)(_users)
+    for i in range(3):
+        await cached_items(i, request=sample_request(), response=Response())
+        await cached_users(i, request=sample_request(), response=Response())
+
+    assert await cache.invalidate(endpoint=cached_items) == 3
+
+    items_response, users_response = Response(), Response()
+    await cached_items(1, request=sample_request(), response=items_response)
+    await cached_users(1, request=sample_request(), response=users_response)
+    assert items_response.headers["X-Cache"] == "MISS"
+    assert users_response.headers["X-Cache"] == "HIT"
+
+
+@pytest.mark.anyio
+async def test_endpoint_tag_is_opt_in():
+    async def _items(item_id: int):
+        return item_id
+
+    storage = RedisStorage(FakeAsyncRedis())
+    cache = UltraCache(storage=storage)
+    cached_items = cache()(_items)
+    await cached_items(1, request=sample_request(), response=Response())
+
+    assert await storage.redis.keys("ultra-cache:tag:*") == []
+    with pytest.raises(ValueError):
+        await cache.invalidate(endpoint=cached_items)
+    with pytest.raises(ValueError):
+        cache.invalidates(endpoints=[cached_items])
+
+
+@pytest.mark.anyio
+async def test_invalidate_pattern(storage: InMemoryStorage):
+    async def _fn(item_id: int):
+        return item_id
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(build_cache_key=CanonicalBuildCacheKey())(_fn)
+    await cached_fn(1, request=sample_request(), response=Response())
+
+    assert await cache.invalidate(pattern=f"*:{_fn.__qualname__}:*") == 1
+    assert len(storage) == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "storage", [InMemoryStorage, lambda: RedisStorage(FakeAsyncRedis())]
+)
+async def test_tags(storage):
+    async def _item(item_id: int):
+        return {"id": item_id}
+
+    async def _list(page: int):
+        return [{"id": page * 10 + i} for i in range(10)]
+
+    cache = UltraCache(storage=storage())
+    cached_item = cache(tags=lambda args, result: [f"item:{args['item_id']}"])(_item)
+    cached_list = cache(
+        tags=lambda args, result: [f"item:{item['id']}" for item in result]
+    )(_list)
+
+    async def _static():
+        return "static"
+
+    cached_static = cache(tags=["static"])(_static)
+
+    await cached_item(3, request=sample_request(), response=Response())
+    await cached_item(4, request=sample_request(), response=Response())
+    await cached_list(0, request=sample_request(), response=Response())
+    await cached_list(1, request=sample_request(), response=Response())
+    await cached_static(request=sample_request(), response=Response())
+
+    assert await cache.invalidate(tags=["item:3"]) == 2
+    assert await cache.invalidate(tags=["static"]) == 1
+
+    for fn, arg, status in [
+        (cached_item, 3, "MISS"),
+        (cached_item, 4, "HIT"),
+        (cached_list, 0, "MISS"),
+        (cached_list, 1, "HIT"),
+    ]:
+        response = Response()
+        await fn(arg, request=sample_request(), response=response)
+        assert response.headers["X-Cache"] == status
+
+
+@pytest.mark.anyio
+async def test_invalidates(storage: InMemoryStorage):
+    async def _item(item_id: int):
+        return {"id": item_id}
+
+    def _update(item_id: int, fail: bool = False):
+        if fail:
+            return Response(status_code=409)
+        return {"id": item_id}
+
+    cache = UltraCache(storage=storage)
+    cached_item = cache(tag_endpoint=True)(_item)
+    update = cache.invalidates(endpoints=[cached_item])(_update)
+
+    await cached_item(1, request=sample_request(), response=Response())
+    await update(1, fail=True)
+    assert len(storage) == 1
+
+    assert await update(1) == {"id": 1}
+    assert len(storage) == 0
+
+
+@pytest.mark.anyio
+async def test_write_behind(storage: InMemoryStorage):
+    calls = 0
+
+    async def _fn(item_id: int):
+        nonlocal calls
+        calls += 1
+        return {"id": item_id}
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(write_behind=True)(_fn)
+
+    async with cache.lifespan():
+        await cached_fn(1, request=sample_request(), response=Response())
+        assert len(storage) == 0
+        assert cache.write_behind.depth == 1
+
+        # served before it reached the storage
+        response = Response()
+        await cached_fn(1, request=sample_request(), response=response)
+        assert response.headers["X-Cache"] == "HIT"
+
+    assert calls == 1
+    assert cache.write_behind.depth == 0
+    assert (await storage.get_entry(key=next(iter(storage.storage)))).value == {"id": 1}
+
+
+@pytest.mark.anyio
+async def test_write_behind_invalidated(storage: InMemoryStorage):
+    calls = 0
+
+    async def _fn(item_id: int):
+        nonlocal calls
+        calls += 1
+        return {"id": item_id, "calls": calls}
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(write_behind=True, tags=["t"])(_fn)
+
+    async def _call():
+        response = Response()
+        result = await cached_fn(1, request=sample_request(), response=response)
+        return result, response.headers["X-Cache"]
+
+    async with cache.lifespan():
+        await _call()
+        assert await cache.invalidate(tags=["t"]) == 0
+        assert await _call() == ({"id": 1, "calls": 2}, "MISS")
+
+        await cache.clear()
+        assert await _call() == ({"id": 1, "calls": 3}, "MISS")
+
+    assert len(storage) == 1
+    assert (await storage.get_entry(next(iter(storage.storage)))).value["calls"] == 3
+
+
+@pytest.mark.anyio
+async def test_sync_runner_saturated(storage: InMemoryStorage):
+    def _fn(item_id: int):
+        time.sleep(0.05)
+        return {"id": item_id}
+
+    cache = UltraCache(storage=storage)
+    runner = SyncRunner(limiter=1, max_queue=0)
+    cached_fn = cache(ttl=60, stale_if_error=300, sync_runner=runner)(_fn)
+
+    async def _call(item_id: int):
+        response = Response()
+        try:
+            await cached_fn(item_id, request=sample_request(), response=response)
+        except HTTPException as e:
+            return e.status_code
+        return response.headers["X-Cache"]
+
+    statuses = await asyncio.gather(_call(1), _call(2))
+    assert sorted(statuses, key=str) == [503, "MISS"]
+    assert runner.rejected == 1
+
+    with freeze_time(utc_now()) as frozen_time:
+        await _call(3)
+        frozen_time.tick(timedelta(seconds=100))
+
+        # every thread is taken
+        runner.in_flight = 1
+        assert await _call(3) == "STALE"
+
+
+@pytest.mark.anyio
+async def test_headers_replaced_on_reused_response(storage: InMemoryStorage):
+    async def _fn(item_id: int, r: Request):
+        return {"id": item_id}
+
+    cached_fn = UltraCache(storage=storage)(ttl=60)(_fn)
+
+    response = Response()
+    await cached_fn(1, r=sample_request(), response=response)
+    await cached_fn(1, r=sample_request(), response=response)
+
+    assert response.headers.getlist("X-Cache") == ["HIT"]
+    assert response.headers.getlist("Cache-Control") == ["max-age=60"]
+
+
+async def _call_cached(cached_fn, *headers: tuple[bytes, bytes]):
+    response = Response()
+    try:
+        result = await cached_fn(1, r=sample_request(*headers), response=response)
+    except HTTPException as e:
+        return e.status_code, None, response
+    return response.status_code, result, response
+
+
+@pytest.mark.anyio
+async def test_only_if_cached(storage: InMemoryStorage):
+    calls = 0
+
+    async def _fn(item_id: int, r: Request):
+        nonlocal calls
+        calls += 1
+        return {"id": item_id}
+
+    cached_fn = UltraCache(storage=storage)(ttl=60)(_fn)
+
+    status, _, _ = await _call_cached(cached_fn, (b"cache-control", b"only-if-cached"))
+    assert status == 504
+    assert calls == 0
+
+    await _call_cached(cached_fn)
+    status, result, response = await _call_cached(
+        cached_fn, (b"cache-control", b"only-if-cached")
+    )
+    assert result == {"id": 1}
+    assert response.headers["X-Cache"] == "HIT"
+    # request-only directives are not passed on
+    assert response.headers["Cache-Control"] == "max-age=60"
+
+
+@pytest.mark.anyio
+async def test_request_max_age_and_min_fresh(storage: InMemoryStorage):
+    calls = 0
+
+    async def _fn(item_id: int, r: Request):
+        nonlocal calls
+        calls += 1
+        return {"id": item_id}
+
+    cached_fn = UltraCache(storage=storage)(ttl=60)(_fn)
+
+    with freeze_time(utc_now()) as frozen_time:
+        await _call_cached(cached_fn)
+        frozen_time.tick(timedelta(seconds=20))
+
+        _, _, response = await _call_cached(
+            cached_fn, (b"cache-control", b"max-age=30")
+        )
+        assert response.headers["X-Cache"] == "HIT"
+        _, _, response = await _call_cached(
+            cached_fn, (b"cache-control", b"min-fresh=30")
+        )
+        assert response.headers["X-Cache"] == "HIT"
+        _, _, response = await _call_cached(
+            cached_fn, (b"cache-control", b"min-fresh=50")
+        )
+        assert response.headers["X-Cache"] == "MISS"
+        assert calls == 2
+
+        # revalidates, the new entry still lives for the route's ttl
+        _, _, response = await _call_cached(cached_fn, (b"cache-control", b"max-age=0"))
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.headers["Cache-Control"] == "max-age=60"
+        assert calls == 3
+        frozen_time.tick(timedelta(seconds=5))
+        _, _, response = await _call_cached(
+            cached_fn, (b"cache-control", b"max-age=10")
+        )
+        assert response.headers["X-Cache"] == "HIT"
+
+
+@pytest.mark.anyio
+async def test_request_directives_do_not_set_lifetimes(storage: InMemoryStorage):
+    async def _fn(item_id: int, r: Request):
+        return {"id": item_id}
+
+    cached_fn = UltraCache(storage=storage)(ttl=60)(_fn)
+
+    _, _, response = await _call_cached(
+        cached_fn,
+        (b"cache-control", b"max-age=999999, stale-while-revalidate=999999"),
+    )
+    assert "max-age=60" in response.headers["Cache-Control"]
+    entry = await storage.get_entry(next(iter(storage.storage)))
+    assert entry.ttl == 60
+    assert entry.stale_ttl is None
+
+    _, _, response = await _call_cached(cached_fn)
+    assert response.headers["X-Cache"] == "HIT"
+    assert response.headers["Cache-Control"] == "max-age=60"
+    assert parse_http_date(response.headers["Expires"]) <= time.time() + 60
+
+
+@pytest.mark.anyio
+async def test_max_stale(storage: InMemoryStorage):
+    async def _fn(item_id: int, r: Request):
+        return {"id": item_id}
+
+    cached_fn = UltraCache(storage=storage)(ttl=10, stale_if_error=100)(_fn)
+
+    with freeze_time(utc_now()) as frozen_time:
+        await _call_cached(cached_fn)
+        frozen_time.tick(timedelta(seconds=30))
+
+        _, _, response = await _call_cached(
+            cached_fn, (b"cache-control", b"max-stale=10")
+        )
+        assert response.headers["X-Cache"] == "MISS"
+
+        frozen_time.tick(timedelta(seconds=20))
+        _, result, response = await _call_cached(
+            cached_fn, (b"cache-control", b"max-stale")
+        )
+        assert response.headers["X-Cache"] == "STALE"
+        assert result == {"id": 1}
+
+
+@pytest.mark.anyio
+async def test_last_modified(storage: InMemoryStorage):
+    async def _fn(item_id: int, r: Request):
+        return {"id": item_id}
+
+    cached_fn = UltraCache(storage=storage)(ttl=60)(_fn)
+
+    with freeze_time("2024-05-01 12:00:00"):
+        _, _, response = await _call_cached(cached_fn)
+    assert response.headers["Last-Modified"] == "Wed, 01 May 2024 12:00:00 GMT"
+    assert response.headers["Expires"] == "Wed, 01 May 2024 12:01:00 GMT"
+
+    with freeze_time("2024-05-01 12:00:30"):
+        status, _, response = await _call_cached(
+            cached_fn, (b"if-modified-since", b"Wed, 01 May 2024 12:00:00 GMT")
+        )
+        assert status == 304
+        assert response.headers["Age"] == "30"
+
+        status, _, _ = await _call_cached(
+            cached_fn, (b"if-modified-since", b"Wed, 01 May 2024 11:00:00 GMT")
+        )
+        assert status == 200
+
+        # If-None-Match takes precedence
+        status, _, _ = await _call_cached(
+            cached_fn,
+            (b"if-modified-since", b"Wed, 01 May 2024 12:00:00 GMT"),
+            (b"if-none-match", b'"other"'),
+        )
+        assert status == 200
+
+
+def test_recompute_early(mocker: MockerFixture):
+    random = mocker.patch("ultra_cache.decorator.random.random")
+    with freeze_time(utc_now()):
+        entry = CacheEntry(1, ttl=60, compute_time=2)
+        entry.created_at -= 50
+
+        # -log(1 - u) is 0 and 3
+        random.return_value = 0.0
+        assert not _recompute_early(entry, 1)
+        random.return_value = 1 - math.exp(-3)
+        assert not _recompute_early(entry, 1)
+        assert _recompute_early(entry, 2)
+
+        assert not _recompute_early(CacheEntry(1, ttl=60), 1)
+        assert not _recompute_early(CacheEntry(1, compute_time=2), 1)
+
+
+@pytest.mark.anyio
+async def test_early_recompute(storage: InMemoryStorage, mocker: MockerFixture):
+    calls = 0
+
+    async def _fn(item_id: int, r: Request):
+        nonlocal calls
+        calls += 1
+        return {"id": item_id, "calls": calls}
+
+    cache = UltraCache(storage=storage)
+    cached_fn = cache(ttl=60, early_recompute=1)(_fn)
+    random = mocker.patch("ultra_cache.decorator.random.random", return_value=0.0)
+
+    with freeze_time(utc_now()) as frozen_time:
+        await _call_cached(cached_fn)
+        # as if it took long to compute
+        item = next(iter(storage.storage.values()))
+        item.meta = item.meta._replace(compute_time=5)
+        frozen_time.tick(timedelta(seconds=50))
+
+        _, _, response = await _call_cached(cached_fn)
+        assert response.headers["X-Cache"] == "HIT"
+        assert cache.stats.early_recomputes == 0
+
+        # expires within the next 15s
+        random.return_value = 1 - math.exp(-3)
+        _, result, response = await _call_cached(cached_fn)
+        assert response.headers["X-Cache"] == "HIT"
+        assert result == {"id": 1, "calls": 1}
+        assert cache.stats.early_recomputes == 1
+
+        await cache.close()
+        assert calls == 2
+        random.return_value = 0.0
+        _, result, _ = await _call_cached(cached_fn)
+        assert result == {"id": 1, "calls": 2}
+
+
+@pytest.mark.anyio
+async def test_ttl_jitter(storage: InMemoryStorage, mocker: MockerFixture):
+    async def _fn(item_id: int, r: Request):
+        return item_id
+
+    mocker.patch("ultra_cache.decorator.random.random", return_value=0.5)
+    cached_fn = UltraCache(storage=storage)(ttl=60, ttl_jitter=0.2)(_fn)
+
+    _, _, response = await _call_cached(cached_fn)
+
+    assert next(iter(storage.storage.values())).ttl == 54
+    assert response.headers["Cache-Control"] == "max-age=60"
+
+    with pytest.raises(ValueError):
+        UltraCache(storage=storage)(ttl=60, ttl_jitter=1)
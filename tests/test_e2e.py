@@ -121,3 +121,68 @@ def test_cache_with_if_none_match_miss():
     assert response.headers.get("X-Cache") == "HIT"
     assert response.headers.get("Cache-Control", "") == ""
     assert response.headers.get("ETag") == etag
+
+
+def test_cache_body():
+    response = client.get("/encoded/1")
+    assert response.status_code == 200
+    assert response.json() == {"item_id": 1}
+    assert response.headers.get("X-Cache") == "MISS"
+    etag = response.headers.get("ETag")
+
+    response = client.get("/encoded/1")
+    assert response.status_code == 200
+    assert response.content == b'{"item_id":1}'
+    assert response.headers.get("Content-Type") == "application/json"
+    assert response.headers.get("X-Cache") == "HIT"
+    assert response.headers.get("ETag") == etag
+
+    response = client.get("/encoded/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers.get("X-Cache") == "HIT"
+
+
+def test_cache_body_applies_response_model():
+    for expected in ["MISS", "HIT"]:
+        response = client.get("/users/1")
+        assert response.status_code == 200
+        assert response.content == b'{"name":"alice"}'
+        assert response.headers.get("X-Cache") == expected
+
+
+def test_prefill_cache_body():
+    loop = asyncio.new_event_loop()
+    with pytest.raises(ValueError):
+        loop.run_until_complete(utils.cache.prefill(utils.read_user, [{"user_id": 2}]))
+
+    filled = loop.run_until_complete(
+        utils.cache.prefill(utils.read_user, [{"user_id": 2}], app=utils.app)
+    )
+    loop.close()
+
+    assert filled == 1
+    response = client.get("/users/2")
+    assert response.headers.get("X-Cache") == "HIT"
+    assert response.content == b'{"name":"alice"}'
+
+
+def test_cache_body_applies_response_class():
+    for expected in ["MISS", "HIT"]:
+        response = client.get("/pages/1")
+        assert response.status_code == 203
+        assert response.content == b"<h1>1</h1>"
+        assert response.headers.get("Content-Type") == "text/html; charset=utf-8"
+        assert response.headers.get("X-Cache") == expected
+
+
+def test_invalidates_on_mutation():
+    response = client.get("/products/1")
+    assert response.json() == {"name": "chair"}
+    assert client.get("/products/1").headers.get("X-Cache") == "HIT"
+
+    response = client.put("/products/1", params={"name": "table"})
+    assert response.status_code == 200
+
+    response = client.get("/products/1")
+    assert response.json() == {"name": "table"}
+    assert response.headers.get("X-Cache") == "MISS"
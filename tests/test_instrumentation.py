@@ -0,0 +1,152 @@
+from fastapi import Request, Response
+import pytest
+
+from ultra_cache.circuit_breaker import CLOSED, OPEN
+from ultra_cache.decorator import UltraCache
+from ultra_cache.instrumentation import (
+    BUILD_KEY,
+    BYPASS,
+    ENDPOINT,
+    HIT,
+    MISS,
+    NOT_MODIFIED,
+    STORAGE_GET,
+    STORAGE_SAVE,
+    TIMEOUT,
+    InMemoryRecorder,
+    Instrumentation,
+    OpenTelemetryInstrumentation,
+    PrometheusInstrumentation,
+    payload_size,
+)
+from ultra_cache.storage.inmemory import InMemoryStorage
+
+
+def _request(headers: dict[str, str] = {}) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+def _endpoint():
+    async def _fn(item_id: int):
+        return {"id": item_id}
+
+    return _fn
+
+
+ENDPOINT_NAME = f"{__name__}:_endpoint.<locals>._fn"
+
+
+@pytest.mark.anyio
+async def test_records_events_and_durations():
+    recorder = InMemoryRecorder()
+    cache = UltraCache(storage=InMemoryStorage(), instrumentation=recorder)
+    cached_fn = cache(ttl=60)(_endpoint())
+
+    await cached_fn(1, request=_request(), response=Response())
+    await cached_fn(1, request=_request(), response=Response())
+    await cached_fn(
+        1, request=_request({"cache-control": "no-cache"}), response=Response()
+    )
+
+    response = Response()
+    await cached_fn(1, request=_request(), response=response)
+    await cached_fn(
+        1,
+        request=_request({"if-none-match": response.headers["ETag"]}),
+        response=Response(),
+    )
+
+    assert recorder.events[ENDPOINT_NAME, MISS] == 2
+    assert recorder.events[ENDPOINT_NAME, HIT] == 3
+    assert recorder.events[ENDPOINT_NAME, BYPASS] == 1
+    assert recorder.events[ENDPOINT_NAME, NOT_MODIFIED] == 1
+    assert recorder.hit_ratio(ENDPOINT_NAME) == 3 / 5
+
+    assert len(recorder.durations[ENDPOINT_NAME, BUILD_KEY]) == 5
+    # no-cache skips the lookup
+    assert len(recorder.durations[ENDPOINT_NAME, STORAGE_GET]) == 4
+    assert len(recorder.durations[ENDPOINT_NAME, STORAGE_SAVE]) == 2
+    assert len(recorder.durations[ENDPOINT_NAME, ENDPOINT]) == 2
+    assert all(
+        seconds >= 0
+        for durations in recorder.durations.values()
+        for seconds in durations
+    )
+    assert recorder.sizes[ENDPOINT_NAME] == [len(b'{"id":1}')] * 2
+
+    recorder.clear()
+    assert recorder.hit_ratio(ENDPOINT_NAME) == 0.0
+
+
+@pytest.mark.anyio
+async def test_no_store_is_not_saved():
+    recorder = InMemoryRecorder()
+    cache = UltraCache(storage=InMemoryStorage(), instrumentation=recorder)
+    cached_fn = cache(ttl=60)(_endpoint())
+
+    await cached_fn(
+        1, request=_request({"cache-control": "no-store"}), response=Response()
+    )
+
+    assert recorder.events[ENDPOINT_NAME, BYPASS] == 1
+    assert recorder.events[ENDPOINT_NAME, MISS] == 1
+    assert STORAGE_SAVE not in {op for _, op in recorder.durations}
+    assert not recorder.sizes
+
+
+@pytest.mark.anyio
+async def test_disabled_by_default(mocker):
+    cache = UltraCache(storage=InMemoryStorage())
+    assert type(cache.instrumentation) is Instrumentation
+    record_event = mocker.spy(cache.instrumentation, "record_event")
+
+    await cache(ttl=60)(_endpoint())(1, request=_request(), response=Response())
+
+    record_event.assert_not_called()
+
+
+def test_payload_size():
+    assert payload_size(b"abc") == 3
+    assert payload_size({"a": 1}) == len(b'{"a":1}')
+    assert payload_size(object()) is None
+
+
+def test_prometheus():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    instrumentation = PrometheusInstrumentation(registry=registry)
+
+    instrumentation.record_event("e", HIT)
+    instrumentation.record_duration("e", ENDPOINT, 0.5)
+    instrumentation.record_size("e", 100)
+
+    labels = {"endpoint": "e", "event": HIT}
+    assert registry.get_sample_value("ultra_cache_events_total", labels) == 1
+    labels = {"endpoint": "e", "operation": ENDPOINT}
+    assert registry.get_sample_value("ultra_cache_duration_seconds_sum", labels) == 0.5
+
+    instrumentation.record_fallback("redis", "get", TIMEOUT)
+    instrumentation.record_breaker_state("redis", OPEN)
+    labels = {"storage": "redis", "operation": "get", "reason": TIMEOUT}
+    assert registry.get_sample_value("ultra_cache_storage_fallbacks_total", labels) == 1
+    for state, value in [(OPEN, 1), (CLOSED, 0)]:
+        labels = {"storage": "redis", "state": state}
+        assert registry.get_sample_value("ultra_cache_breaker_state", labels) == value
+
+
+def test_opentelemetry(mocker):
+    pytest.importorskip("opentelemetry")
+    meter = mocker.Mock()
+    instrumentation = OpenTelemetryInstrumentation(meter=meter, tag_spans=False)
+
+    instrumentation.record_event("e", HIT)
+
+    instrumentation.events.add.assert_called_once_with(
+        1, {"endpoint": "e", "event": HIT}
+    )
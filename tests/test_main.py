@@ -4,9 +4,16 @@ from ultra_cache.storage.inmemory import InMemoryStorage
 import pytest
 
 from ultra_cache.storage.redis import RedisStorage
+from ultra_cache.storage.tiered import TieredStorage
 
 
-@pytest.fixture(params=[InMemoryStorage(), RedisStorage(FakeAsyncRedis())])
+@pytest.fixture(
+    params=[
+        InMemoryStorage(),
+        RedisStorage(FakeAsyncRedis()),
+        TieredStorage(RedisStorage(FakeAsyncRedis())),
+    ]
+)
 def storage(request):
     return request.param
 
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+from pydantic import BaseModel
+
+from ultra_cache.serializers import (
+    JsonSerializer,
+    MsgpackSerializer,
+    PickleSerializer,
+    PydanticSerializer,
+    get_serializer,
+)
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_serializer(use_orjson):
+    serializer = JsonSerializer(use_orjson=use_orjson)
+    value = {"items": [1, 2, 3], "name": "name", "nested": {"x": None}}
+
+    data = serializer.dumps(value)
+
+    assert isinstance(data, bytes)
+    assert serializer.loads(data) == value
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_serializer_pydantic_model(use_orjson):
+    serializer = JsonSerializer(use_orjson=use_orjson)
+    value = {"item": Item(id=1, name="x"), "at": datetime(2024, 1, 1)}
+
+    assert serializer.loads(serializer.dumps(value)) == {
+        "item": {"id": 1, "name": "x"},
+        "at": "2024-01-01T00:00:00",
+    }
+
+
+@pytest.mark.parametrize("sort_keys", [True, False])
+def test_json_serializer_same_bytes_without_orjson(sort_keys):
+    pytest.importorskip("orjson")
+    value = {"name": "café ☕", "b": {2: [1.5, None, True]}, "a": "\u2028"}
+
+    assert JsonSerializer(sort_keys=sort_keys).dumps(value) == JsonSerializer(
+        use_orjson=False, sort_keys=sort_keys
+    ).dumps(value)
+
+
+def test_pickle_serializer():
+    serializer = PickleSerializer()
+    value = (Item(id=1, name="x"), {1, 2})
+
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_msgpack_serializer():
+    pytest.importorskip("msgpack")
+    serializer = MsgpackSerializer()
+    value = {"items": [1, 2, 3], "raw": b"bytes"}
+
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_pydantic_serializer_model():
+    serializer = PydanticSerializer(Item)
+    value = Item(id=1, name="x")
+
+    assert serializer.dumps(value) == b'{"id":1,"name":"x"}'
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_pydantic_serializer_model_from_dict():
+    serializer = PydanticSerializer(Item)
+
+    assert serializer.loads(serializer.dumps({"id": 1, "name": "x"})) == Item(
+        id=1, name="x"
+    )
+
+
+def test_pydantic_serializer_list():
+    serializer = PydanticSerializer(list[Item])
+    value = [Item(id=1, name="x"), Item(id=2, name="y")]
+
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_get_serializer():
+    assert isinstance(get_serializer("json"), JsonSerializer)
+    assert isinstance(get_serializer("pickle"), PickleSerializer)
+    assert isinstance(get_serializer("pydantic", Item), PydanticSerializer)
+
+    serializer = PickleSerializer()
+    assert get_serializer(serializer) is serializer
+
+    with pytest.raises(ValueError):
+        get_serializer("pydantic")
+    with pytest.raises(ValueError):
+        get_serializer("yaml")
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from ultra_cache.single_flight import SingleFlight
+
+
+@pytest.mark.anyio
+async def test_single_flight_shares_result():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def _fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    results = await asyncio.gather(*[single_flight.do("key", _fn) for _ in range(5)])
+
+    assert calls == 1
+    assert [r for r, _ in results] == [1] * 5
+    assert [shared for _, shared in results].count(False) == 1
+    assert len(single_flight) == 0
+
+
+@pytest.mark.anyio
+async def test_single_flight_different_keys():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def _fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    await asyncio.gather(single_flight.do("key1", _fn), single_flight.do("key2", _fn))
+
+    assert calls == 2
+
+
+@pytest.mark.anyio
+async def test_single_flight_waiter_timeout_falls_back():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def _fn():
+        nonlocal calls
+        calls += 1
+        call = calls
+        await asyncio.sleep(0.2 if call == 1 else 0)
+        return call
+
+    leader = asyncio.create_task(single_flight.do("key", _fn))
+    await asyncio.sleep(0)
+    result, shared = await single_flight.do("key", _fn, timeout=0.01)
+
+    assert (result, shared) == (2, False)
+    assert await leader == (1, False)
+
+
+@pytest.mark.anyio
+async def test_single_flight_propagates_exception():
+    single_flight = SingleFlight()
+
+    async def _fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *[single_flight.do("key", _fn) for _ in range(3)], return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(single_flight) == 0
+
+
+@pytest.mark.anyio
+async def test_single_flight_leader_cancelled():
+    single_flight = SingleFlight()
+
+    async def _slow():
+        await asyncio.sleep(10)
+
+    async def _fast():
+        return "fast"
+
+    leader = asyncio.create_task(single_flight.do("key", _slow))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(single_flight.do("key", _fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await waiter == ("fast", False)
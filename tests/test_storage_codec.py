@@ -0,0 +1,31 @@
+from ultra_cache.serializers import BytesSerializer, JsonSerializer
+from ultra_cache.storage.base import CacheEntry
+from ultra_cache.storage.codec import dump_entry, load_entry
+
+
+def test_dump_and_load_entry():
+    serializer = JsonSerializer()
+    entry = CacheEntry(
+        {"id": 1}, ttl=60, stale_ttl=30, created_at=1000.5, compute_time=0.25
+    )
+
+    raw = dump_entry(entry, serializer)
+
+    assert load_entry(raw, serializer) == entry
+    assert load_entry(memoryview(raw), serializer) == entry
+
+
+def test_dump_and_load_encoded_body():
+    serializer = BytesSerializer()
+    entry = CacheEntry(
+        b'{"id":1}', ttl=60, etag='"abc"', content_type="application/json"
+    )
+
+    assert load_entry(dump_entry(entry, serializer), serializer) == entry
+
+
+def test_load_entry_without_metadata():
+    entry = load_entry(b"value", JsonSerializer())
+
+    assert entry.value == b"value"
+    assert entry.ttl is None
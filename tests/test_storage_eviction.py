@@ -0,0 +1,149 @@
+import random
+
+import pytest
+
+from ultra_cache.storage.eviction import (
+    CountMinSketch,
+    LFUPolicy,
+    LRUPolicy,
+    TinyLFUPolicy,
+    estimate_size,
+    get_policy,
+)
+
+
+def test_lru_policy():
+    policy = LRUPolicy()
+    for key in ["a", "b", "c"]:
+        policy.insert(key)
+
+    policy.access("a")
+    assert policy.victim("d") == "b"
+
+    policy.remove("b")
+    assert policy.victim("d") == "c"
+
+
+def test_lfu_policy():
+    policy = LFUPolicy()
+    for key in ["a", "b", "c"]:
+        policy.insert(key)
+
+    policy.access("a")
+    policy.access("a")
+    policy.access("c")
+    assert policy.victim("d") == "b"
+
+    policy.remove("b")
+    assert policy.victim("d") == "c"
+
+    policy.remove("c")
+    assert policy.victim("d") == "a"
+
+    # evicting the only key of the least frequent bucket
+    policy.insert("d")
+    policy.remove("d")
+    policy.insert("e")
+    assert policy.victim("f") == "e"
+    policy.remove("e")
+    assert policy.victim("f") == "a"
+
+
+def test_lfu_policy_empty():
+    policy = LFUPolicy()
+    assert policy.victim("a") == "a"
+
+    policy.insert("a")
+    policy.access("a")
+    policy.remove("a")
+    assert policy.victim("b") == "b"
+
+
+def test_lfu_policy_matches_a_full_scan():
+    rng = random.Random(0)
+    policy = LFUPolicy()
+    # key -> (frequency, when it reached it)
+    expected: dict[str, tuple[int, int]] = {}
+    for step in range(5000):
+        key = f"k{rng.randrange(20)}"
+        operation = rng.random()
+        if operation < 0.4:
+            policy.insert(key)
+            frequency = expected[key][0] + 1 if key in expected else 1
+            expected[key] = (frequency, step)
+        elif operation < 0.8:
+            policy.access(key)
+            if key in expected:
+                expected[key] = (expected[key][0] + 1, step)
+        elif operation < 0.99:
+            policy.remove(key)
+            expected.pop(key, None)
+        else:
+            policy.clear()
+            expected.clear()
+
+        least_frequent = min(expected, key=expected.__getitem__, default="new")
+        assert policy.victim("new") == least_frequent
+
+
+def test_count_min_sketch():
+    sketch = CountMinSketch(width=64, sample_size=1000)
+    for _ in range(10):
+        sketch.add("hot")
+    sketch.add("cold")
+
+    assert sketch.estimate("hot") >= 10
+    assert sketch.estimate("cold") >= 1
+    assert sketch.estimate("hot") > sketch.estimate("cold")
+
+
+def test_count_min_sketch_ages():
+    sketch = CountMinSketch(width=64, sample_size=8)
+    for _ in range(8):
+        sketch.add("key")
+
+    assert sketch.estimate("key") == 4
+
+
+def test_tinylfu_policy_keeps_popular_keys():
+    policy = TinyLFUPolicy(window_size=1)
+    policy.insert("hot")
+    for _ in range(5):
+        policy.access("hot")
+    policy.insert("cold")
+
+    # "cold" pushed "hot" out of the window, but was seen less often
+    assert policy.victim("new") == "cold"
+    policy.remove("cold")
+    policy.insert("new")
+    assert policy.victim("newer") == "new"
+
+
+def test_tinylfu_policy_admits_popular_window_keys():
+    policy = TinyLFUPolicy(window_size=1)
+    policy.insert("old")
+    policy.insert("new")
+    for _ in range(5):
+        policy.access("new")
+
+    assert policy.victim("newer") == "old"
+
+
+def test_get_policy():
+    assert isinstance(get_policy("lru"), LRUPolicy)
+    assert isinstance(get_policy("lfu"), LFUPolicy)
+    assert isinstance(get_policy("tinylfu"), TinyLFUPolicy)
+
+    policy = LRUPolicy()
+    assert get_policy(policy) is policy
+
+    with pytest.raises(ValueError):
+        get_policy("fifo")
+
+
+def test_estimate_size():
+    small = estimate_size({"a": 1})
+    large = estimate_size({"a": list(range(1000))})
+
+    assert small > 0
+    assert large > small
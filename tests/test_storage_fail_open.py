@@ -0,0 +1,170 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import Request, Response
+import pytest
+
+from ultra_cache.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from ultra_cache.decorator import UltraCache
+from ultra_cache.instrumentation import (
+    ERROR,
+    SHORT_CIRCUITED,
+    InMemoryRecorder,
+)
+from ultra_cache.storage.base import CacheEntry
+from ultra_cache.storage.fail_open import FailOpenStorage
+from ultra_cache.storage.inmemory import InMemoryStorage
+
+
+class FlakyStorage(InMemoryStorage):
+    """Fails or stalls on demand."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.error: bool = False
+        self.delay: float = 0.0
+        self.calls = 0
+
+    async def _trouble(self) -> None:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            raise ConnectionError("down")
+
+    async def get_entry(self, key, serializer=None):
+        await self._trouble()
+        return await super().get_entry(key, serializer)
+
+    async def save_entry(self, key, entry, serializer=None):
+        await self._trouble()
+        await super().save_entry(key, entry, serializer)
+
+    @asynccontextmanager
+    async def lock(self, key, timeout=None):
+        await self._trouble()
+        yield True
+
+
+@pytest.fixture
+def flaky():
+    return FlakyStorage()
+
+
+@pytest.fixture
+def recorder():
+    return InMemoryRecorder()
+
+
+@pytest.fixture
+def storage(flaky: FlakyStorage, recorder: InMemoryRecorder):
+    return FailOpenStorage(
+        flaky,
+        get_timeout=0.05,
+        save_timeout=0.05,
+        breaker=CircuitBreaker(failure_threshold=3, recovery_time=0.1),
+        instrumentation=recorder,
+        name="flaky",
+    )
+
+
+@pytest.mark.anyio
+async def test_passes_through(storage: FailOpenStorage):
+    await storage.save("key", "value")
+    await storage.save_many({"other": CacheEntry(1)})
+
+    assert await storage.get("key") == "value"
+    assert [e and e.value for e in await storage.get_many(["other", "x"])] == [1, None]
+    assert storage.stats["state"] == CLOSED
+
+    await storage.delete("key")
+    assert await storage.get("key") is None
+
+
+@pytest.mark.anyio
+async def test_errors_are_misses(
+    storage: FailOpenStorage, flaky: FlakyStorage, recorder: InMemoryRecorder
+):
+    await storage.save("key", "value")
+    flaky.error = True
+
+    assert await storage.get("key") is None
+    await storage.save("key", "other")
+
+    assert storage.stats["errors"] == 2
+    assert recorder.fallbacks["flaky", "get", ERROR] == 1
+    assert recorder.fallbacks["flaky", "save", ERROR] == 1
+
+
+@pytest.mark.anyio
+async def test_timeouts_are_misses(storage: FailOpenStorage, flaky: FlakyStorage):
+    await storage.save("key", "value")
+    flaky.delay = 1
+
+    assert await storage.get("key") is None
+    assert await storage.get_many(["key", "other"]) == [None, None]
+    await storage.save("key", "other")
+
+    assert storage.stats["timeouts"] == 3
+
+
+@pytest.mark.anyio
+async def test_breaker(
+    storage: FailOpenStorage, flaky: FlakyStorage, recorder: InMemoryRecorder
+):
+    flaky.error = True
+    for _ in range(3):
+        await storage.get("key")
+    assert recorder.breaker_states["flaky"] == OPEN
+
+    # the backend is left alone while the breaker is open
+    assert await storage.get("key") is None
+    assert flaky.calls == 3
+    assert recorder.fallbacks["flaky", "get", SHORT_CIRCUITED] == 1
+
+    await asyncio.sleep(0.1)
+    assert storage.breaker.state == HALF_OPEN
+    flaky.error = False
+    await storage.save("key", "value")
+    assert recorder.breaker_states["flaky"] == CLOSED
+    assert await storage.get("key") == "value"
+    assert storage.stats == {
+        "state": CLOSED,
+        "trips": 1,
+        "timeouts": 0,
+        "errors": 3,
+        "short_circuited": 1,
+    }
+
+
+@pytest.mark.anyio
+async def test_lock(storage: FailOpenStorage, flaky: FlakyStorage):
+    async with storage.lock("key") as acquired:
+        assert acquired
+
+    flaky.error = True
+    async with storage.lock("key") as acquired:
+        assert not acquired
+
+    with pytest.raises(ValueError):
+        async with storage.lock("key"):
+            raise ValueError
+
+
+@pytest.mark.anyio
+async def test_endpoint_is_served(flaky: FlakyStorage):
+    flaky.error = True
+    cache = UltraCache(storage=FailOpenStorage(flaky))
+    calls = 0
+
+    @cache(ttl=60)
+    async def _fn(item_id: int):
+        nonlocal calls
+        calls += 1
+        return {"id": item_id}
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    response = Response()
+    assert await _fn(1, request=request, response=response) == {"id": 1}
+    assert response.headers["X-Cache"] == "MISS"
+    assert calls == 1
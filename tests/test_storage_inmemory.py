@@ -1,3 +1,6 @@
+from ultra_cache.compression import Compression, GzipCompressor
+from ultra_cache.serializers import JsonSerializer
+from ultra_cache.storage.base import CacheEntry
 from ultra_cache.storage.inmemory import InMemoryStorage
 import pytest
 from datetime import timedelta
@@ -38,3 +41,229 @@ async def test_save_and_get_with_ttl_expired(storage: InMemoryStorage):
 
     with freeze_time(save_time + timedelta(seconds=100)):
         assert await storage.get(key) is None
+
+
+@pytest.mark.anyio
+async def test_delete():
+    storage = InMemoryStorage(max_entries=2)
+    await storage.save("key1", "value1")
+    await storage.save("key2", "value2")
+
+    await storage.delete("key1")
+    await storage.delete("missing")
+
+    assert await storage.get("key1") is None
+    assert len(storage) == 1
+    assert storage.policy.victim("key3") == "key2"
+
+
+@pytest.mark.anyio
+async def test_save_many_get_many_delete_many(storage: InMemoryStorage):
+    await storage.save_many({"key1": CacheEntry("value1"), "key2": CacheEntry(2)})
+    await storage.delete_many(["key2"])
+
+    entries = await storage.get_many(["key1", "key2"])
+
+    assert entries[0].value == "value1"
+    assert entries[1] is None
+
+
+@pytest.mark.anyio
+async def test_invalidate_tags():
+    storage = InMemoryStorage(max_entries=3)
+    await storage.save_entry("a", CacheEntry(1, tags=("items", "item:1")))
+    await storage.save_entry("b", CacheEntry(2, tags=("items",)))
+    # overwriting drops the previous tags
+    await storage.save_entry("b", CacheEntry(2, tags=("item:2",)))
+    await storage.save_entry("c", CacheEntry(3))
+
+    assert await storage.invalidate_tags(["items"]) == 1
+    assert list(storage.storage) == ["b", "c"]
+
+    # evicted items leave the index
+    await storage.save("d", 4)
+    await storage.save("e", 5)
+    assert "b" not in storage.storage
+    assert await storage.invalidate_tags(["item:2"]) == 0
+    assert storage._tags == {}
+
+
+@pytest.mark.anyio
+async def test_get_entry_stale(storage: InMemoryStorage):
+    key = "key"
+    value = "value"
+    with freeze_time(utc_now()) as frozen_time:
+        await storage.save_entry(key, CacheEntry(value, ttl=60, stale_ttl=30))
+
+        frozen_time.tick(timedelta(seconds=70))
+        assert await storage.get(key) is None
+        entry = await storage.get_entry(key)
+        assert entry.value == value
+        assert entry.stale
+        assert 9 <= entry.staleness <= 11
+
+        frozen_time.tick(timedelta(seconds=30))
+        assert await storage.get_entry(key) is None
+        assert key not in storage.storage
+
+
+@pytest.mark.anyio
+async def test_get_entry_metadata(storage: InMemoryStorage):
+    await storage.save("plain", "value", ttl=60)
+    entry = CacheEntry(
+        "value",
+        ttl=60,
+        etag='W/"1"',
+        content_type="text/plain",
+        tags=("t",),
+        compute_time=0.5,
+    )
+    await storage.save_entry("key", entry)
+
+    # only items saved with metadata carry it
+    assert storage.storage["plain"].meta is None
+    assert (await storage.get_entry("plain")).etag is None
+    cached = await storage.get_entry("key")
+    assert cached.ttl == 60
+    assert (cached.etag, cached.content_type, cached.tags, cached.compute_time) == (
+        'W/"1"',
+        "text/plain",
+        ("t",),
+        0.5,
+    )
+
+
+@pytest.mark.anyio
+async def test_max_entries_lru():
+    storage = InMemoryStorage(max_entries=2)
+    await storage.save("a", 1)
+    await storage.save("b", 2)
+    await storage.get("a")
+    await storage.save("c", 3)
+
+    assert len(storage) == 2
+    assert await storage.get("b") is None
+    assert await storage.get("a") == 1
+    assert await storage.get("c") == 3
+    assert storage.evictions == 1
+
+
+@pytest.mark.anyio
+async def test_max_entries_overwrite_does_not_evict():
+    storage = InMemoryStorage(max_entries=2)
+    await storage.save("a", 1)
+    await storage.save("b", 2)
+    await storage.save("a", 3)
+
+    assert await storage.get("a") == 3
+    assert await storage.get("b") == 2
+    assert storage.evictions == 0
+
+
+@pytest.mark.anyio
+async def test_max_entries_lfu():
+    storage = InMemoryStorage(max_entries=2, eviction="lfu")
+    await storage.save("a", 1)
+    await storage.save("b", 2)
+    await storage.get("a")
+    await storage.get("b")
+    await storage.get("b")
+    await storage.save("c", 3)
+
+    assert await storage.get("a") is None
+    assert await storage.get("b") == 2
+
+
+@pytest.mark.anyio
+async def test_max_bytes():
+    storage = InMemoryStorage(max_bytes=100, sizeof=len)
+    await storage.save("a", "x" * 40)
+    await storage.save("b", "x" * 40)
+    assert storage.nbytes == 80
+
+    await storage.save("c", "x" * 40)
+    assert storage.nbytes == 80
+    assert await storage.get("a") is None
+    assert storage.evictions == 1
+
+    # larger than the whole budget
+    await storage.save("d", "x" * 200)
+    assert await storage.get("d") is None
+    assert storage.rejections == 1
+    assert storage.nbytes == 80
+
+
+@pytest.mark.anyio
+async def test_expired_items_are_purged(storage: InMemoryStorage):
+    with freeze_time(utc_now()) as frozen_time:
+        await storage.save("short", "value", ttl=10)
+        await storage.save("long", "value", ttl=1000)
+        await storage.save("forever", "value")
+
+        frozen_time.tick(timedelta(seconds=100))
+        await storage.save("other", "value")
+
+        assert "short" not in storage.storage
+        assert len(storage) == 3
+        assert storage.expirations == 1
+
+
+@pytest.mark.anyio
+async def test_overwritten_items_are_not_purged(storage: InMemoryStorage):
+    with freeze_time(utc_now()) as frozen_time:
+        await storage.save("key", "old", ttl=10)
+        await storage.save("key", "new", ttl=1000)
+
+        frozen_time.tick(timedelta(seconds=100))
+        assert storage.purge_expired() == 0
+        assert await storage.get("key") == "new"
+
+
+@pytest.mark.anyio
+async def test_stats():
+    storage = InMemoryStorage(max_entries=1, sizeof=len)
+    await storage.save("a", "xx")
+    await storage.save("b", "xxx")
+
+    assert storage.stats == {
+        "size": 1,
+        "nbytes": 3,
+        "evictions": 1,
+        "expirations": 0,
+        "rejections": 0,
+    }
+
+    await storage.clear()
+    assert len(storage) == 0
+    assert storage.nbytes == 0
+
+
+@pytest.mark.anyio
+async def test_expiry_heap_is_compacted(storage: InMemoryStorage):
+    for i in range(1000):
+        await storage.save("key", i, ttl=1000)
+
+    assert len(storage._expiry) <= 2 + storage.EXPIRE_BATCH_SIZE
+    assert await storage.get("key") == 999
+
+
+@pytest.mark.anyio
+async def test_save_and_get_with_serializer():
+    storage = InMemoryStorage(serializer=JsonSerializer())
+    value = {"items": [1, 2]}
+    await storage.save("key", value)
+
+    assert isinstance(storage.storage["key"].data, bytes)
+    assert await storage.get("key") == value
+    assert (await storage.get_entry("key")).value == value
+
+
+@pytest.mark.anyio
+async def test_save_and_get_with_compression():
+    storage = InMemoryStorage(compression=Compression(GzipCompressor(), threshold=0))
+    value = {"items": [{"id": 1, "name": "item"}] * 100}
+    await storage.save("key", value)
+
+    assert isinstance(storage.storage["key"].data, bytes)
+    assert await storage.get("key") == value
+    assert storage.compression.compressed == 1
@@ -0,0 +1,97 @@
+import asyncio
+from fakeredis import FakeAsyncRedis, FakeServer
+import pytest
+from redis.exceptions import ConnectionError
+
+from ultra_cache.storage.inmemory import InMemoryStorage
+from ultra_cache.storage.invalidation import InvalidationListener
+from ultra_cache.storage.redis import RedisStorage
+from ultra_cache.storage.tiered import TieredStorage
+
+
+class Node:
+    def __init__(self, server: FakeServer) -> None:
+        self.l2 = RedisStorage(
+            FakeAsyncRedis(server=server), invalidation_channel="invalidations"
+        )
+        self.storage = TieredStorage(self.l2, l1=InMemoryStorage(), l1_ttl=None)
+        self.listener = InvalidationListener(
+            self.l2, self.storage.l1, reconnect_delay=0
+        )
+
+
+async def _eventually(predicate, timeout: float = 2) -> None:
+    async def _poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(_poll(), timeout)
+
+
+@pytest.fixture
+async def nodes():
+    server = FakeServer()
+    nodes = [Node(server), Node(server)]
+    for node in nodes:
+        await node.listener.start()
+        await node.listener.subscribed.wait()
+    yield nodes
+    for node in nodes:
+        await node.listener.stop()
+
+
+@pytest.mark.anyio
+async def test_overwrite_evicts_other_nodes(nodes: list[Node]):
+    a, b = nodes
+    await a.storage.save("key", "v1", ttl=60)
+    assert (await b.storage.get("key")) == "v1"
+    assert "key" in b.storage.l1.storage
+
+    await a.storage.save("key", "v2", ttl=60)
+    await _eventually(lambda: "key" not in b.storage.l1.storage)
+
+    assert (await b.storage.get("key")) == "v2"
+    # own writes are not evicted
+    assert "key" in a.storage.l1.storage
+    assert a.listener.invalidations == 0
+
+
+@pytest.mark.anyio
+async def test_delete_and_clear_evict_other_nodes(nodes: list[Node]):
+    a, b = nodes
+    await a.storage.save("key", "value", ttl=60)
+    await a.storage.save("other", "value", ttl=60)
+    await b.storage.get("key")
+    await b.storage.get("other")
+
+    await a.storage.delete("key")
+    await _eventually(lambda: "key" not in b.storage.l1.storage)
+    assert "other" in b.storage.l1.storage
+
+    await a.storage.clear()
+    await _eventually(lambda: len(b.storage.l1) == 0)
+
+
+@pytest.mark.anyio
+async def test_reconnect_flushes_local(mocker):
+    node = Node(FakeServer())
+    await node.storage.save("key", "value", ttl=60)
+
+    pubsub = node.l2.redis.pubsub
+    broken = mocker.MagicMock()
+    broken.subscribe = mocker.AsyncMock(side_effect=ConnectionError)
+    broken.aclose = mocker.AsyncMock()
+    mocker.patch.object(node.l2.redis, "pubsub", side_effect=[broken, pubsub()])
+
+    await node.listener.start()
+    await node.listener.subscribed.wait()
+    await node.listener.stop()
+
+    assert node.listener.reconnects == 1
+    assert len(node.storage.l1) == 0
+    assert (await node.storage.get("key")) == "value"
+
+
+def test_listener_requires_channel():
+    with pytest.raises(ValueError):
+        InvalidationListener(RedisStorage(FakeAsyncRedis()), InMemoryStorage())
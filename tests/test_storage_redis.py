@@ -1,4 +1,10 @@
+import asyncio
+from unittest.mock import ANY
+from ultra_cache.compression import Compression, GzipCompressor
+from ultra_cache.serializers import PickleSerializer
+from ultra_cache.storage.base import CacheEntry
 from ultra_cache.storage.redis import RedisStorage
+from redis.asyncio.cluster import RedisCluster
 from fakeredis import FakeAsyncRedis
 import pytest
 from datetime import timedelta
@@ -9,7 +15,7 @@ from ultra_cache.utils import utc_now
 
 @pytest.fixture
 async def storage(mocker):
-    redis_instance = FakeAsyncRedis(decode_responses=True)
+    redis_instance = FakeAsyncRedis()
     mocker.spy(redis_instance, "set")
     mocker.spy(redis_instance, "get")
     mocker.spy(redis_instance, "keys")
@@ -23,7 +29,7 @@ async def test_save_and_get(storage: RedisStorage):
     value = "value"
     await storage.save(key, value)
 
-    storage.redis.set.assert_called_once_with(f"ultra-cache:{key}", value, ex=None)
+    storage.redis.set.assert_called_once_with(f"ultra-cache:{key}", ANY, ex=None)
     assert await storage.get(key) == value
     storage.redis.get.assert_called_once_with(f"ultra-cache:{key}")
 
@@ -35,7 +41,7 @@ async def test_save_and_get_with_ttl(storage: RedisStorage):
     ttl = 60
     await storage.save(key, value, ttl=ttl)
 
-    storage.redis.set.assert_called_once_with(f"ultra-cache:{key}", value, ex=ttl)
+    storage.redis.set.assert_called_once_with(f"ultra-cache:{key}", ANY, ex=ttl)
     assert await storage.get(key) == value
     storage.redis.get.assert_called_once_with(f"ultra-cache:{key}")
 
@@ -48,7 +54,7 @@ async def test_save_and_get_with_ttl_expired(storage: RedisStorage):
     save_time = utc_now()
     await storage.save(key, value, ttl=ttl)
 
-    storage.redis.set.assert_called_once_with(f"ultra-cache:{key}", value, ex=ttl)
+    storage.redis.set.assert_called_once_with(f"ultra-cache:{key}", ANY, ex=ttl)
 
     with freeze_time(save_time + timedelta(seconds=100)):
         assert await storage.get(key) is None
@@ -66,7 +72,233 @@ async def test_clear(storage: RedisStorage):
 
     await storage.clear()
 
-    storage.redis.keys.assert_called_once_with("ultra-cache:*")
-    storage.redis.delete.assert_called_once()
+    storage.redis.keys.assert_not_called()
     assert await storage.get(key1) is None
     assert await storage.get(key2) is None
+
+
+@pytest.mark.anyio
+async def test_clear_in_batches(mocker):
+    redis = FakeAsyncRedis()
+    storage = RedisStorage(redis, batch_size=10)
+    other = RedisStorage(redis, prefix="other")
+    spy_on_unlink = mocker.spy(redis, "unlink")
+    await storage.save_many({f"key{i}": CacheEntry(i) for i in range(25)})
+    await other.save("key", "value")
+
+    await storage.clear()
+
+    assert spy_on_unlink.call_count == 3
+    assert await redis.dbsize() == 1
+    assert await other.get("key") == "value"
+
+
+@pytest.mark.anyio
+async def test_invalidate_pattern(storage: RedisStorage):
+    await storage.save_many(
+        {"items:1": CacheEntry(1), "items:2": CacheEntry(2), "users:1": CacheEntry(3)}
+    )
+
+    assert await storage.invalidate_pattern("items:*") == 2
+
+    assert await storage.get("items:1") is None
+    assert await storage.get("users:1") == 3
+
+
+@pytest.mark.anyio
+async def test_invalidate_tags(storage: RedisStorage):
+    await storage.save_many(
+        {
+            "a": CacheEntry(1, ttl=60, tags=("item:1", "items")),
+            "b": CacheEntry(2, ttl=120, tags=("item:2", "items")),
+            "c": CacheEntry(3, tags=("users",)),
+        }
+    )
+    assert 60 < await storage.redis.ttl("ultra-cache:tag:items") <= 120
+    assert await storage.redis.ttl("ultra-cache:tag:users") == -1
+    assert (await storage.get_entry("a")).tags == ("item:1", "items")
+
+    assert await storage.invalidate_tags(["item:1"]) == 1
+    assert await storage.get("a") is None
+    assert await storage.get("b") == 2
+
+    assert await storage.invalidate_tags(["items", "users"]) == 2
+    assert await storage.get("b") is None
+    assert await storage.get("c") is None
+    # sets of other tags expire along with the entries they listed
+    assert await storage.redis.exists("ultra-cache:tag:item:2")
+
+
+@pytest.mark.anyio
+async def test_tag_set_outlives_entries(storage: RedisStorage):
+    await storage.save_entry("c", CacheEntry(3, tags=("t",)))
+    await storage.save_entry("d", CacheEntry(4, ttl=1, tags=("t",)))
+    # still listing an entry that never expires
+    assert await storage.redis.ttl("ultra-cache:tag:t") == -1
+
+    await storage.save_entry("e", CacheEntry(5, ttl=60, tags=("u",)))
+    await storage.save_entry("f", CacheEntry(6, ttl=1, tags=("u",)))
+    assert 1 < await storage.redis.ttl("ultra-cache:tag:u") <= 60
+    await storage.save_entry("g", CacheEntry(7, tags=("u",)))
+    assert await storage.redis.ttl("ultra-cache:tag:u") == -1
+
+    assert await storage.invalidate_tags(["t"]) == 2
+    assert await storage.get("c") is None
+
+
+@pytest.mark.anyio
+async def test_tag_set_is_pruned(storage: RedisStorage):
+    save_time = utc_now()
+    await storage.save_entry("a", CacheEntry(1, ttl=1, tags=("t",)))
+
+    with freeze_time(save_time + timedelta(seconds=5)):
+        await storage.save_entry("b", CacheEntry(2, ttl=60, tags=("t",)))
+        assert await storage.redis.zrange("ultra-cache:tag:t", 0, -1) == [
+            b"ultra-cache:b"
+        ]
+
+
+@pytest.mark.anyio
+async def test_tag_set_expires_after_its_entries(storage: RedisStorage):
+    await storage.save_entry("a", CacheEntry(1, ttl=1, tags=("t",)))
+    await asyncio.sleep(0.3)
+    await storage.save_entry("b", CacheEntry(2, ttl=1, tags=("t",)))
+
+    # within the second TTL rounds to, the set must still be extended
+    assert await storage.redis.pttl("ultra-cache:tag:t") >= await storage.redis.pttl(
+        "ultra-cache:b"
+    )
+
+
+@pytest.mark.anyio
+async def test_delete(storage: RedisStorage):
+    await storage.save("key1", "value1")
+    await storage.save("key2", "value2")
+
+    await storage.delete("key1")
+
+    storage.redis.delete.assert_called_once_with("ultra-cache:key1")
+    assert await storage.get("key1") is None
+    assert await storage.get("key2") == "value2"
+
+
+@pytest.mark.anyio
+async def test_lock(storage: RedisStorage):
+    pytest.importorskip("lupa")
+    key = "key"
+
+    async with storage.lock(key, timeout=0.1) as acquired:
+        assert acquired is True
+        async with storage.lock(key, timeout=0.1) as acquired_again:
+            assert acquired_again is False
+
+    async with storage.lock(key, timeout=0.1) as acquired:
+        assert acquired is True
+
+
+@pytest.mark.anyio
+async def test_get_entry_stale(storage: RedisStorage):
+    key = "key"
+    value = "value"
+    save_time = utc_now()
+    await storage.save_entry(key, CacheEntry(value, ttl=60, stale_ttl=30))
+
+    storage.redis.set.assert_called_once_with(f"ultra-cache:{key}", ANY, ex=90)
+
+    with freeze_time(save_time + timedelta(seconds=70)):
+        assert await storage.get(key) is None
+        entry = await storage.get_entry(key)
+        assert entry.value == value
+        assert entry.ttl == 60
+        assert entry.stale
+        assert 9 <= entry.staleness <= 11
+
+    with freeze_time(save_time + timedelta(seconds=100)):
+        assert await storage.get_entry(key) is None
+
+
+@pytest.mark.anyio
+async def test_get_entry_without_metadata(storage: RedisStorage):
+    await storage.redis.set("ultra-cache:key", "value")
+
+    entry = await storage.get_entry("key")
+
+    assert entry.value == b"value"
+    assert not entry.stale
+
+
+@pytest.mark.anyio
+async def test_save_and_get_dict(storage: RedisStorage):
+    value = {"items": [{"id": 1}, {"id": 2}], "total": 2}
+    await storage.save("key", value)
+
+    assert await storage.get("key") == value
+
+
+@pytest.mark.anyio
+async def test_save_and_get_entry_with_serializer(storage: RedisStorage):
+    value = ("tuple", {1, 2})
+    serializer = PickleSerializer()
+    await storage.save_entry("key", CacheEntry(value), serializer=serializer)
+
+    entry = await storage.get_entry("key", serializer=serializer)
+    assert entry.value == value
+
+
+@pytest.mark.anyio
+async def test_save_and_get_with_compression(storage: RedisStorage):
+    value = {"items": [{"id": i, "name": "item"} for i in range(100)]}
+    await storage.save("uncompressed", value)
+    storage.compression = Compression(GzipCompressor(), threshold=100)
+    await storage.save("compressed", value)
+
+    uncompressed = await storage.redis.get("ultra-cache:uncompressed")
+    compressed = await storage.redis.get("ultra-cache:compressed")
+    assert len(compressed) < len(uncompressed)
+
+    assert await storage.get("compressed") == value
+    assert await storage.get("uncompressed") == value
+
+
+@pytest.mark.anyio
+async def test_save_many_and_get_many(storage: RedisStorage, mocker):
+    spy_on_mget = mocker.spy(storage.redis, "mget")
+    spy_on_pipeline = mocker.spy(storage.redis, "pipeline")
+
+    await storage.save_many(
+        {"key1": CacheEntry("value1", ttl=60), "key2": CacheEntry({"id": 2})}
+    )
+    entries = await storage.get_many(["key1", "missing", "key2"])
+
+    spy_on_pipeline.assert_called_once()
+    spy_on_mget.assert_called_once_with(
+        ["ultra-cache:key1", "ultra-cache:missing", "ultra-cache:key2"]
+    )
+    assert [e and e.value for e in entries] == ["value1", None, {"id": 2}]
+    assert entries[0].ttl == 60
+    assert 0 < await storage.redis.ttl("ultra-cache:key1") <= 60
+
+
+@pytest.mark.anyio
+async def test_get_many_on_a_cluster(mocker):
+    cluster = mocker.AsyncMock(spec=RedisCluster)
+    cluster.mget_nonatomic.return_value = [None]
+    storage = RedisStorage(cluster)
+
+    assert await storage.get_many(["{users}:1"]) == [None]
+
+    cluster.mget_nonatomic.assert_called_once_with(["ultra-cache:{users}:1"])
+    cluster.mget.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_delete_many(storage: RedisStorage):
+    await storage.save_many({f"key{i}": CacheEntry(i) for i in range(3)})
+
+    await storage.delete_many(["key0", "key1"])
+
+    storage.redis.delete.assert_called_once_with("ultra-cache:key0", "ultra-cache:key1")
+    assert [e and e.value for e in await storage.get_many(["key0", "key2"])] == [
+        None,
+        2,
+    ]
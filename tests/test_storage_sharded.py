@@ -0,0 +1,131 @@
+from fakeredis import FakeAsyncRedis, FakeServer
+import pytest
+
+from ultra_cache.storage.base import CacheEntry
+from ultra_cache.storage.inmemory import InMemoryStorage
+from ultra_cache.storage.redis import RedisStorage
+from ultra_cache.storage.sharded import HashRing, ShardedStorage, hash_tag
+
+
+@pytest.fixture
+def storage():
+    # separate servers, as separate nodes would be
+    return ShardedStorage(
+        {
+            name: RedisStorage(FakeAsyncRedis(server=FakeServer()))
+            for name in ["a", "b", "c"]
+        }
+    )
+
+
+def test_hash_tag():
+    assert hash_tag("users:1") == b"users:1"
+    assert hash_tag("{users}:1") == b"users"
+    assert hash_tag("a{users}:{1}") == b"users"
+    assert hash_tag("{}:1") == b"{}:1"
+    assert hash_tag("{users:1") == b"{users:1"
+
+
+def test_ring_spreads_keys():
+    ring = HashRing(["a", "b", "c", "d"])
+    keys = [f"key:{i}" for i in range(10_000)]
+
+    counts = {node: 0 for node in "abcd"}
+    for key in keys:
+        counts[ring.get(key)] += 1
+    assert all(2000 < count < 3000 for count in counts.values())
+
+
+def test_ring_moves_few_keys():
+    ring = HashRing(["a", "b", "c"])
+    keys = [f"key:{i}" for i in range(10_000)]
+    before = {key: ring.get(key) for key in keys}
+
+    ring.add("d")
+    moved = [key for key in keys if ring.get(key) != before[key]]
+    # a quarter would be ideal, and they only move to the new node
+    assert len(moved) < 3000
+    assert {ring.get(key) for key in moved} == {"d"}
+    assert len(ring) == 4
+
+    ring.remove("d")
+    assert {key: ring.get(key) for key in keys} == before
+
+
+def test_ring_without_nodes():
+    with pytest.raises(LookupError):
+        HashRing().get("key")
+
+
+@pytest.mark.anyio
+async def test_save_and_get(storage: ShardedStorage):
+    for i in range(30):
+        await storage.save(f"key:{i}", i)
+
+    for i in range(30):
+        assert await storage.get(f"key:{i}") == i
+        assert (await storage.get_entry(f"key:{i}")).value == i
+    # every shard got some of them
+    assert all([await shard.redis.dbsize() > 0 for shard in storage.shards.values()])
+
+
+@pytest.mark.anyio
+async def test_hash_tags_share_a_shard(storage: ShardedStorage):
+    for i in range(30):
+        await storage.save(f"{{users}}:{i}", i)
+
+    assert sorted(
+        [await shard.redis.dbsize() for shard in storage.shards.values()]
+    ) == [0, 0, 30]
+
+
+@pytest.mark.anyio
+async def test_bulk(storage: ShardedStorage):
+    keys = [f"key:{i}" for i in range(30)]
+    await storage.save_many({key: CacheEntry(key) for key in keys})
+
+    entries = await storage.get_many([*keys, "missing"])
+    assert [entry.value for entry in entries[:-1]] == keys
+    assert entries[-1] is None
+
+    await storage.delete_many(keys[:10])
+    entries = await storage.get_many(keys)
+    assert entries[:10] == [None] * 10
+    assert None not in entries[10:]
+
+
+@pytest.mark.anyio
+async def test_fans_out(storage: ShardedStorage):
+    for i in range(30):
+        await storage.save_entry(f"items:{i}", CacheEntry(i, tags=(f"t{i % 2}",)))
+    await storage.save("users:1", 1)
+
+    assert await storage.invalidate_tags(["t0"]) == 15
+    assert await storage.invalidate_pattern("items:*") == 15
+    assert await storage.get("users:1") == 1
+
+    await storage.clear()
+    assert await storage.get("users:1") is None
+
+
+@pytest.mark.anyio
+async def test_add_and_remove_shard():
+    storage = ShardedStorage([InMemoryStorage(), InMemoryStorage()])
+    for i in range(100):
+        await storage.save(f"key:{i}", i)
+
+    storage.add_shard("2", InMemoryStorage())
+    found = [i for i in range(100) if await storage.get(f"key:{i}") == i]
+    # only keys now placed on the new shard are missing
+    assert 50 < len(found) < 100
+
+    storage.remove_shard("2")
+    assert all([await storage.get(f"key:{i}") == i for i in range(100)])
+
+
+@pytest.mark.anyio
+async def test_lock(storage: ShardedStorage):
+    async with storage.lock("key", timeout=1) as acquired:
+        assert acquired
+        async with storage.lock("key", timeout=0.1) as acquired_again:
+            assert not acquired_again
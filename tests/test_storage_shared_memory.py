@@ -0,0 +1,165 @@
+import asyncio
+from datetime import timedelta
+import multiprocessing
+
+from freezegun import freeze_time
+import pytest
+
+from ultra_cache.storage.base import CacheEntry
+from ultra_cache.storage.shared_memory import _SLOT_HEADER, SharedMemoryStorage
+from ultra_cache.utils import utc_now
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def storage(path):
+    storage = SharedMemoryStorage(path, slots=64, slot_size=512, ways=4)
+    yield storage
+    storage.close()
+
+
+@pytest.mark.anyio
+async def test_save_and_get(storage: SharedMemoryStorage):
+    await storage.save("key", {"id": 1}, ttl=60)
+
+    assert await storage.get("key") == {"id": 1}
+    assert await storage.get("other") is None
+
+
+@pytest.mark.anyio
+async def test_entry_metadata(storage: SharedMemoryStorage):
+    with freeze_time(utc_now()) as frozen_time:
+        entry = CacheEntry([1, 2], ttl=10, stale_ttl=20, etag='"a"', tags=("t",))
+        await storage.save_entry("key", entry)
+
+        assert await storage.get_entry("key") == entry
+
+        frozen_time.tick(timedelta(seconds=15))
+        assert await storage.get("key") is None
+        assert (await storage.get_entry("key")).stale
+
+        frozen_time.tick(timedelta(seconds=20))
+        assert await storage.get_entry("key") is None
+
+
+@pytest.mark.anyio
+async def test_shared_between_instances(storage: SharedMemoryStorage, path):
+    other = SharedMemoryStorage(path, slots=64, slot_size=512, ways=4)
+    try:
+        await storage.save("key", "value")
+        assert await other.get("key") == "value"
+
+        await other.delete("key")
+        assert await storage.get("key") is None
+    finally:
+        other.close()
+
+
+def test_layout_mismatch(storage: SharedMemoryStorage, path):
+    with pytest.raises(ValueError):
+        SharedMemoryStorage(path, slots=128, slot_size=512, ways=4)
+
+
+@pytest.mark.anyio
+async def test_bounded_with_eviction(storage: SharedMemoryStorage):
+    for i in range(200):
+        await storage.save(f"key:{i}", i, ttl=60 + i)
+
+    stored = [i for i in range(200) if await storage.get(f"key:{i}") is not None]
+    assert len(stored) <= 64
+    # the latest save always makes it
+    assert 199 in stored
+
+
+@pytest.mark.anyio
+async def test_evicts_expired_first(storage: SharedMemoryStorage):
+    # the 4 ways of a set are all taken by these
+    with freeze_time(utc_now()) as frozen_time:
+        for i in range(200):
+            await storage.save(f"short:{i}", i, ttl=1)
+        frozen_time.tick(timedelta(seconds=2))
+
+        await storage.save("key", "value")
+        assert await storage.get("key") == "value"
+
+
+@pytest.mark.anyio
+async def test_oversized(storage: SharedMemoryStorage):
+    await storage.save("key", "small")
+    await storage.save("key", "x" * 1000)
+
+    assert await storage.get("key") is None
+
+
+@pytest.mark.anyio
+async def test_torn_slot_is_a_miss(storage: SharedMemoryStorage):
+    await storage.save("key", "value")
+    slot = next(
+        slot for slot in range(storage.slots) if storage._read(slot) is not None
+    )
+
+    # as if a write was still under way, the last byte of the data
+    _, _, _, _, key_length, data_length = storage._read_header(slot)
+    offset = storage._offset(slot) + _SLOT_HEADER.size + key_length + data_length
+    storage._map[offset - 1] ^= 0xFF
+
+    assert await storage.get("key") is None
+
+
+@pytest.mark.anyio
+async def test_clear(storage: SharedMemoryStorage):
+    await storage.save("key", "value")
+    await storage.clear()
+
+    assert await storage.get("key") is None
+
+
+@pytest.mark.anyio
+async def test_invalidate(storage: SharedMemoryStorage):
+    await storage.save_entry("items:1", CacheEntry(1, tags=("a",)))
+    await storage.save_entry("items:2", CacheEntry(2, tags=("b",)))
+    await storage.save_entry("users:1", CacheEntry(3, tags=("a", "b")))
+
+    assert await storage.invalidate_pattern("items:*") == 2
+    assert await storage.get("users:1") == 3
+    assert await storage.invalidate_tags(["b"]) == 1
+    assert await storage.get("users:1") is None
+
+
+async def _work(path: str, worker: int) -> None:
+    storage = SharedMemoryStorage(path, slots=16_384, slot_size=1024)
+    for i in range(200):
+        await storage.save(f"{worker}:{i}", {"worker": worker, "i": i})
+        # everyone writes and reads this one, reads never see a torn value
+        await storage.save("shared", {"worker": worker, "check": [worker] * 100})
+        shared = await storage.get("shared")
+        if shared is not None:
+            assert shared["check"] == [shared["worker"]] * 100
+    storage.close()
+
+
+def _worker(path: str, worker: int) -> None:
+    asyncio.run(_work(path, worker))
+
+
+@pytest.mark.anyio
+async def test_processes(path):
+    storage = SharedMemoryStorage(path, slots=16_384, slot_size=1024)
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=_worker, args=(str(path), worker)) for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+
+    assert [process.exitcode for process in workers] == [0] * 4
+    for worker in range(4):
+        for i in range(200):
+            assert await storage.get(f"{worker}:{i}") == {"worker": worker, "i": i}
+    storage.close()
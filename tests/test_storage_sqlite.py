@@ -0,0 +1,152 @@
+import asyncio
+from datetime import timedelta
+import multiprocessing
+
+from freezegun import freeze_time
+import pytest
+
+from ultra_cache.storage.base import CacheEntry
+from ultra_cache.storage.sqlite import SQLiteStorage
+from ultra_cache.utils import utc_now
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "cache.db"
+
+
+@pytest.fixture
+def storage(path):
+    storage = SQLiteStorage(path)
+    yield storage
+    storage.close()
+
+
+@pytest.mark.anyio
+async def test_save_and_get(storage: SQLiteStorage):
+    await storage.save("key", {"id": 1}, ttl=60)
+
+    assert await storage.get("key") == {"id": 1}
+    assert await storage.get("other") is None
+
+
+@pytest.mark.anyio
+async def test_entry_metadata(storage: SQLiteStorage):
+    with freeze_time(utc_now()) as frozen_time:
+        entry = CacheEntry([1, 2], ttl=10, stale_ttl=20, etag='"a"', tags=("t",))
+        await storage.save_entry("key", entry)
+
+        assert await storage.get_entry("key") == entry
+
+        frozen_time.tick(timedelta(seconds=15))
+        assert await storage.get("key") is None
+        assert (await storage.get_entry("key")).stale
+
+        frozen_time.tick(timedelta(seconds=20))
+        assert await storage.get_entry("key") is None
+
+
+@pytest.mark.anyio
+async def test_survives_reopening(storage: SQLiteStorage, path):
+    await storage.save("key", "value")
+    storage.close()
+
+    reopened = SQLiteStorage(path)
+    try:
+        assert await reopened.get("key") == "value"
+    finally:
+        reopened.close()
+
+
+@pytest.mark.anyio
+async def test_compact_drops_expired(storage: SQLiteStorage):
+    with freeze_time(utc_now()) as frozen_time:
+        await storage.save("short", 1, ttl=1)
+        await storage.save("long", 2, ttl=60)
+        frozen_time.tick(timedelta(seconds=2))
+
+        assert await storage.compact() == 1
+        assert await storage.get("long") == 2
+
+
+@pytest.mark.anyio
+async def test_compact_to_max_bytes(path):
+    storage = SQLiteStorage(path, max_bytes=2000, compact_every=60)
+    try:
+        for i in range(100):
+            await storage.save(f"key:{i}", "x" * 100)
+
+        stored = [i for i in range(100) if await storage.get(f"key:{i}") is not None]
+        # compacted after 60 saves, the newest ones stay
+        assert len(stored) < 100
+        assert stored[-1] == 99
+        assert await storage.compact() > 0
+        assert len([i for i in stored if await storage.get(f"key:{i}")]) < 20
+    finally:
+        storage.close()
+
+
+@pytest.mark.anyio
+async def test_overwrite_replaces_tags(storage: SQLiteStorage):
+    await storage.save_entry("key", CacheEntry(1, tags=("a",)))
+    await storage.save_entry("key", CacheEntry(2, tags=("b",)))
+
+    assert await storage.invalidate_tags(["a"]) == 0
+    assert await storage.get("key") == 2
+
+
+@pytest.mark.anyio
+async def test_delete_and_clear(storage: SQLiteStorage):
+    await storage.save("a", 1)
+    await storage.save("b", 2)
+
+    await storage.delete("a")
+    assert await storage.get("a") is None
+    assert await storage.get("b") == 2
+
+    await storage.clear()
+    assert await storage.get("b") is None
+
+
+@pytest.mark.anyio
+async def test_invalidate(storage: SQLiteStorage):
+    await storage.save_entry("items:1", CacheEntry(1, tags=("a",)))
+    await storage.save_entry("items:2", CacheEntry(2, tags=("b",)))
+    await storage.save_entry("users:1", CacheEntry(3, tags=("a", "b")))
+
+    assert await storage.invalidate_pattern("items:*") == 2
+    assert await storage.get("users:1") == 3
+    assert await storage.invalidate_tags(["b"]) == 1
+    assert await storage.get("users:1") is None
+    assert await storage.invalidate_tags([]) == 0
+
+
+async def _work(path: str, worker: int) -> None:
+    storage = SQLiteStorage(path)
+    for i in range(50):
+        await storage.save(f"{worker}:{i}", {"worker": worker, "i": i})
+        await storage.save("shared", {"worker": worker, "check": [worker] * 100})
+        shared = await storage.get("shared")
+        assert shared["check"] == [shared["worker"]] * 100
+    storage.close()
+
+
+def _worker(path: str, worker: int) -> None:
+    asyncio.run(_work(path, worker))
+
+
+@pytest.mark.anyio
+async def test_processes(storage: SQLiteStorage, path):
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=_worker, args=(str(path), worker)) for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+
+    assert [process.exitcode for process in workers] == [0] * 4
+    for worker in range(4):
+        for i in range(50):
+            assert await storage.get(f"{worker}:{i}") == {"worker": worker, "i": i}
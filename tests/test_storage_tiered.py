@@ -0,0 +1,123 @@
+from datetime import timedelta
+from fakeredis import FakeAsyncRedis
+from freezegun import freeze_time
+import pytest
+
+from ultra_cache.storage.base import CacheEntry
+from ultra_cache.storage.inmemory import InMemoryStorage
+from ultra_cache.storage.redis import RedisStorage
+from ultra_cache.storage.tiered import TieredStorage
+from ultra_cache.utils import utc_now
+
+
+@pytest.fixture
+def l2():
+    return RedisStorage(FakeAsyncRedis())
+
+
+@pytest.fixture
+def storage(l2: RedisStorage):
+    return TieredStorage(l2, l1=InMemoryStorage(max_entries=10), l1_ttl=5)
+
+
+@pytest.mark.anyio
+async def test_save_writes_through(storage: TieredStorage, l2: RedisStorage):
+    await storage.save("key", "value", ttl=60)
+
+    assert (await l2.get("key")) == "value"
+    assert (await storage.get("key")) == "value"
+    assert storage.stats["l1_hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_l2_hit_fills_l1(storage: TieredStorage, l2: RedisStorage):
+    await l2.save("key", {"id": 1}, ttl=60)
+
+    assert (await storage.get("key")) == {"id": 1}
+    assert (await storage.get("key")) == {"id": 1}
+    assert (await storage.get("missing")) is None
+
+    assert storage.stats == {
+        "l1_hits": 1,
+        "l2_hits": 1,
+        "misses": 1,
+        "l1_hit_ratio": 1 / 3,
+        "l2_hit_ratio": 0.5,
+    }
+
+
+@pytest.mark.anyio
+async def test_l1_ttl(storage: TieredStorage, l2: RedisStorage):
+    with freeze_time(utc_now()) as frozen_time:
+        await storage.save("key", "value", ttl=60)
+        # another process overwrites the value
+        await l2.save("key", "new value", ttl=60)
+        assert (await storage.get("key")) == "value"
+
+        frozen_time.tick(timedelta(seconds=6))
+        assert (await storage.get("key")) == "new value"
+        assert storage.stats["l2_hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_l1_does_not_outlive_entry(storage: TieredStorage):
+    with freeze_time(utc_now()) as frozen_time:
+        await storage.save_entry("key", CacheEntry("value", ttl=2))
+
+        frozen_time.tick(timedelta(seconds=3))
+        assert (await storage.get_entry("key")) is None
+
+
+@pytest.mark.anyio
+async def test_stale_l1_entry_refreshed_from_l2(
+    storage: TieredStorage, l2: RedisStorage
+):
+    storage.l1_ttl = None
+    with freeze_time(utc_now()) as frozen_time:
+        await storage.save_entry("key", CacheEntry("value", ttl=10, stale_ttl=60))
+
+        frozen_time.tick(timedelta(seconds=20))
+        entry = await storage.get_entry("key")
+        assert entry.value == "value"
+        assert entry.stale
+
+        await l2.save_entry("key", CacheEntry("new value", ttl=10))
+        entry = await storage.get_entry("key")
+        assert entry.value == "new value"
+        assert not entry.stale
+
+
+@pytest.mark.anyio
+async def test_get_many(storage: TieredStorage, l2: RedisStorage, mocker):
+    await storage.save("key1", "value1", ttl=60)
+    await l2.save("key2", "value2", ttl=60)
+    spy_on_get_many = mocker.spy(l2, "get_many")
+
+    entries = await storage.get_many(["key1", "key2", "missing"])
+
+    assert [e and e.value for e in entries] == ["value1", "value2", None]
+    spy_on_get_many.assert_called_once_with(["key2", "missing"], None)
+    assert (storage.l1_hits, storage.l2_hits, storage.misses) == (1, 1, 1)
+    assert (await storage.l1.get("key2")).value == "value2"
+
+
+@pytest.mark.anyio
+async def test_clear(storage: TieredStorage, l2: RedisStorage):
+    await storage.save("key", "value")
+    await storage.clear()
+
+    assert (await storage.get("key")) is None
+    assert (await l2.get("key")) is None
+
+
+@pytest.mark.anyio
+async def test_invalidate(storage: TieredStorage, l2: RedisStorage):
+    await storage.save_entry("items:1", CacheEntry(1, tags=("items",)))
+    await storage.save_entry("users:1", CacheEntry(2, tags=("users",)))
+
+    assert await storage.invalidate_pattern("users:*") == 1
+    assert await storage.get("users:1") is None
+
+    assert await storage.invalidate_tags(["items"]) == 1
+    assert await storage.get("items:1") is None
+    assert len(storage.l1) == 0
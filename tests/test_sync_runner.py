@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import anyio
+import pytest
+
+from ultra_cache.sync_runner import Saturated, SyncRunner
+
+
+def _sleep(seconds: float) -> str:
+    time.sleep(seconds)
+    return threading.current_thread().name
+
+
+@pytest.mark.anyio
+async def test_limiter_bounds_threads():
+    runner = SyncRunner(limiter=1)
+    results = []
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(3):
+            tg.start_soon(lambda: _append(runner, results))
+
+    assert len(results) == 3
+    assert runner.calls == 3
+    assert runner.in_flight == 0
+    # the second and third call waited for the first one
+    assert runner.queue_seconds >= 0.05 * 3 - 0.01
+    assert runner.run_seconds >= 0.05 * 3
+
+
+async def _append(runner: SyncRunner, results: list) -> None:
+    results.append(await runner.run(lambda: _sleep(0.05)))
+
+
+@pytest.mark.anyio
+async def test_max_queue():
+    runner = SyncRunner(limiter=anyio.CapacityLimiter(1), max_queue=1)
+    rejected = 0
+
+    async def _call():
+        nonlocal rejected
+        try:
+            await runner.run(lambda: _sleep(0.05))
+        except Saturated:
+            rejected += 1
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(4):
+            tg.start_soon(_call)
+
+    assert rejected == 2
+    assert runner.rejected == 2
+    assert runner.calls == 2
+
+
+@pytest.mark.anyio
+async def test_executor():
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="endpoint") as executor:
+        runner = SyncRunner(executor=executor)
+
+        name = await runner.run(lambda: _sleep(0))
+
+    assert name.startswith("endpoint")
+    assert runner.capacity == 2
+    assert runner.stats["calls"] == 1
+
+
+def test_limiter_or_executor():
+    with pytest.raises(ValueError):
+        SyncRunner(limiter=1, executor=ThreadPoolExecutor())
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+
+from ultra_cache.storage.base import CacheEntry
+from ultra_cache.storage.inmemory import InMemoryStorage
+from ultra_cache.write_behind import WriteBehind
+
+
+@pytest.mark.anyio
+async def test_saves_in_background():
+    storage = InMemoryStorage()
+    write_behind = WriteBehind()
+
+    assert write_behind.submit(storage, "key", CacheEntry("value"))
+    assert write_behind.depth == 1
+    assert write_behind.pending(storage, "key").value == "value"
+    assert len(storage) == 0
+
+    await write_behind.drain()
+
+    assert await storage.get("key") == "value"
+    assert write_behind.pending(storage, "key") is None
+    assert write_behind.stats == {"depth": 0, "saved": 1, "dropped": 0, "failed": 0}
+
+
+@pytest.mark.anyio
+async def test_coalesces_per_key(mocker):
+    storage = InMemoryStorage()
+    spy_on_save_many = mocker.spy(storage, "save_many")
+    write_behind = WriteBehind()
+
+    for i in range(5):
+        write_behind.submit(storage, "key", CacheEntry(i))
+    write_behind.submit(storage, "other", CacheEntry("other"))
+    await write_behind.drain()
+
+    spy_on_save_many.assert_called_once()
+    assert await storage.get("key") == 4
+    assert write_behind.saved == 2
+
+
+@pytest.mark.anyio
+async def test_drops_when_full():
+    storage = InMemoryStorage()
+    write_behind = WriteBehind(max_size=2)
+
+    assert write_behind.submit(storage, "a", CacheEntry(1))
+    assert write_behind.submit(storage, "b", CacheEntry(2))
+    assert not write_behind.submit(storage, "c", CacheEntry(3))
+    # replacing a pending key needs no room
+    assert write_behind.submit(storage, "a", CacheEntry(4))
+    await write_behind.drain()
+
+    assert write_behind.dropped == 1
+    assert await storage.get("a") == 4
+    assert await storage.get("c") is None
+
+
+@pytest.mark.anyio
+async def test_errors_are_logged(mocker, caplog):
+    storage = InMemoryStorage()
+    mocker.patch.object(storage, "save_many", side_effect=ConnectionError)
+    write_behind = WriteBehind()
+
+    write_behind.submit(storage, "key", CacheEntry("value"))
+    await write_behind.drain()
+
+    assert write_behind.failed == 1
+    assert "in the background failed" in caplog.text
+
+
+@pytest.mark.anyio
+async def test_drain_survives_cancellation():
+    storage = InMemoryStorage()
+    write_behind = WriteBehind(batch_size=1)
+    for i in range(10):
+        write_behind.submit(storage, i, CacheEntry(i))
+
+    drain = asyncio.create_task(write_behind.drain())
+    await asyncio.sleep(0)
+    drain.cancel()
+    await write_behind.drain()
+
+    assert len(storage) == 10
+
+
+@pytest.mark.anyio
+async def test_discard():
+    storage, other = InMemoryStorage(), InMemoryStorage()
+    write_behind = WriteBehind()
+    write_behind.submit(storage, "a", CacheEntry(1, tags=("t",)))
+    write_behind.submit(storage, "b", CacheEntry(2))
+    write_behind.submit(other, "a", CacheEntry(3, tags=("t",)))
+
+    assert (
+        await write_behind.discard(storage, lambda key, entry: "t" in entry.tags) == 1
+    )
+    assert write_behind.pending(storage, "a") is None
+    assert await write_behind.discard(storage) == 1
+    await write_behind.drain()
+
+    assert len(storage) == 0
+    assert await other.get("a") == 3
+
+
+@pytest.mark.anyio
+async def test_discard_waits_for_the_batch_being_saved(mocker):
+    storage = InMemoryStorage()
+    save_many = storage.save_many
+
+    async def _slow_save_many(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        await save_many(*args, **kwargs)
+
+    mocker.patch.object(storage, "save_many", side_effect=_slow_save_many)
+    write_behind = WriteBehind()
+    write_behind.submit(storage, "key", CacheEntry("value"))
+    await asyncio.sleep(0)
+
+    assert await write_behind.discard(storage) == 0
+    # saved already, so that deleting it next is not undone
+    assert await storage.get("key") == "value"
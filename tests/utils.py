@@ -1,4 +1,6 @@
 from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+from pydantic import BaseModel
 from ultra_cache.decorator import UltraCache
 from ultra_cache.storage.inmemory import InMemoryStorage
 
@@ -11,3 +13,41 @@ cache = UltraCache(storage=storage)
 @cache()
 async def read_item(item_id: int):
     return {"item_id": item_id}
+
+
+@app.get("/encoded/{item_id}")
+@cache(cache_body=True)
+async def read_encoded_item(item_id: int):
+    return {"item_id": item_id}
+
+
+class PublicUser(BaseModel):
+    name: str
+
+
+@app.get("/users/{user_id}", response_model=PublicUser)
+@cache(cache_body=True)
+async def read_user(user_id: int):
+    return {"name": "alice", "password": "secret"}
+
+
+@app.get("/pages/{page_id}", response_class=HTMLResponse, status_code=203)
+@cache(cache_body=True)
+async def read_page(page_id: int):
+    return f"<h1>{page_id}</h1>"
+
+
+products = {1: "chair"}
+
+
+@app.get("/products/{product_id}")
+@cache(tags=lambda args, result: [f"product:{args['product_id']}"])
+async def read_product(product_id: int):
+    return {"name": products[product_id]}
+
+
+@app.put("/products/{product_id}")
+@cache.invalidates(tags=lambda args, result: [f"product:{args['product_id']}"])
+async def update_product(product_id: int, name: str):
+    products[product_id] = name
+    return {"name": name}
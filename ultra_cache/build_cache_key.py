@@ -1,5 +1,22 @@
-from typing import Protocol, Callable, Union
+from collections.abc import Iterable
 import hashlib
+import inspect
+import json
+from typing import Any, Protocol, Callable, Union
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 
 class BuildCacheKey(Protocol):
@@ -12,3 +29,110 @@ class DefaultBuildCacheKey(BuildCacheKey):
             f"{func.__module__}:{func.__name__}:{args}:{kwargs}".encode()
         ).hexdigest()
         return cache_key
+
+
+def _canonical_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        # elements may not be comparable with each other, their encoding is
+        return sorted(_canonical_bytes(x) for x in value)
+    if isinstance(value, bytes):
+        return value.hex()
+    try:
+        return jsonable_encoder(value)
+    except Exception:
+        return repr(value)
+
+
+def _canonical_bytes(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            value,
+            default=_canonical_default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        value, default=_canonical_default, sort_keys=True, separators=(",", ":")
+    ).encode()
+
+
+def _digest(data: bytes) -> str:
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+_POSITIONAL = (
+    inspect.Parameter.POSITIONAL_ONLY,
+    inspect.Parameter.POSITIONAL_OR_KEYWORD,
+)
+
+
+class CanonicalBuildCacheKey(BuildCacheKey):
+    """Builds keys from a canonical encoding of the arguments.
+
+    Arguments are matched to their parameter names and sorted, so passing
+    them positionally or by keyword gives the same key. Pydantic models are
+    dumped and sets are ordered, so equal inputs always give equal keys.
+    Keys look like `module:function:hash`, hashed with xxhash when it is
+    installed and blake2b otherwise.
+
+    `params` restricts the arguments that make up the key, `headers` and
+    `query_params` add values from the request to it. With `hash_tag`, keys
+    look like `{module:function}:hash`, so that `ShardedStorage` and Redis
+    Cluster keep all keys of a function together.
+    """
+
+    def __init__(
+        self,
+        params: Union[Iterable[str], None] = None,
+        headers: Iterable[str] = (),
+        query_params: Iterable[str] = (),
+        hash_tag: bool = False,
+    ) -> None:
+        self.params = None if params is None else frozenset(params)
+        self.headers = tuple(h.lower() for h in headers)
+        self.query_params = tuple(query_params)
+        self.hash_tag = hash_tag
+        # per function: key prefix and names of its positional parameters
+        self._functions: dict[Callable, tuple[str, tuple[str, ...]]] = {}
+
+    def _describe(self, func: Callable) -> tuple[str, tuple[str, ...]]:
+        described = self._functions.get(func, None)
+        if described is None:
+            positional = tuple(
+                p.name
+                for p in inspect.signature(func).parameters.values()
+                if p.kind in _POSITIONAL
+                # the decorator takes these out of the arguments
+                and p.annotation not in (Request, Response)
+            )
+            prefix = f"{func.__module__}:{func.__qualname__}"
+            if self.hash_tag:
+                prefix = f"{{{prefix}}}"
+            described = self._functions[func] = (prefix, positional)
+        return described
+
+    def __call__(
+        self,
+        func: Callable,
+        args,
+        kwargs,
+        request: Union[Request, None] = None,
+    ) -> str:
+        prefix, positional = self._describe(func)
+
+        arguments = dict(zip(positional, args))
+        if len(args) > len(positional):
+            arguments["*"] = args[len(positional) :]
+        arguments.update(kwargs)
+        if self.params is not None:
+            arguments = {k: v for k, v in arguments.items() if k in self.params}
+
+        parts: list[Any] = [arguments]
+        if request is not None and (self.headers or self.query_params):
+            parts.append([request.headers.get(h, None) for h in self.headers])
+            parts.append([request.query_params.getlist(q) for q in self.query_params])
+
+        return f"{prefix}:{_digest(_canonical_bytes(parts))}"
@@ -1,4 +1,7 @@
-from typing import Union
+from functools import lru_cache
+import math
+import re
+from typing import Any, Union
 import sys
 
 if sys.version_info[0] == 3 and sys.version_info[1] >= 11:
@@ -6,6 +9,45 @@ if sys.version_info[0] == 3 and sys.version_info[1] >= 11:
 else:
     from typing_extensions import Self
 
+# a directive, then optionally `=` and a token or a quoted string (RFC 9110 5.6)
+_DIRECTIVE = re.compile(
+    r'([^\s=,"]+)\s*(?:=\s*(?:"((?:[^"\\]|\\.)*)"|([^\s,"]*)))?', re.DOTALL
+)
+_ESCAPED = re.compile(r"\\(.)", re.DOTALL)
+_TOKEN = re.compile(r"[!#$%&'*+\-.^_`|~0-9A-Za-z]+")
+
+# larger delta-seconds are to be taken as this, RFC 9111 1.2.2
+MAX_DELTA_SECONDS = 2**31
+
+
+@lru_cache(maxsize=256)
+def parse_cache_control(header: str) -> tuple[tuple[str, Union[str, None]], ...]:
+    """Directives of a Cache-Control header, names lowercased.
+
+    Values keep their case, quoted strings are unquoted, and of repeated
+    directives the first one wins. Memoized, as clients send the same few
+    headers over and over.
+    """
+    directives: dict[str, Union[str, None]] = {}
+    for match in _DIRECTIVE.finditer(header):
+        name, quoted, token = match.groups()
+        if quoted is not None:
+            value = _ESCAPED.sub(r"\1", quoted)
+        else:
+            value = token
+        directives.setdefault(name.lower(), value)
+    return tuple(directives.items())
+
+
+def _format_directive(key: str, value: Any) -> str:
+    if value is None:
+        return key
+    value = str(value)
+    if _TOKEN.fullmatch(value):
+        return f"{key}={value}"
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'{key}="{escaped}"'
+
 
 class CacheControl:
     REQUEST_ONLY_KEYS = ["max-stale", "min-fresh", "only-if-cached"]
@@ -22,23 +64,58 @@ class CacheControl:
     def setdefault(self, key: str, value: str) -> None:
         self.parts.setdefault(key, value)
 
+    def pop(self, key: str) -> Union[str, None]:
+        return self.parts.pop(key, None)
+
+    def copy(self) -> Self:
+        return type(self)(dict(self.parts))
+
     @classmethod
     def from_string(cls, cache_control: Union[str, None]) -> Self:
         if cache_control is None:
             return cls({})
-        return cls(
-            {
-                x.split("=")[0].strip(): x.split("=")[1].strip() if "=" in x else None
-                for x in cache_control.lower().split(",")
-            }
-        )
+        return cls(dict(parse_cache_control(cache_control)))
+
+    def _get_seconds(self, key: str) -> Union[int, None]:
+        value = self.parts.get(key, None)
+        if value is None:
+            return None
+        try:
+            seconds = int(value)
+        except ValueError:
+            return None
+        if seconds < 0:
+            return None
+        return min(seconds, MAX_DELTA_SECONDS)
 
     @property
     def max_age(self) -> Union[int, None]:
-        value = self.parts.get("max-age", None)
-        if value is None:
+        return self._get_seconds("max-age")
+
+    @property
+    def s_maxage(self) -> Union[int, None]:
+        return self._get_seconds("s-maxage")
+
+    @property
+    def stale_while_revalidate(self) -> Union[int, None]:
+        return self._get_seconds("stale-while-revalidate")
+
+    @property
+    def stale_if_error(self) -> Union[int, None]:
+        return self._get_seconds("stale-if-error")
+
+    @property
+    def max_stale(self) -> Union[int, float, None]:
+        """How stale a response the client accepts, any without a value."""
+        if "max-stale" not in self.parts:
             return None
-        return int(value)
+        if self.parts["max-stale"] is None:
+            return math.inf
+        return self._get_seconds("max-stale")
+
+    @property
+    def min_fresh(self) -> Union[int, None]:
+        return self._get_seconds("min-fresh")
 
     @property
     def no_cache(self) -> bool:
@@ -48,10 +125,26 @@ class CacheControl:
     def no_store(self) -> bool:
         return "no-store" in self.parts
 
+    @property
+    def only_if_cached(self) -> bool:
+        return "only-if-cached" in self.parts
+
+    @property
+    def private(self) -> bool:
+        return "private" in self.parts
+
+    @property
+    def public(self) -> bool:
+        return "public" in self.parts
+
+    @property
+    def must_revalidate(self) -> bool:
+        return "must-revalidate" in self.parts
+
     def to_response_header(self) -> str:
         return ", ".join(
             [
-                f"{k}={v}"
+                _format_directive(k, v)
                 for k, v in self.parts.items()
                 if k not in self.REQUEST_ONLY_KEYS
             ]
@@ -0,0 +1,69 @@
+import time
+from typing import Union
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stops calls to a backend that keeps failing.
+
+    After `failure_threshold` failures in a row the breaker opens and calls
+    are refused. Once `recovery_time` seconds passed it is half open and lets
+    a single probe through: the breaker closes if the probe succeeds and opens
+    again otherwise. A probe that never reports back is replaced after another
+    `recovery_time`.
+    """
+
+    def __init__(
+        self, failure_threshold: int = 5, recovery_time: Union[int, float] = 30
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.failures = 0
+        # times the breaker opened
+        self.trips = 0
+        self._opened_at: Union[float, None] = None
+        self._probe_started: Union[float, None] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if time.monotonic() - self._opened_at >= self.recovery_time:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go through, a probe is counted as started."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+
+        now = time.monotonic()
+        if (
+            self._probe_started is not None
+            and now - self._probe_started < self.recovery_time
+        ):
+            return False
+        self._probe_started = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._opened_at is not None or self.failures >= self.failure_threshold:
+            if self._opened_at is None:
+                self.trips += 1
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+
+    def reset(self) -> None:
+        self.record_success()
@@ -0,0 +1,171 @@
+import time
+import zlib
+from typing import Protocol, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+class Compressor(Protocol):
+    # written as the first byte of every payload, identifies the algorithm
+    id: int
+
+    def compress(self, data: bytes) -> bytes: ...
+
+    def decompress(self, data: bytes) -> bytes: ...
+
+
+class GzipCompressor(Compressor):
+    id = 1
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    id = 2
+
+    def __init__(self, level: int = 3) -> None:
+        if zstandard is None:
+            raise ImportError(
+                "ZstdCompressor requires zstandard, install it with `pip install zstandard`"
+            )
+        self.level = level
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+class Lz4Compressor(Compressor):
+    id = 3
+
+    def __init__(self, level: int = 0) -> None:
+        if lz4_frame is None:
+            raise ImportError(
+                "Lz4Compressor requires lz4, install it with `pip install lz4`"
+            )
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data, compression_level=self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+UNCOMPRESSED = b"\x00"
+COMPRESSORS: dict[int, type[Compressor]] = {
+    GzipCompressor.id: GzipCompressor,
+    ZstdCompressor.id: ZstdCompressor,
+    Lz4Compressor.id: Lz4Compressor,
+}
+_decompressors: dict[int, Compressor] = {}
+
+
+def best_available() -> Compressor:
+    if zstandard is not None:
+        return ZstdCompressor()
+    if lz4_frame is not None:
+        return Lz4Compressor()
+    return GzipCompressor()
+
+
+def decompress(data: bytes) -> bytes:
+    """Decodes a payload written by `Compression.compress`, whatever the
+    algorithm or threshold of the writer was."""
+    compressor_id = data[0]
+    if compressor_id == 0:
+        return data[1:]
+
+    compressor = _decompressors.get(compressor_id, None)
+    if compressor is None:
+        if compressor_id not in COMPRESSORS:
+            raise ValueError(f"Unknown compression {compressor_id}")
+        compressor = _decompressors[compressor_id] = COMPRESSORS[compressor_id]()
+    return compressor.decompress(data[1:])
+
+
+class Compression:
+    """Compresses payloads larger than `threshold` bytes.
+
+    Every payload starts with a byte naming the algorithm, 0 when it was
+    stored as is, so entries written with different settings stay readable.
+    Keeps track of the achieved ratio and of the time spent.
+    """
+
+    def __init__(
+        self,
+        compressor: Union[Compressor, None] = None,
+        threshold: int = 1024,
+    ) -> None:
+        self.compressor = compressor or best_available()
+        self.threshold = threshold
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_seconds = 0.0
+        self.decompress_seconds = 0.0
+        self.decompressed = 0
+
+    @property
+    def ratio(self) -> float:
+        """Size of the compressed payloads relative to their original size."""
+        if self.bytes_in == 0:
+            return 1.0
+        return self.bytes_out / self.bytes_in
+
+    @property
+    def stats(self) -> dict[str, Union[int, float]]:
+        return {
+            "compressed": self.compressed,
+            "skipped": self.skipped,
+            "decompressed": self.decompressed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": self.ratio,
+            "compress_seconds": self.compress_seconds,
+            "decompress_seconds": self.decompress_seconds,
+        }
+
+    def compress(self, data: bytes) -> bytes:
+        if len(data) < self.threshold:
+            self.skipped += 1
+            return UNCOMPRESSED + data
+
+        start = time.perf_counter()
+        compressed = self.compressor.compress(data)
+        self.compress_seconds += time.perf_counter() - start
+
+        self.compressed += 1
+        self.bytes_in += len(data)
+        self.bytes_out += len(compressed)
+        return bytes([self.compressor.id]) + compressed
+
+    def decompress(self, data: bytes) -> bytes:
+        if data[0] == 0:
+            return data[1:]
+
+        start = time.perf_counter()
+        decompressed = decompress(data)
+        self.decompress_seconds += time.perf_counter() - start
+        self.decompressed += 1
+        return decompressed
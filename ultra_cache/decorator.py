@@ -1,16 +1,47 @@
 import asyncio
+from contextlib import asynccontextmanager
 from functools import partial, wraps
-from typing import Any, Callable, Union, TypeVar
-from collections.abc import Coroutine
+from typing import Any, Callable, Union, TypeVar, get_type_hints
+from collections.abc import AsyncIterator, Coroutine, Iterable, Mapping
+import fnmatch
+import hashlib
 import inspect
+import logging
+import math
+import random
+import time
 
-import anyio
-import anyio.to_thread
-from dict_hash import dict_hash
 from ultra_cache.build_cache_key import BuildCacheKey, DefaultBuildCacheKey
 from ultra_cache.cache_control import CacheControl
-from ultra_cache.storage.base import BaseStorage
-from fastapi import Request, Response
+from ultra_cache.instrumentation import (
+    BUILD_KEY,
+    BYPASS,
+    ENDPOINT,
+    HIT,
+    MISS,
+    NOT_MODIFIED,
+    STALE,
+    STORAGE_GET,
+    STORAGE_SAVE,
+    Instrumentation,
+    payload_size,
+)
+from ultra_cache.serializers import (
+    BytesSerializer,
+    JsonSerializer,
+    Serializer,
+    get_serializer,
+)
+from ultra_cache.single_flight import SingleFlight
+from ultra_cache.stats import CacheStats
+from ultra_cache.sync_runner import Saturated, SyncRunner
+from ultra_cache.utils import http_date, parse_http_date
+from ultra_cache.write_behind import WriteBehind
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute, serialize_response
+from starlette.exceptions import HTTPException as StarletteHTTPException
 import sys
 
 if sys.version_info[0] == 3 and sys.version_info[1] >= 11:
@@ -24,6 +55,8 @@ R = TypeVar("R")
 S1 = TypeVar("S1")
 S2 = TypeVar("S2")
 
+logger = logging.getLogger(__name__)
+
 
 def _extract_param_of_type(
     sig: inspect.Signature, param_type: type
@@ -34,46 +67,366 @@ def _extract_param_of_type(
     return None
 
 
-def _default_hash_fn(x: Any) -> str:
-    if isinstance(x, dict) or isinstance(x, list):
-        return "W/" + str(dict_hash(x, maximal_recursion=10))
+_json_serializer = JsonSerializer()
+# key order does not change a JSON document, nor should it change its ETag
+_canonical_json_serializer = JsonSerializer(sort_keys=True)
+
 
-    return "W/" + str(hash(x))
+def _default_hash_fn(x: Any) -> str:
+    """Weak ETag from a content hash, the same in every process."""
+    if isinstance(x, Response):
+        data = bytes(x.body)
+    elif isinstance(x, (bytes, bytearray, memoryview)):
+        data = bytes(x)
+    else:
+        data = _canonical_json_serializer.dumps(x)
+    return f'W/"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+
+
+def _route_of(request: Request) -> Union[APIRoute, None]:
+    # set by FastAPI, absent when called outside of an app
+    route = request.scope.get("route", None)
+    return route if isinstance(route, APIRoute) else None
+
+
+async def _encode_body(
+    output: Any, route: Union[APIRoute, None]
+) -> tuple[bytes, Union[str, None]]:
+    """Encodes an endpoint's return value the way FastAPI would render it,
+    through the response model and response class of `route`."""
+    if isinstance(output, Response):
+        return bytes(output.body), output.headers.get("content-type", None)
+    if route is None:
+        return _json_serializer.dumps(output), "application/json"
+
+    content = await serialize_response(
+        field=route.secure_cloned_response_field,
+        response_content=output,
+        include=route.response_model_include,
+        exclude=route.response_model_exclude,
+        by_alias=route.response_model_by_alias,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        exclude_none=route.response_model_exclude_none,
+    )
+    response_class = route.response_class
+    if isinstance(response_class, DefaultPlaceholder):
+        response_class = response_class.value
+    rendered = response_class(content)
+    if not hasattr(rendered, "body"):
+        raise TypeError(f"cache_body cannot cache {response_class.__name__} bodies")
+    return bytes(rendered.body), rendered.headers.get("content-type", None)
+
+
+def _is_client_error(exc: Exception) -> bool:
+    """A deliberate 4xx, stale-if-error covers server errors only (RFC 5861)."""
+    return isinstance(exc, StarletteHTTPException) and exc.status_code < 500
+
+
+# static tags or a function of the endpoint's arguments, by name, and result
+Tags = Union[Iterable[str], Callable[[dict[str, Any], Any], Iterable[str]]]
+
+
+def _resolve_tags(
+    tags: Union[Tags, None],
+    sig: inspect.Signature,
+    args: tuple,
+    kwargs: dict[str, Any],
+    result: Any,
+) -> tuple[str, ...]:
+    if tags is None:
+        return ()
+    if callable(tags):
+        return tuple(tags(sig.bind_partial(*args, **kwargs).arguments, result))
+    return tuple(tags)
+
+
+def endpoint_tag(func: Callable) -> str:
+    """Tag the entries of a function decorated with `tag_endpoint=True` are
+    saved with."""
+    return f"endpoint:{func.__module__}:{func.__qualname__}"
+
+
+def _tag_of_endpoint(func: Callable) -> str:
+    if not getattr(func, "_tag_endpoint", False):
+        raise ValueError(f"{func} is not decorated with tag_endpoint=True")
+    return endpoint_tag(func)
 
 
 def _extract(
-    param: Union[inspect.Parameter, None], args: tuple[S1, ...], kwargs: dict[str, S2]
+    names: frozenset[str],
+    positions: tuple[int, ...],
+    args: tuple[S1, ...],
+    kwargs: dict[str, S2],
 ) -> tuple[tuple[S1, ...], dict[str, S2]]:
-    if param is None:
-        return args, kwargs
+    """Drops the parameters at `positions` or called `names`, copying only
+    when one of them was passed."""
+    if positions and len(args) > positions[0]:
+        args = tuple(arg for i, arg in enumerate(args) if i not in positions)
+    if not names.isdisjoint(kwargs):
+        kwargs = {k: v for k, v in kwargs.items() if k not in names}
+    return args, kwargs
+
+
+def _recompute_early(entry: CacheEntry, beta: Union[int, float]) -> bool:
+    """XFetch, decides to recompute a fresh entry ahead of its expiry.
+
+    The closer the expiry and the longer the value took to compute, the more
+    likely, so that one request refreshes an entry before others miss it.
+    `beta` above 1 favours recomputing earlier.
+    """
+    expires_at = entry.expires_at
+    if expires_at is None or not entry.compute_time:
+        return False
+    # -log(u) of a uniform u in (0, 1] is exponentially distributed
+    gap = -entry.compute_time * beta * math.log(1.0 - random.random())
+    return time.time() + gap >= expires_at
+
+
+def _conditional_headers(
+    request: Request,
+) -> tuple[Union[str, None], Union[str, None], Union[str, None]]:
+    """Cache-Control, If-None-Match and If-Modified-Since of `request`, in a
+    single pass."""
+    cache_control = if_none_match = if_modified_since = None
+    for name, value in request.headers.raw:
+        if name == b"cache-control":
+            cache_control = value.decode("latin-1")
+        elif name == b"if-none-match":
+            if_none_match = value.decode("latin-1")
+        elif name == b"if-modified-since":
+            if_modified_since = value.decode("latin-1")
+    return cache_control, if_none_match, if_modified_since
+
+
+def _is_acceptable(entry: CacheEntry, requested: CacheControl) -> bool:
+    """Whether the request's max-age and min-fresh allow serving `entry`."""
+    if not requested.parts:
+        return True
+    max_age = requested.max_age
+    # max-age=0, as sent on reloads, always revalidates
+    if max_age is not None and (max_age == 0 or entry.age > max_age):
+        return False
+    min_fresh = requested.min_fresh
+    if min_fresh is not None and entry.ttl is not None:
+        return entry.ttl - entry.age >= min_fresh
+    return True
+
+
+def _set_headers(response: Response, headers: dict[bytes, bytes]) -> None:
+    """Sets several headers at once, replacing those set already."""
+    raw_headers = [h for h in response.raw_headers if h[0] not in headers]
+    raw_headers.extend(headers.items())
+    response.raw_headers[:] = raw_headers
 
-    if param.name in kwargs:
-        kwargs_copy = kwargs.copy()
-        kwargs_copy.pop(param.name)
-        return (args, kwargs_copy)
-    else:
-        request_index = next(
-            (i for i, p in enumerate(args) if isinstance(p, param.annotation)), -1
-        )
-        if request_index == -1:
-            return args, kwargs
-        args_copy = args[:request_index] + args[request_index + 1 :]
-        return (args_copy, kwargs)
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
 
 
 def _does_etag_match(etag: str, if_none_match: Union[str, None]) -> bool:
-    if if_none_match is not None and (
-        if_none_match == "*" or any(etag == x.strip() for x in if_none_match.split(","))
-    ):
+    if if_none_match is None:
+        return False
+    if if_none_match == "*":
         return True
-    return False
+    # If-None-Match uses the weak comparison, W/"x" matches "x"
+    tag = _opaque_tag(etag)
+    return any(tag == _opaque_tag(x.strip()) for x in if_none_match.split(","))
 
 
 class UltraCache:
     storage: Union[BaseStorage, None] = None
 
-    def __init__(self, storage: BaseStorage) -> None:
+    def __init__(
+        self,
+        storage: BaseStorage,
+        write_behind: Union[WriteBehind, None] = None,
+        sync_runner: Union[SyncRunner, None] = None,
+        instrumentation: Union[Instrumentation, None] = None,
+    ) -> None:
         self.storage = storage
+        self.instrumentation = instrumentation or Instrumentation()
+        self.stats = CacheStats()
+        # used by endpoints decorated with write_behind=True
+        self.write_behind = write_behind or WriteBehind()
+        # runs sync endpoints that do not bring a runner of their own
+        self.sync_runner = sync_runner or SyncRunner()
+        self._single_flight: SingleFlight = SingleFlight()
+        self._revalidations: dict[Any, asyncio.Task] = {}
+
+    async def close(self) -> None:
+        """Finishes background revalidations and saves, call it on shutdown."""
+        if self._revalidations:
+            await asyncio.gather(*self._revalidations.values(), return_exceptions=True)
+        await self.write_behind.drain()
+
+    async def clear(self, storage: Union[BaseStorage, None] = None) -> None:
+        """Deletes every entry, including those waiting to be written behind."""
+        storage = storage or self.storage
+        await self.write_behind.discard(storage)
+        await storage.clear()
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any = None) -> AsyncIterator[None]:
+        """Usable as, or from within, a FastAPI lifespan."""
+        try:
+            yield
+        finally:
+            await self.close()
+
+    def _revalidate(self, key: Any, fn: Callable[[], Coroutine[Any, Any, Any]]) -> None:
+        if key in self._revalidations:
+            return
+
+        task = asyncio.create_task(fn())
+        self._revalidations[key] = task
+        task.add_done_callback(partial(self._on_revalidated, key))
+
+    def _on_revalidated(self, key: Any, task: asyncio.Task) -> None:
+        self._revalidations.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Background revalidation of %s failed",
+                key,
+                exc_info=task.exception(),
+            )
+
+    async def invalidate(
+        self,
+        endpoint: Union[Callable, None] = None,
+        pattern: Union[str, None] = None,
+        tags: Iterable[str] = (),
+        storage: Union[BaseStorage, None] = None,
+    ) -> int:
+        """Deletes the entries of `endpoint`, decorated with
+        `tag_endpoint=True`, those whose key matches `pattern` and those saved
+        with any of `tags`, including those still waiting to be written behind.
+
+        Returns how many entries were deleted from the storage.
+        """
+        storage = storage or self.storage
+        tags = list(tags)
+        if endpoint is not None:
+            tags.append(_tag_of_endpoint(endpoint))
+
+        if self.write_behind.depth:
+            matched_tags = frozenset(tags)
+            await self.write_behind.discard(
+                storage,
+                lambda key, entry: (
+                    not matched_tags.isdisjoint(entry.tags)
+                    or (pattern is not None and fnmatch.fnmatchcase(str(key), pattern))
+                ),
+            )
+
+        deleted = 0
+        if tags:
+            deleted += await storage.invalidate_tags(tags)
+        if pattern is not None:
+            deleted += await storage.invalidate_pattern(pattern)
+        return deleted
+
+    def invalidates(
+        self,
+        tags: Union[Tags, None] = None,
+        endpoints: Iterable[Callable] = (),
+        storage: Union[BaseStorage, None] = None,
+    ):
+        """Decorates a mutating route to invalidate `tags` and the entries of
+        `endpoints`, decorated with `tag_endpoint=True`, once it succeeded, i.e.
+        returned without raising or with a response status below 400."""
+        endpoint_tags = tuple(_tag_of_endpoint(endpoint) for endpoint in endpoints)
+
+        def _wrapper(
+            func: Callable[P, Union[R, Coroutine[R, Any, Any]]],
+        ) -> Callable[P, Coroutine[R, Any, Any]]:
+            sig = inspect.signature(func)
+
+            @wraps(func)
+            async def _decorator(*args: P.args, **kwargs: P.kwargs):
+                if asyncio.iscoroutinefunction(func):
+                    output = await func(*args, **kwargs)
+                else:
+                    output = await self.sync_runner.run(partial(func, *args, **kwargs))
+
+                if isinstance(output, Response) and output.status_code >= 400:
+                    return output
+
+                invalidated = (
+                    *endpoint_tags,
+                    *_resolve_tags(tags, sig, args, kwargs, output),
+                )
+                if invalidated:
+                    await self.invalidate(tags=invalidated, storage=storage)
+                return output
+
+            return _decorator
+
+        return _wrapper
+
+    async def prefill(
+        self,
+        fn: Callable[..., Coroutine[Any, Any, Any]],
+        arguments: Iterable[Mapping[str, Any]],
+        concurrency: int = 10,
+        refresh: bool = False,
+        app: Union[FastAPI, None] = None,
+    ) -> int:
+        """Fills the cache of the decorated `fn` for every set of keyword
+        `arguments`, running at most `concurrency` calls at a time.
+
+        Existing fresh entries are kept unless `refresh` is set. Calls see a
+        bare GET request, so keys cannot depend on headers or query params.
+        Endpoints caching encoded bodies need the `app` serving them, bodies
+        are rendered through their route. Returns how many entries were
+        computed, failures are logged.
+        """
+        sig = inspect.signature(fn)
+        request_param = _extract_param_of_type(sig, Request)
+        response_param = _extract_param_of_type(sig, Response)
+        if request_param is None or response_param is None:
+            raise ValueError(f"{fn} is not decorated with UltraCache")
+
+        scope: dict[str, Any] = {
+            "type": "http",
+            "method": "GET",
+            "headers": [(b"cache-control", b"no-cache")] if refresh else [],
+            "query_string": b"",
+        }
+        if app is not None:
+            route = next(
+                (
+                    route
+                    for route in app.routes
+                    if isinstance(route, APIRoute) and route.endpoint is fn
+                ),
+                None,
+            )
+            if route is None:
+                raise ValueError(f"{fn} is not a route of {app}")
+            scope["route"] = route
+        elif getattr(fn, "_cache_body", False):
+            # the raw return value would be cached, skipping the response model
+            raise ValueError(f"{fn} caches encoded bodies, prefilling it needs the app")
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _fill(kwargs: Mapping[str, Any]) -> bool:
+            request = Request(dict(scope))
+            response = Response()
+            async with semaphore:
+                try:
+                    await fn(
+                        **kwargs,
+                        **{request_param.name: request, response_param.name: response},
+                    )
+                except Exception:
+                    logger.exception("Prefilling %s with %s failed", fn, kwargs)
+                    return False
+            return response.headers.get("X-Cache", None) == "MISS"
+
+        filled = await asyncio.gather(*(_fill(kwargs) for kwargs in arguments))
+        return sum(filled)
 
     def __call__(
         self,
@@ -81,11 +434,47 @@ class UltraCache:
         build_cache_key: BuildCacheKey = DefaultBuildCacheKey(),
         storage: Union[BaseStorage, None] = None,
         hash_fn: Callable[[Any], str] = _default_hash_fn,
+        single_flight: bool = False,
+        single_flight_timeout: Union[int, float, None] = None,
+        single_flight_distributed: bool = False,
+        stale_while_revalidate: Union[int, None] = None,
+        stale_if_error: Union[int, None] = None,
+        serializer: Union[str, Serializer, None] = None,
+        cache_body: bool = False,
+        tags: Union[Tags, None] = None,
+        tag_endpoint: bool = False,
+        write_behind: bool = False,
+        sync_runner: Union[SyncRunner, None] = None,
+        early_recompute: Union[int, float, None] = None,
+        ttl_jitter: Union[float, None] = None,
     ):
+        if cache_body and serializer is not None:
+            raise ValueError("cache_body stores encoded bytes, it takes no serializer")
+        if ttl_jitter is not None and not 0 <= ttl_jitter < 1:
+            raise ValueError("ttl_jitter is a fraction of the ttl, from 0 up to 1")
+
         def _wrapper(
             func: Callable[P, Union[R, Coroutine[R, Any, Any]]],
         ) -> Callable[P, Coroutine[R, Any, Any]]:
             sig = inspect.signature(func)
+            # lets the endpoint's entries be invalidated together, at the cost
+            # of indexing every one of them
+            own_tags = (endpoint_tag(func),) if tag_endpoint else ()
+            endpoint = f"{func.__module__}:{func.__qualname__}"
+            if cache_body:
+                resolved_serializer = BytesSerializer()
+            elif serializer is not None:
+                # "pydantic" validates cached data back into the return annotation
+                resolved_serializer = get_serializer(
+                    serializer, get_type_hints(func).get("return")
+                )
+            else:
+                resolved_serializer = None
+
+            # builders may take the request, e.g. to key on headers
+            key_needs_request = (
+                "request" in inspect.signature(build_cache_key).parameters
+            )
 
             original_request_param = _extract_param_of_type(sig, Request)
             original_response_param = _extract_param_of_type(sig, Response)
@@ -106,74 +495,330 @@ class UltraCache:
 
             func.__signature__ = sig.replace(parameters=new_parameters)
 
+            # where the request and response are passed, left out of the key
+            extracted_names = frozenset([request_param.name, response_param.name])
+            extracted_positions = tuple(
+                i
+                for i, param in enumerate(sig.parameters.values())
+                if param in (original_request_param, original_response_param)
+                and param.kind
+                in (
+                    inspect.Parameter.POSITIONAL_ONLY,
+                    inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                )
+            )
+            # Note: inspect.iscoroutinefunction returns False for AsyncMock
+            is_async = asyncio.iscoroutinefunction(func)
+
+            # lifetimes come from the route alone, a request's max-age only
+            # limits the age of entries it accepts (RFC 9111)
+            stale_ttl = max(stale_while_revalidate or 0, stale_if_error or 0) or None
+
+            def _with_defaults(cache_control: CacheControl) -> CacheControl:
+                if not cache_control.max_age:
+                    # max-age=0 asks for revalidation, it is no lifetime
+                    cache_control.pop("max-age")
+                if ttl:
+                    cache_control.set("max-age", ttl)
+                if stale_while_revalidate:
+                    cache_control.set("stale-while-revalidate", stale_while_revalidate)
+                if stale_if_error:
+                    cache_control.set("stale-if-error", stale_if_error)
+                return cache_control
+
+            # used as is by requests without a Cache-Control header
+            no_directives = CacheControl({})
+            default_cache_control = _with_defaults(CacheControl({}))
+            default_cache_control_header = (
+                default_cache_control.to_response_header().encode("latin-1")
+            )
+
             # allows for the decorator to be used with fastapi params interospection
             @wraps(func)
             async def _decorator(*args: P.args, **kwargs: P.kwargs):
                 nonlocal storage
+                instrumentation = self.instrumentation
+                timed = instrumentation.enabled
                 request: Request = kwargs.get(request_param.name)
                 response: Response = kwargs.get(response_param.name)
 
-                cache_control = CacheControl.from_string(
-                    request.headers.get("cache-control", None)
+                raw_cache_control, if_none_match, raw_if_modified_since = (
+                    _conditional_headers(request)
                 )
-                if_none_match = request.headers.get("if-none-match", None)
+                # `requested` as sent, `cache_control` with the route's defaults
+                if raw_cache_control is None:
+                    requested = no_directives
+                    cache_control = default_cache_control
+                    cache_control_header = default_cache_control_header
+                else:
+                    requested = CacheControl.from_string(raw_cache_control)
+                    cache_control = _with_defaults(requested.copy())
+                    cache_control_header = cache_control.to_response_header().encode(
+                        "latin-1"
+                    )
 
+                if timed:
+                    started = time.perf_counter()
                 args_for_key, kwargs_for_key = _extract(
-                    response_param, *(_extract(request_param, args, kwargs))
+                    extracted_names, extracted_positions, args, kwargs
                 )
-                key = build_cache_key(func, args=args_for_key, kwargs=kwargs_for_key)
+                if key_needs_request:
+                    key = build_cache_key(
+                        func, args=args_for_key, kwargs=kwargs_for_key, request=request
+                    )
+                else:
+                    key = build_cache_key(
+                        func, args=args_for_key, kwargs=kwargs_for_key
+                    )
+                if timed:
+                    instrumentation.record_duration(
+                        endpoint, BUILD_KEY, time.perf_counter() - started
+                    )
+                    if cache_control.no_cache or cache_control.no_store:
+                        instrumentation.record_event(endpoint, BYPASS)
 
                 if storage is None:
                     storage = self.storage
 
-                cached = None
+                entry = None
                 if not cache_control.no_cache:
-                    cached = await storage.get(key)
-
-                if ttl:
-                    cache_control.setdefault("max-age", ttl)
-
-                response.headers["Cache-Control"] = cache_control.to_response_header()
-
-                if cached is not None:
-                    response.headers["X-Cache"] = "HIT"
-                    response.headers["ETag"] = hash_fn(cached)
-
-                    if request.method in ["HEAD", "GET"]:
-                        if _does_etag_match(response.headers["ETag"], if_none_match):
-                            response.status_code = 304
-                            return
-
-                    return cached
-                else:
-                    response.headers["X-Cache"] = "MISS"
+                    if write_behind:
+                        entry = self.write_behind.pending(storage, key)
+                    if entry is None:
+                        if timed:
+                            started = time.perf_counter()
+                        entry = await storage.get_entry(
+                            key, serializer=resolved_serializer
+                        )
+                        if timed:
+                            instrumentation.record_duration(
+                                endpoint, STORAGE_GET, time.perf_counter() - started
+                            )
+
+                if_modified_since = None
+                if raw_if_modified_since is not None:
+                    if_modified_since = parse_http_date(raw_if_modified_since)
 
                 if original_request_param is None:
                     kwargs.pop("request")
                 if original_response_param is None:
                     kwargs.pop("response")
 
-                # Note: inspect.iscoroutinefunction returns False for AsyncMock
-                if asyncio.iscoroutinefunction(func):
-                    output = await func(*args, **kwargs)
-                else:
-                    output = await anyio.to_thread.run_sync(
-                        partial(func, *args, **kwargs)
+                def _respond(entry: CacheEntry, headers: dict[bytes, bytes]):
+                    # entries saved without metadata come without an ETag
+                    etag = entry.etag or hash_fn(entry.value)
+                    headers[b"etag"] = etag.encode("latin-1")
+                    headers[b"last-modified"] = http_date(int(entry.created_at)).encode(
+                        "latin-1"
                     )
-
-                response.headers["ETag"] = hash_fn(output)
-                if request.method in ["HEAD", "GET"]:
-                    if _does_etag_match(response.headers["ETag"], if_none_match):
-                        response.status_code = 304
-                        return
-
-                if not cache_control.no_store:
-                    await storage.save(
-                        key=key, value=output, ttl=cache_control.max_age or ttl
+                    if entry.ttl is not None:
+                        headers[b"expires"] = http_date(
+                            int(entry.created_at + entry.ttl)
+                        ).encode("latin-1")
+                    _set_headers(response, headers)
+
+                    not_modified = False
+                    if request.method in ("GET", "HEAD"):
+                        # If-Modified-Since only counts without If-None-Match
+                        if if_none_match is not None:
+                            not_modified = _does_etag_match(etag, if_none_match)
+                        elif if_modified_since is not None:
+                            # Last-Modified is precise to the second
+                            not_modified = int(entry.created_at) <= if_modified_since
+                    if not_modified and timed:
+                        instrumentation.record_event(endpoint, NOT_MODIFIED)
+
+                    if not cache_body:
+                        if not_modified:
+                            response.status_code = 304
+                            return None
+                        return entry.value
+
+                    # FastAPI returns responses as they are, without encoding
+                    # them again or merging the headers of `response`
+                    if not_modified:
+                        prebuilt = Response(status_code=304)
+                    else:
+                        route = _route_of(request)
+                        prebuilt = Response(
+                            entry.value,
+                            # the order FastAPI picks the status code in
+                            status_code=response.status_code
+                            or (route and route.status_code)
+                            or 200,
+                            media_type=entry.content_type,
+                        )
+                    prebuilt.raw_headers.extend(
+                        header
+                        for header in response.raw_headers
+                        if header[0] not in (b"content-length", b"content-type")
                     )
+                    return prebuilt
+
+                def _respond_cached(entry: CacheEntry, status: bytes):
+                    headers = {
+                        b"cache-control": cache_control_header,
+                        b"x-cache": status,
+                        b"age": str(round(entry.age)).encode("latin-1"),
+                    }
+                    return _respond(entry, headers)
+
+                acceptable = entry is not None and _is_acceptable(entry, requested)
+                if acceptable and not entry.stale:
+                    if early_recompute is None or not _recompute_early(
+                        entry, early_recompute
+                    ):
+                        self.stats.hits += 1
+                        if timed:
+                            instrumentation.record_event(endpoint, HIT)
+                        return _respond_cached(entry, b"HIT")
+                    recompute_early = True
+                else:
+                    recompute_early = False
+
+                async def _compute() -> CacheEntry:
+                    started = time.perf_counter()
+                    if is_async:
+                        output = await func(*args, **kwargs)
+                    else:
+                        output = await (sync_runner or self.sync_runner).run(
+                            partial(func, *args, **kwargs)
+                        )
+                    compute_time = time.perf_counter() - started
+                    if timed:
+                        instrumentation.record_duration(
+                            endpoint, ENDPOINT, compute_time
+                        )
+
+                    entry_ttl = ttl
+                    if ttl_jitter and entry_ttl:
+                        # entries saved together should not expire together
+                        entry_ttl *= 1 - ttl_jitter * random.random()
+                    entry = CacheEntry(
+                        output,
+                        ttl=entry_ttl,
+                        stale_ttl=stale_ttl,
+                        tags=(
+                            *own_tags,
+                            *_resolve_tags(tags, sig, args, kwargs, output),
+                        ),
+                        compute_time=compute_time,
+                    )
+                    if cache_body:
+                        entry.value, entry.content_type = await _encode_body(
+                            output, _route_of(request)
+                        )
+                    # hashed once here, hits reuse the stored ETag
+                    entry.etag = hash_fn(output)
+
+                    if not cache_control.no_store:
+                        if timed:
+                            nbytes = payload_size(entry.value)
+                            if nbytes is not None:
+                                instrumentation.record_size(endpoint, nbytes)
+                            started = time.perf_counter()
+                        if write_behind:
+                            self.write_behind.submit(
+                                storage, key, entry, resolved_serializer
+                            )
+                        else:
+                            await storage.save_entry(
+                                key, entry, serializer=resolved_serializer
+                            )
+                        if timed:
+                            instrumentation.record_duration(
+                                endpoint, STORAGE_SAVE, time.perf_counter() - started
+                            )
+
+                    return entry
+
+                async def _load() -> tuple[CacheEntry, bool]:
+                    if not single_flight_distributed:
+                        return await _compute(), True
+
+                    async with storage.lock(
+                        key, timeout=single_flight_timeout
+                    ) as acquired:
+                        # another process may have filled the cache while we waited
+                        if acquired and not cache_control.no_cache:
+                            cached = await storage.get_entry(
+                                key, serializer=resolved_serializer
+                            )
+                            if (
+                                cached is not None
+                                and not cached.stale
+                                and _is_acceptable(cached, requested)
+                            ):
+                                return cached, False
+                        return await _compute(), True
+
+                if recompute_early:
+                    # still fresh, served while it is recomputed
+                    self.stats.hits += 1
+                    self.stats.early_recomputes += 1
+                    if timed:
+                        instrumentation.record_event(endpoint, HIT)
+                    self._revalidate(key, _compute)
+                    return _respond_cached(entry, b"HIT")
+
+                # served stale within stale-while-revalidate or max-stale
+                if acceptable and entry.staleness <= max(
+                    stale_while_revalidate or 0,
+                    requested.max_stale or 0,
+                ):
+                    self.stats.stale += 1
+                    if timed:
+                        instrumentation.record_event(endpoint, STALE)
+                    self._revalidate(key, _compute)
+                    return _respond_cached(entry, b"STALE")
+
+                self.stats.misses += 1
+                if timed:
+                    instrumentation.record_event(endpoint, MISS)
+                if requested.only_if_cached:
+                    raise HTTPException(status_code=504, detail="Not cached")
+                # before the endpoint runs, it may override them
+                _set_headers(
+                    response,
+                    {b"cache-control": cache_control_header, b"x-cache": b"MISS"},
+                )
 
-                return output
-
+                try:
+                    if single_flight or single_flight_distributed:
+                        (
+                            (computed_entry, computed),
+                            shared,
+                        ) = await self._single_flight.do(
+                            key, _load, timeout=single_flight_timeout
+                        )
+                        if shared or not computed:
+                            self.stats.coalesced += 1
+                    else:
+                        computed_entry = await _compute()
+                except Saturated:
+                    # back-pressure, any entry beats waiting for a thread
+                    if entry is None:
+                        raise HTTPException(
+                            status_code=503, detail="Service saturated"
+                        ) from None
+                    self.stats.stale += 1
+                    return _respond_cached(entry, b"STALE")
+                except Exception as e:
+                    if (
+                        entry is None
+                        or entry.staleness
+                        > max(stale_if_error or 0, requested.stale_if_error or 0)
+                        or _is_client_error(e)
+                    ):
+                        raise
+                    logger.exception("Serving stale entry for %s after error", key)
+                    self.stats.stale += 1
+                    return _respond_cached(entry, b"STALE")
+
+                return _respond(computed_entry, {})
+
+            _decorator._cache_body = cache_body
+            _decorator._tag_endpoint = tag_endpoint
             return _decorator
 
         return _wrapper
@@ -0,0 +1,232 @@
+from collections import defaultdict
+from typing import Any, Union
+
+from ultra_cache.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from ultra_cache.serializers import JsonSerializer
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry import metrics as otel_metrics
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_metrics = None
+    otel_trace = None
+
+# events recorded per endpoint
+HIT = "hit"
+STALE = "stale"
+MISS = "miss"
+NOT_MODIFIED = "not_modified"
+BYPASS = "bypass"
+
+# timed operations
+BUILD_KEY = "build_key"
+STORAGE_GET = "storage_get"
+STORAGE_SAVE = "storage_save"
+ENDPOINT = "endpoint"
+
+# why a storage operation was skipped
+TIMEOUT = "timeout"
+ERROR = "error"
+SHORT_CIRCUITED = "short_circuited"
+
+
+class Instrumentation:
+    """Receives measurements from decorated endpoints, discards them.
+
+    Subclasses set `enabled` and override the `record_*` methods. While
+    `enabled` is False the decorator does not even read the clock, so the
+    default costs next to nothing.
+    """
+
+    enabled = False
+
+    def record_event(self, endpoint: str, event: str) -> None:
+        """One of HIT, STALE, MISS, NOT_MODIFIED or BYPASS happened."""
+
+    def record_duration(self, endpoint: str, operation: str, seconds: float) -> None:
+        """BUILD_KEY, STORAGE_GET, STORAGE_SAVE or ENDPOINT took `seconds`."""
+
+    def record_size(self, endpoint: str, nbytes: int) -> None:
+        """A payload of `nbytes` was cached."""
+
+    def record_fallback(self, storage: str, operation: str, reason: str) -> None:
+        """`operation` on `storage` was given up for TIMEOUT, ERROR or
+        SHORT_CIRCUITED."""
+
+    def record_breaker_state(self, storage: str, state: str) -> None:
+        """The circuit breaker of `storage` is now `state`."""
+
+
+class InMemoryRecorder(Instrumentation):
+    """Keeps every measurement, meant for tests and debugging."""
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.events: defaultdict[tuple[str, str], int] = defaultdict(int)
+        self.durations: defaultdict[tuple[str, str], list[float]] = defaultdict(list)
+        self.sizes: defaultdict[str, list[int]] = defaultdict(list)
+        self.fallbacks: defaultdict[tuple[str, str, str], int] = defaultdict(int)
+        self.breaker_states: dict[str, str] = {}
+
+    def record_event(self, endpoint: str, event: str) -> None:
+        self.events[endpoint, event] += 1
+
+    def record_duration(self, endpoint: str, operation: str, seconds: float) -> None:
+        self.durations[endpoint, operation].append(seconds)
+
+    def record_size(self, endpoint: str, nbytes: int) -> None:
+        self.sizes[endpoint].append(nbytes)
+
+    def record_fallback(self, storage: str, operation: str, reason: str) -> None:
+        self.fallbacks[storage, operation, reason] += 1
+
+    def record_breaker_state(self, storage: str, state: str) -> None:
+        self.breaker_states[storage] = state
+
+    def hit_ratio(self, endpoint: str) -> float:
+        hits = self.events[endpoint, HIT] + self.events[endpoint, STALE]
+        lookups = hits + self.events[endpoint, MISS]
+        return hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        self.events.clear()
+        self.durations.clear()
+        self.sizes.clear()
+        self.fallbacks.clear()
+        self.breaker_states.clear()
+
+
+class PrometheusInstrumentation(Instrumentation):
+    enabled = True
+
+    def __init__(self, registry: Any = None, namespace: str = "ultra_cache") -> None:
+        if prometheus_client is None:
+            raise ImportError(
+                "PrometheusInstrumentation requires prometheus_client, "
+                "install it with `pip install prometheus-client`"
+            )
+        kwargs = {"namespace": namespace}
+        if registry is not None:
+            kwargs["registry"] = registry
+        self.events = prometheus_client.Counter(
+            "events", "Cache lookups by outcome", ["endpoint", "event"], **kwargs
+        )
+        self.durations = prometheus_client.Histogram(
+            "duration_seconds",
+            "Time spent per operation",
+            ["endpoint", "operation"],
+            **kwargs,
+        )
+        self.sizes = prometheus_client.Histogram(
+            "payload_bytes",
+            "Size of cached payloads",
+            ["endpoint"],
+            buckets=[2**i for i in range(6, 25, 2)],
+            **kwargs,
+        )
+        self.fallbacks = prometheus_client.Counter(
+            "storage_fallbacks",
+            "Storage operations given up by reason",
+            ["storage", "operation", "reason"],
+            **kwargs,
+        )
+        self.breaker_state = prometheus_client.Gauge(
+            "breaker_state",
+            "1 for the current state of a storage's circuit breaker",
+            ["storage", "state"],
+            **kwargs,
+        )
+
+    def record_event(self, endpoint: str, event: str) -> None:
+        self.events.labels(endpoint, event).inc()
+
+    def record_duration(self, endpoint: str, operation: str, seconds: float) -> None:
+        self.durations.labels(endpoint, operation).observe(seconds)
+
+    def record_size(self, endpoint: str, nbytes: int) -> None:
+        self.sizes.labels(endpoint).observe(nbytes)
+
+    def record_fallback(self, storage: str, operation: str, reason: str) -> None:
+        self.fallbacks.labels(storage, operation, reason).inc()
+
+    def record_breaker_state(self, storage: str, state: str) -> None:
+        for other in (CLOSED, OPEN, HALF_OPEN):
+            self.breaker_state.labels(storage, other).set(int(other == state))
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """Records OpenTelemetry metrics and tags the current span, e.g. the one
+    of FastAPI's instrumentation, with the cache outcome."""
+
+    enabled = True
+
+    def __init__(self, meter: Any = None, tag_spans: bool = True) -> None:
+        if otel_metrics is None:
+            raise ImportError(
+                "OpenTelemetryInstrumentation requires opentelemetry-api, "
+                "install it with `pip install opentelemetry-api`"
+            )
+        meter = meter or otel_metrics.get_meter("ultra_cache")
+        self.tag_spans = tag_spans
+        self.events = meter.create_counter(
+            "ultra_cache.events", description="Cache lookups by outcome"
+        )
+        self.durations = meter.create_histogram(
+            "ultra_cache.duration", unit="s", description="Time spent per operation"
+        )
+        self.sizes = meter.create_histogram(
+            "ultra_cache.payload_size", unit="By", description="Size of cached payloads"
+        )
+        self.fallbacks = meter.create_counter(
+            "ultra_cache.storage_fallbacks",
+            description="Storage operations given up by reason",
+        )
+        self.breaker_state = meter.create_up_down_counter(
+            "ultra_cache.breaker_state",
+            description="1 for the current state of a storage's circuit breaker",
+        )
+        self._breaker_states: dict[str, str] = {}
+
+    def record_event(self, endpoint: str, event: str) -> None:
+        self.events.add(1, {"endpoint": endpoint, "event": event})
+        if self.tag_spans and event != BYPASS:
+            otel_trace.get_current_span().set_attribute("ultra_cache.result", event)
+
+    def record_duration(self, endpoint: str, operation: str, seconds: float) -> None:
+        self.durations.record(seconds, {"endpoint": endpoint, "operation": operation})
+
+    def record_size(self, endpoint: str, nbytes: int) -> None:
+        self.sizes.record(nbytes, {"endpoint": endpoint})
+
+    def record_fallback(self, storage: str, operation: str, reason: str) -> None:
+        self.fallbacks.add(
+            1, {"storage": storage, "operation": operation, "reason": reason}
+        )
+
+    def record_breaker_state(self, storage: str, state: str) -> None:
+        previous = self._breaker_states.get(storage, None)
+        if previous == state:
+            return
+        if previous is not None:
+            self.breaker_state.add(-1, {"storage": storage, "state": previous})
+        self.breaker_state.add(1, {"storage": storage, "state": state})
+        self._breaker_states[storage] = state
+
+
+_json_serializer = JsonSerializer()
+
+
+def payload_size(value: Any) -> Union[int, None]:
+    """Size of an encoded payload, or of the JSON a value would be sent as."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    try:
+        return len(_json_serializer.dumps(value))
+    except Exception:
+        return None
@@ -0,0 +1,160 @@
+import json
+import pickle
+from typing import Any, Protocol, Union
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Serializer(Protocol):
+    def dumps(self, value: Any) -> bytes: ...
+
+    def loads(self, data: bytes) -> Any: ...
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+
+def _orjson_default(value: Any) -> Any:
+    # orjson handles datetimes, UUIDs, dataclasses... natively and calls this
+    # again for anything left, which is cheaper than dumping in json mode
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return jsonable_encoder(value)
+
+
+class JsonSerializer(Serializer):
+    """JSON through orjson when it is installed, the standard library otherwise.
+
+    Values that JSON cannot represent natively, e.g. pydantic models, are
+    stored in the same shape FastAPI would render them in.
+    """
+
+    def __init__(self, use_orjson: bool = True, sort_keys: bool = False) -> None:
+        self.use_orjson = use_orjson and orjson is not None
+        self.sort_keys = sort_keys
+
+    def dumps(self, value: Any) -> bytes:
+        if self.use_orjson:
+            # the standard library turns such keys into strings as well
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(value, default=_orjson_default, option=option)
+        return json.dumps(
+            value,
+            default=_json_default,
+            separators=(",", ":"),
+            sort_keys=self.sort_keys,
+            # UTF-8 like orjson, for the same bytes, and ETags, either way
+            ensure_ascii=False,
+        ).encode()
+
+    def loads(self, data: bytes) -> Any:
+        if self.use_orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise ImportError(
+                "MsgpackSerializer requires msgpack, install it with `pip install msgpack`"
+            )
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_json_default)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+class PickleSerializer(Serializer):
+    """Preserves arbitrary Python objects.
+
+    Only use it with a storage nobody else can write to, unpickling untrusted
+    data can execute arbitrary code.
+    """
+
+    def __init__(self, protocol: int = pickle.HIGHEST_PROTOCOL) -> None:
+        self.protocol = protocol
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=self.protocol)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)  # noqa: S301
+
+
+class PydanticSerializer(Serializer):
+    """Validates cached data back into `type_`, e.g. the endpoint's return type.
+
+    Uses `model_dump_json`/`model_validate_json` for models and a `TypeAdapter`
+    for anything else pydantic understands, like `list[Model]`.
+    """
+
+    def __init__(self, type_: Any) -> None:
+        self.type_ = type_
+        self._is_model = isinstance(type_, type) and issubclass(type_, BaseModel)
+        self._adapter = TypeAdapter(type_)
+
+    def dumps(self, value: Any) -> bytes:
+        if self._is_model:
+            if not isinstance(value, self.type_):
+                # e.g. endpoints returning dicts with a model as return type
+                value = self.type_.model_validate(value)
+            return value.model_dump_json().encode()
+        return self._adapter.dump_json(self._adapter.validate_python(value))
+
+    def loads(self, data: bytes) -> Any:
+        if self._is_model:
+            return self.type_.model_validate_json(data)
+        return self._adapter.validate_json(data)
+
+
+class BytesSerializer(Serializer):
+    """Stores bytes as they are, e.g. already encoded response bodies."""
+
+    def dumps(self, value: bytes) -> bytes:
+        return value
+
+    def loads(self, data: bytes) -> bytes:
+        return data
+
+
+SERIALIZERS: dict[str, type[Serializer]] = {
+    "json": JsonSerializer,
+    "msgpack": MsgpackSerializer,
+    "pickle": PickleSerializer,
+    "bytes": BytesSerializer,
+}
+
+
+def get_serializer(serializer: Union[str, Serializer], type_: Any = None) -> Serializer:
+    """Resolves a serializer name, "pydantic" needs the type to validate into."""
+    if not isinstance(serializer, str):
+        return serializer
+    if serializer == "pydantic":
+        if type_ is None:
+            raise ValueError("The pydantic serializer needs a type to validate into")
+        return PydanticSerializer(type_)
+    if serializer not in SERIALIZERS:
+        raise ValueError(
+            f"Unknown serializer {serializer!r}, expected one of "
+            f"{[*SERIALIZERS, 'pydantic']}"
+        )
+    return SERIALIZERS[serializer]()
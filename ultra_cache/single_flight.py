@@ -0,0 +1,64 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar, Union
+
+R = TypeVar("R")
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # marks the exception as retrieved when nobody was waiting for the result
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight(Generic[R]):
+    """Deduplicates concurrent calls sharing the same key.
+
+    The first caller for a key runs the function, callers arriving while it is
+    in flight wait for its result instead of running the function again.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[R]],
+        timeout: Union[int, float, None] = None,
+    ) -> tuple[R, bool]:
+        """Returns the result of `fn` and whether it was shared with another caller.
+
+        Waiters give up after `timeout` seconds and run `fn` themselves,
+        the same happens when the running call gets cancelled.
+        """
+        future = self._calls.get(key, None)
+        if future is not None:
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout), True
+            except asyncio.TimeoutError:
+                return await fn(), False
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                return await fn(), False
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
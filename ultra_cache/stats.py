@@ -0,0 +1,17 @@
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    stale: int = 0
+    early_recomputes: int = 0
+
+    def reset(self) -> None:
+        for field, value in asdict(CacheStats()).items():
+            setattr(self, field, value)
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
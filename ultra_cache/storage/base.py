@@ -1,10 +1,64 @@
 from abc import ABC, abstractmethod
-from typing import TypeVar, Union
+from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator, Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+import time
+from typing import TYPE_CHECKING, Generic, TypeVar, Union
+
+if TYPE_CHECKING:
+    from ultra_cache.serializers import Serializer
 
 K = TypeVar("K")
 V = TypeVar("V")
 
 
+def _now() -> float:
+    # looked up on every call, so that patched clocks are picked up
+    return time.time()
+
+
+@dataclass
+class CacheEntry(Generic[V]):
+    value: V
+    ttl: Union[int, float, None] = None
+    # how long the entry is kept around after it stopped being fresh
+    stale_ttl: Union[int, float, None] = None
+    created_at: float = field(default_factory=_now)
+    etag: Union[str, None] = None
+    # set when `value` holds an encoded response body
+    content_type: Union[str, None] = None
+    # groups of entries that can be invalidated together
+    tags: tuple[str, ...] = ()
+    # seconds it took to compute `value`, to recompute it early in time
+    compute_time: Union[float, None] = None
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.created_at)
+
+    @property
+    def expires_at(self) -> Union[float, None]:
+        if self.ttl is None:
+            return None
+        return self.created_at + self.ttl
+
+    @property
+    def staleness(self) -> float:
+        if self.ttl is None:
+            return 0.0
+        return max(0.0, self.age - self.ttl)
+
+    @property
+    def stale(self) -> bool:
+        return self.ttl is not None and self.age > self.ttl
+
+    @property
+    def retention(self) -> Union[int, float, None]:
+        if self.ttl is None:
+            return None
+        return self.ttl + (self.stale_ttl or 0)
+
+
 class BaseStorage(ABC):
     @abstractmethod
     async def save(
@@ -16,3 +70,81 @@ class BaseStorage(ABC):
 
     @abstractmethod
     async def clear(self) -> None: ...
+
+    async def delete(self, key: K) -> None:
+        raise NotImplementedError(f"{type(self).__name__} does not support delete")
+
+    async def save_entry(
+        self,
+        key: K,
+        entry: CacheEntry[V],
+        serializer: Union["Serializer", None] = None,
+    ) -> None:
+        """Saves an entry together with its metadata.
+
+        `serializer` overrides the storage's own serializer, storages keeping
+        Python objects as they are may ignore it. Storages that cannot keep
+        metadata fall back to a plain `save`, in which case entries are never
+        served stale.
+        """
+        await self.save(key, entry.value, entry.ttl)
+
+    async def get_entry(
+        self, key: K, serializer: Union["Serializer", None] = None
+    ) -> Union[CacheEntry[V], None]:
+        """Returns the entry with its metadata, including entries past their ttl
+        that are still within their `stale_ttl`."""
+        value = await self.get(key)
+        if value is None:
+            return None
+        return CacheEntry(value)
+
+    async def get_many(
+        self, keys: Sequence[K], serializer: Union["Serializer", None] = None
+    ) -> list[Union[CacheEntry[V], None]]:
+        """Bulk `get_entry`, entries are returned in the order of `keys`.
+
+        Backends talking to a server should do it in a single round-trip, the
+        default implementation falls back to one `get_entry` per key.
+        """
+        return [await self.get_entry(key, serializer=serializer) for key in keys]
+
+    async def save_many(
+        self,
+        entries: Mapping[K, CacheEntry[V]],
+        serializer: Union["Serializer", None] = None,
+    ) -> None:
+        """Bulk `save_entry`."""
+        for key, entry in entries.items():
+            await self.save_entry(key, entry, serializer=serializer)
+
+    async def delete_many(self, keys: Sequence[K]) -> None:
+        """Bulk `delete`."""
+        for key in keys:
+            await self.delete(key)
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        """Deletes the entries whose key matches the glob-style `pattern`,
+        returns how many were deleted."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support invalidating by pattern"
+        )
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Deletes the entries saved with any of `tags`, returns how many were
+        deleted."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support invalidating by tags"
+        )
+
+    @asynccontextmanager
+    async def lock(
+        self, key: K, timeout: Union[int, float, None] = None
+    ) -> AsyncIterator[bool]:
+        """Cross-process lock guarding the computation of `key`.
+
+        Yields whether the lock was acquired within `timeout` seconds. Storages
+        that are local to the process have nothing to coordinate with, so the
+        default implementation always succeeds immediately.
+        """
+        yield True
@@ -0,0 +1,77 @@
+import json
+import struct
+from typing import Any, Union
+
+from ultra_cache.compression import UNCOMPRESSED, Compression, decompress
+from ultra_cache.serializers import Serializer
+from ultra_cache.storage.base import CacheEntry
+
+# entries are stored as MAGIC + len(metadata) + metadata as JSON + payload,
+# the payload starts with a byte naming its compression
+MAGIC = b"uc\x03"
+_LENGTH = struct.Struct("!I")
+_HEADER_SIZE = len(MAGIC) + _LENGTH.size
+
+
+def dump_entry(
+    entry: CacheEntry,
+    serializer: Serializer,
+    compression: Union[Compression, None] = None,
+) -> bytes:
+    metadata: dict[str, Any] = {"c": entry.created_at}
+    if entry.ttl is not None:
+        metadata["t"] = entry.ttl
+    if entry.stale_ttl is not None:
+        metadata["s"] = entry.stale_ttl
+    if entry.etag is not None:
+        metadata["e"] = entry.etag
+    if entry.content_type is not None:
+        metadata["m"] = entry.content_type
+    if entry.tags:
+        metadata["g"] = entry.tags
+    if entry.compute_time is not None:
+        metadata["d"] = entry.compute_time
+
+    encoded = json.dumps(metadata, separators=(",", ":")).encode()
+    data = serializer.dumps(entry.value)
+    if compression is None:
+        payload = [UNCOMPRESSED, data]
+    else:
+        payload = [compression.compress(data)]
+    return b"".join([MAGIC, _LENGTH.pack(len(encoded)), encoded, *payload])
+
+
+def load_metadata(raw: Union[bytes, memoryview]) -> dict[str, Any]:
+    """The metadata of an entry, without decoding its value."""
+    if raw[: len(MAGIC)] != MAGIC:
+        return {}
+    (length,) = _LENGTH.unpack_from(raw, len(MAGIC))
+    return json.loads(bytes(raw[_HEADER_SIZE : _HEADER_SIZE + length]))
+
+
+def load_entry(
+    raw: Union[bytes, memoryview],
+    serializer: Serializer,
+    compression: Union[Compression, None] = None,
+) -> CacheEntry:
+    if raw[: len(MAGIC)] != MAGIC:
+        # written without metadata, e.g. by an older version
+        return CacheEntry(bytes(raw))
+
+    metadata = load_metadata(raw)
+    (length,) = _LENGTH.unpack_from(raw, len(MAGIC))
+    payload = bytes(raw[_HEADER_SIZE + length :])
+    if compression is None:
+        data = decompress(payload)
+    else:
+        data = compression.decompress(payload)
+    return CacheEntry(
+        serializer.loads(data),
+        ttl=metadata.get("t", None),
+        stale_ttl=metadata.get("s", None),
+        created_at=metadata["c"],
+        etag=metadata.get("e", None),
+        content_type=metadata.get("m", None),
+        tags=tuple(metadata.get("g", ())),
+        compute_time=metadata.get("d", None),
+    )
@@ -0,0 +1,263 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Hashable
+import sys
+from typing import Any, Union
+
+
+class EvictionPolicy(ABC):
+    """Decides which key to drop when a bounded storage runs out of room.
+
+    Every method is expected to run in O(1).
+    """
+
+    @abstractmethod
+    def insert(self, key: Hashable) -> None: ...
+
+    @abstractmethod
+    def access(self, key: Hashable) -> None: ...
+
+    @abstractmethod
+    def remove(self, key: Hashable) -> None: ...
+
+    @abstractmethod
+    def victim(self, candidate: Hashable) -> Hashable:
+        """Returns the key to evict to make room for `candidate`.
+
+        Returning `candidate` itself rejects it, it will then not be stored.
+        """
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+class LRUPolicy(EvictionPolicy):
+    def __init__(self) -> None:
+        self._order: OrderedDict[Hashable, None] = OrderedDict()
+
+    def insert(self, key: Hashable) -> None:
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def access(self, key: Hashable) -> None:
+        if key in self._order:
+            self._order.move_to_end(key)
+
+    def remove(self, key: Hashable) -> None:
+        self._order.pop(key, None)
+
+    def victim(self, candidate: Hashable) -> Hashable:
+        return next(iter(self._order), candidate)
+
+    def clear(self) -> None:
+        self._order.clear()
+
+
+class LFUPolicy(EvictionPolicy):
+    """Least frequently used, ties broken by least recently used."""
+
+    def __init__(self) -> None:
+        self._frequencies: dict[Hashable, int] = {}
+        self._buckets: dict[int, OrderedDict[Hashable, None]] = {}
+        # frequencies with a bucket, linked in ascending order from and back to
+        # 0, so that the least frequent bucket is always one lookup away
+        self._next: dict[int, int] = {0: 0}
+        self._previous: dict[int, int] = {0: 0}
+
+    def _add(self, key: Hashable, frequency: int, after: int) -> None:
+        """Adds `key` to the bucket of `frequency`, linking it after the bucket
+        of `after` when it has to be created."""
+        bucket = self._buckets.get(frequency, None)
+        if bucket is None:
+            bucket = self._buckets[frequency] = OrderedDict()
+            following = self._next[after]
+            self._next[after] = self._previous[following] = frequency
+            self._previous[frequency] = after
+            self._next[frequency] = following
+
+        self._frequencies[key] = frequency
+        bucket[key] = None
+
+    def _discard(self, key: Hashable, frequency: int) -> None:
+        bucket = self._buckets[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[frequency]
+            previous = self._previous.pop(frequency)
+            following = self._next.pop(frequency)
+            self._next[previous] = following
+            self._previous[following] = previous
+
+    def _bump(self, key: Hashable, frequency: int) -> None:
+        # linked while the current bucket still exists
+        self._add(key, frequency + 1, frequency)
+        self._discard(key, frequency)
+
+    def insert(self, key: Hashable) -> None:
+        frequency = self._frequencies.get(key, None)
+        if frequency is not None:
+            self._bump(key, frequency)
+            return
+
+        self._add(key, 1, 0)
+
+    def access(self, key: Hashable) -> None:
+        frequency = self._frequencies.get(key, None)
+        if frequency is not None:
+            self._bump(key, frequency)
+
+    def remove(self, key: Hashable) -> None:
+        frequency = self._frequencies.pop(key, None)
+        if frequency is not None:
+            self._discard(key, frequency)
+
+    def victim(self, candidate: Hashable) -> Hashable:
+        least_frequent = self._next[0]
+        if not least_frequent:
+            return candidate
+        return next(iter(self._buckets[least_frequent]))
+
+    def clear(self) -> None:
+        self._frequencies.clear()
+        self._buckets.clear()
+        self._next = {0: 0}
+        self._previous = {0: 0}
+
+
+class CountMinSketch:
+    """Approximate access frequencies in a fixed amount of memory.
+
+    Counters are halved once `sample_size` increments were recorded, so old
+    popularity fades away.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4, sample_size: int = 0):
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size or width * 10
+        self._rows = [[0] * width for _ in range(depth)]
+        self._seeds = [0x9E3779B1 * (i + 1) for i in range(depth)]
+        self._additions = 0
+
+    def _indexes(self, key: Hashable) -> list[int]:
+        h = hash(key)
+        return [
+            ((h ^ seed) * 0x01000193 & 0xFFFFFFFF) % self.width for seed in self._seeds
+        ]
+
+    def add(self, key: Hashable) -> None:
+        for row, index in zip(self._rows, self._indexes(key)):
+            row[index] += 1
+
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _age(self) -> None:
+        for row in self._rows:
+            for i, value in enumerate(row):
+                row[i] = value >> 1
+        self._additions //= 2
+
+    def clear(self) -> None:
+        for row in self._rows:
+            row[:] = [0] * self.width
+        self._additions = 0
+
+
+class TinyLFUPolicy(EvictionPolicy):
+    """W-TinyLFU style policy.
+
+    New keys always enter a small LRU window. Once the window is full, its
+    oldest key competes with the oldest key of the main LRU region and the one
+    accessed less often, according to a count-min sketch, gets evicted. This
+    keeps one-hit wonders from pushing popular keys out.
+    """
+
+    def __init__(self, window_size: int = 100, sketch_width: int = 4096) -> None:
+        self.window_size = window_size
+        self.sketch = CountMinSketch(width=sketch_width)
+        self._window: OrderedDict[Hashable, None] = OrderedDict()
+        self._main: OrderedDict[Hashable, None] = OrderedDict()
+
+    def insert(self, key: Hashable) -> None:
+        self.sketch.add(key)
+        if key in self._main:
+            self._main.move_to_end(key)
+            return
+
+        self._window[key] = None
+        self._window.move_to_end(key)
+        while len(self._window) > self.window_size:
+            oldest = next(iter(self._window))
+            del self._window[oldest]
+            self._main[oldest] = None
+
+    def access(self, key: Hashable) -> None:
+        self.sketch.add(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._main:
+            self._main.move_to_end(key)
+
+    def remove(self, key: Hashable) -> None:
+        self._window.pop(key, None)
+        self._main.pop(key, None)
+
+    def victim(self, candidate: Hashable) -> Hashable:
+        if not self._window or not self._main:
+            # nothing to compete against
+            order = self._main if self._main else self._window
+            return next(iter(order), candidate)
+
+        # the candidate enters the window and pushes its oldest key out
+        window_victim = next(iter(self._window))
+        main_victim = next(iter(self._main))
+        if self.sketch.estimate(window_victim) > self.sketch.estimate(main_victim):
+            del self._window[window_victim]
+            self._main[window_victim] = None
+            return main_victim
+        return window_victim
+
+    def clear(self) -> None:
+        self.sketch.clear()
+        self._window.clear()
+        self._main.clear()
+
+
+POLICIES: dict[str, type[EvictionPolicy]] = {
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "tinylfu": TinyLFUPolicy,
+}
+
+
+def get_policy(policy: Union[str, EvictionPolicy]) -> EvictionPolicy:
+    if isinstance(policy, EvictionPolicy):
+        return policy
+    if policy not in POLICIES:
+        raise ValueError(
+            f"Unknown eviction policy {policy!r}, expected one of {list(POLICIES)}"
+        )
+    return POLICIES[policy]()
+
+
+def estimate_size(value: Any, max_depth: int = 4) -> int:
+    """Rough estimate of the memory held by `value`, following containers."""
+    size = sys.getsizeof(value)
+    if max_depth <= 0:
+        return size
+
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(k, max_depth - 1) + estimate_size(v, max_depth - 1)
+            for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(x, max_depth - 1) for x in value)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), max_depth - 1)
+    return size
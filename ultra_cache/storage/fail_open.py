@@ -0,0 +1,215 @@
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from collections.abc import Mapping, Sequence
+import logging
+from typing import TypeVar, Union
+
+from ultra_cache.circuit_breaker import CircuitBreaker
+from ultra_cache.instrumentation import (
+    ERROR,
+    SHORT_CIRCUITED,
+    TIMEOUT,
+    Instrumentation,
+)
+from ultra_cache.serializers import Serializer
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+
+K = TypeVar("K")
+V = TypeVar("V")
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+
+class FailOpenStorage(BaseStorage):
+    """Keeps a slow or failing `storage`, e.g. a `RedisStorage`, from slowing
+    down or failing requests.
+
+    Reads taking longer than `get_timeout` seconds or raising are treated as
+    misses, writes taking longer than `save_timeout` or raising are dropped,
+    so the endpoint is computed and served as if there was no cache. Locks
+    that cannot be taken are reported as not acquired.
+
+    Failures count towards `breaker`, once it opens the storage is not called
+    at all until a probe succeeds. Fallbacks and breaker states are reported
+    to `instrumentation` under `name`. Deletes, clears and invalidations are
+    passed through as they are, silently skipping them would leave outdated
+    entries behind.
+    """
+
+    def __init__(
+        self,
+        storage: BaseStorage,
+        get_timeout: Union[int, float, None] = 0.1,
+        save_timeout: Union[int, float, None] = 0.5,
+        breaker: Union[CircuitBreaker, None] = None,
+        instrumentation: Union[Instrumentation, None] = None,
+        name: Union[str, None] = None,
+    ) -> None:
+        self.storage = storage
+        self.get_timeout = get_timeout
+        self.save_timeout = save_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.instrumentation = instrumentation or Instrumentation()
+        self.name = name or type(storage).__name__
+
+        self.timeouts = 0
+        self.errors = 0
+        self.short_circuited = 0
+        self._state = self.breaker.state
+        self.instrumentation.record_breaker_state(self.name, self._state)
+
+    @property
+    def stats(self) -> dict[str, Union[int, str]]:
+        return {
+            "state": self.breaker.state,
+            "trips": self.breaker.trips,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "short_circuited": self.short_circuited,
+        }
+
+    def _report_state(self) -> None:
+        state = self.breaker.state
+        if state != self._state:
+            self._state = state
+            self.instrumentation.record_breaker_state(self.name, state)
+
+    def _allow(self, operation: str) -> bool:
+        allowed = self.breaker.allow()
+        self._report_state()
+        if not allowed:
+            self.short_circuited += 1
+            self.instrumentation.record_fallback(self.name, operation, SHORT_CIRCUITED)
+        return allowed
+
+    def _failed(self, operation: str, reason: str) -> None:
+        if reason == TIMEOUT:
+            self.timeouts += 1
+        else:
+            self.errors += 1
+        self.breaker.record_failure()
+        self._report_state()
+        self.instrumentation.record_fallback(self.name, operation, reason)
+
+    def _succeeded(self) -> None:
+        self.breaker.record_success()
+        self._report_state()
+
+    async def _call(
+        self,
+        operation: str,
+        call: Callable[[], Awaitable[R]],
+        timeout: Union[int, float, None],
+        default: R,
+    ) -> R:
+        if not self._allow(operation):
+            return default
+        try:
+            result = await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s %s timed out after %ss", self.name, operation, timeout)
+            self._failed(operation, TIMEOUT)
+            return default
+        except Exception:
+            logger.warning("%s %s failed", self.name, operation, exc_info=True)
+            self._failed(operation, ERROR)
+            return default
+        self._succeeded()
+        return result
+
+    async def save(self, key: K, value: V, ttl: Union[int, float, None] = None) -> None:
+        await self.save_entry(key, CacheEntry(value, ttl=ttl))
+
+    async def get(self, key: K) -> Union[V, None]:
+        entry = await self.get_entry(key)
+        if entry is None or entry.stale:
+            return None
+        return entry.value
+
+    async def save_entry(
+        self,
+        key: K,
+        entry: CacheEntry[V],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        await self._call(
+            "save",
+            lambda: self.storage.save_entry(key, entry, serializer=serializer),
+            self.save_timeout,
+            None,
+        )
+
+    async def get_entry(
+        self, key: K, serializer: Union[Serializer, None] = None
+    ) -> Union[CacheEntry[V], None]:
+        return await self._call(
+            "get",
+            lambda: self.storage.get_entry(key, serializer=serializer),
+            self.get_timeout,
+            None,
+        )
+
+    async def get_many(
+        self, keys: Sequence[K], serializer: Union[Serializer, None] = None
+    ) -> list[Union[CacheEntry[V], None]]:
+        return await self._call(
+            "get",
+            lambda: self.storage.get_many(keys, serializer=serializer),
+            self.get_timeout,
+            [None] * len(keys),
+        )
+
+    async def save_many(
+        self,
+        entries: Mapping[K, CacheEntry[V]],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        await self._call(
+            "save",
+            lambda: self.storage.save_many(entries, serializer=serializer),
+            self.save_timeout,
+            None,
+        )
+
+    async def delete(self, key: K) -> None:
+        await self.storage.delete(key)
+
+    async def delete_many(self, keys: Sequence[K]) -> None:
+        await self.storage.delete_many(keys)
+
+    async def clear(self) -> None:
+        await self.storage.clear()
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        return await self.storage.invalidate_pattern(pattern)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        return await self.storage.invalidate_tags(tags)
+
+    @asynccontextmanager
+    async def lock(
+        self, key: K, timeout: Union[int, float, None] = None
+    ) -> AsyncIterator[bool]:
+        stack = AsyncExitStack()
+        acquired = False
+        if self._allow("lock"):
+            try:
+                acquired = await stack.enter_async_context(
+                    self.storage.lock(key, timeout=timeout)
+                )
+            except Exception:
+                logger.warning("%s lock failed", self.name, exc_info=True)
+                self._failed("lock", ERROR)
+            else:
+                self._succeeded()
+        try:
+            yield acquired
+        finally:
+            try:
+                await stack.aclose()
+            except Exception:
+                # the lock expires on its own
+                logger.warning("%s unlock failed", self.name, exc_info=True)
+                self._failed("unlock", ERROR)
@@ -1,8 +1,14 @@
-from ultra_cache.storage.base import BaseStorage
-from datetime import timedelta
-from typing import TypeVar, Union
-
-from ultra_cache.utils import utc_now
+from ultra_cache.compression import Compression
+from ultra_cache.serializers import PickleSerializer, Serializer
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+from ultra_cache.storage.eviction import EvictionPolicy, estimate_size, get_policy
+from collections.abc import Callable, Iterable
+import fnmatch
+import heapq
+import itertools
+import re
+import time
+from typing import Any, NamedTuple, TypeVar, Union
 
 
 K = TypeVar("K")
@@ -10,36 +16,278 @@ V = TypeVar("V")
 T = TypeVar("T")
 
 
+class _Metadata(NamedTuple):
+    stale_ttl: Union[int, float, None]
+    etag: Union[str, None]
+    content_type: Union[str, None]
+    tags: tuple[str, ...]
+    compute_time: Union[float, None]
+
+
 class InMemoryStorageItem:
-    def __init__(self, data: T, ttl: Union[int, float, None] = None) -> None:
-        self._data = data
-        self._ttl = ttl
-        self._start = utc_now()
+    """A stored value timed on the monotonic clock.
+
+    Checking `time.monotonic() - start` against the ttl is all a lookup has
+    to do, unaffected by wall-clock adjustments. Deadlines are derived rather
+    than stored and the metadata most items come without shares a single
+    optional field, so that an item takes as little memory as possible.
+    """
+
+    __slots__ = ("data", "ttl", "start", "size", "meta")
+
+    def __init__(
+        self,
+        data: T,
+        ttl: Union[int, float, None] = None,
+        stale_ttl: Union[int, float, None] = None,
+        created_at: Union[float, None] = None,
+        etag: Union[str, None] = None,
+        content_type: Union[str, None] = None,
+        tags: tuple[str, ...] = (),
+        compute_time: Union[float, None] = None,
+    ) -> None:
+        self.data = data
+        self.ttl = ttl
+        self.start = time.monotonic()
+        if created_at is not None:
+            self.start -= max(0.0, time.time() - created_at)
+        self.size = 0
+        self.meta: Union[_Metadata, None] = None
+        if stale_ttl or etag or content_type or tags or compute_time:
+            self.meta = _Metadata(stale_ttl, etag, content_type, tags, compute_time)
 
     def __str__(self) -> str:
-        return f"InMemoryStorageItem(date={self._data}, expired={self.expired})"
+        return f"InMemoryStorageItem(date={self.data}, expired={self.expired})"
+
+    @property
+    def tags(self) -> tuple[str, ...]:
+        return () if self.meta is None else self.meta.tags
+
+    @property
+    def expires_at(self) -> Union[float, None]:
+        if self.ttl is None:
+            return None
+        return self.start + self.ttl
+
+    @property
+    def evict_at(self) -> Union[float, None]:
+        if self.ttl is None:
+            return None
+        if self.meta is None or not self.meta.stale_ttl:
+            return self.start + self.ttl
+        return self.start + self.ttl + self.meta.stale_ttl
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.start
 
     @property
     def expired(self) -> bool:
-        if self._ttl is None:
-            return False
+        return self.ttl is not None and time.monotonic() - self.start > self.ttl
 
-        return (utc_now() - self._start) > timedelta(seconds=self._ttl)
+    @property
+    def evictable(self) -> bool:
+        evict_at = self.evict_at
+        return evict_at is not None and time.monotonic() > evict_at
 
     @property
     def value(self) -> Union[T, None]:
         if self.expired:
             return None
 
-        return self._data
+        return self.data
+
+    def to_entry(self, now: float) -> Union[CacheEntry[T], None]:
+        evict_at = self.evict_at
+        if evict_at is not None and now > evict_at:
+            return None
+
+        entry = CacheEntry(
+            self.data, ttl=self.ttl, created_at=time.time() - (now - self.start)
+        )
+        meta = self.meta
+        if meta is not None:
+            entry.stale_ttl = meta.stale_ttl
+            entry.etag = meta.etag
+            entry.content_type = meta.content_type
+            entry.tags = meta.tags
+            entry.compute_time = meta.compute_time
+        return entry
+
+    @property
+    def entry(self) -> Union[CacheEntry[T], None]:
+        return self.to_entry(time.monotonic())
 
 
 class InMemoryStorage(BaseStorage):
-    def __init__(self) -> None:
+    # upper bound of expired entries dropped by a single save, purging on the
+    # write path is enough to keep the storage from growing
+    EXPIRE_BATCH_SIZE = 32
+
+    def __init__(
+        self,
+        max_entries: Union[int, None] = None,
+        max_bytes: Union[int, None] = None,
+        eviction: Union[str, EvictionPolicy] = "lru",
+        sizeof: Callable[[Any], int] = estimate_size,
+        serializer: Union[Serializer, None] = None,
+        compression: Union[Compression, None] = None,
+    ) -> None:
         self.storage: dict[K, InMemoryStorageItem[V]] = {}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        # values are kept as Python objects unless a serializer is given,
+        # compressing requires them to be serialized first
+        if compression is not None and serializer is None:
+            serializer = PickleSerializer()
+        self.serializer = serializer
+        self.compression = compression
+        self.policy: Union[EvictionPolicy, None] = None
+        if max_entries is not None or max_bytes is not None:
+            self.policy = get_policy(eviction)
+
+        self.nbytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+        # (evict_at, sequence, key) of items with a ttl, lazily cleaned up
+        self._expiry: list[tuple[float, int, K]] = []
+        self._sequence = itertools.count()
+        # tag -> keys of the items saved with it
+        self._tags: dict[str, set[K]] = {}
+
+    def __len__(self) -> int:
+        return len(self.storage)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self.storage),
+            "nbytes": self.nbytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejections": self.rejections,
+        }
+
+    def _unindex(self, key: K, item: InMemoryStorageItem) -> None:
+        for tag in item.tags:
+            keys = self._tags.get(tag, None)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _remove(self, key: K) -> None:
+        item = self.storage.pop(key, None)
+        if item is not None:
+            self.nbytes -= item.size
+            if item.tags:
+                self._unindex(key, item)
+        if self.policy is not None:
+            self.policy.remove(key)
+
+    def _over_budget(self, extra_entries: int, extra_bytes: int) -> bool:
+        if (
+            self.max_entries is not None
+            and len(self.storage) + extra_entries > self.max_entries
+        ):
+            return True
+        if self.max_bytes is not None and self.nbytes + extra_bytes > self.max_bytes:
+            return True
+        return False
+
+    def purge_expired(
+        self, limit: Union[int, None] = None, now: Union[float, None] = None
+    ) -> int:
+        """Drops items past their retention, oldest first, without scanning
+        the whole storage."""
+        if now is None:
+            now = time.monotonic()
+        purged = 0
+        while self._expiry and (limit is None or purged < limit):
+            evict_at, _, key = self._expiry[0]
+            if evict_at > now:
+                break
+
+            heapq.heappop(self._expiry)
+            item = self.storage.get(key, None)
+            # the key may have been overwritten or removed in the meantime
+            if item is not None and item.evict_at == evict_at:
+                self._remove(key)
+                self.expirations += 1
+                purged += 1
+        return purged
+
+    def _store(self, key: K, item: InMemoryStorageItem) -> None:
+        if self._expiry and self._expiry[0][0] <= item.start:
+            self.purge_expired(self.EXPIRE_BATCH_SIZE, item.start)
+
+        item.size = size = self.sizeof(item.data)
+        if self.policy is not None:
+            if key in self.storage:
+                self._remove(key)
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                # would not fit even into an empty storage
+                self.rejections += 1
+                return
+
+            while self.storage and self._over_budget(1, size):
+                victim = self.policy.victim(key)
+                if victim == key:
+                    self.rejections += 1
+                    return
+                self._remove(victim)
+                self.evictions += 1
+
+            self.policy.insert(key)
+        else:
+            previous = self.storage.get(key, None)
+            if previous is not None:
+                self.nbytes -= previous.size
+                if previous.tags:
+                    self._unindex(key, previous)
+
+        self.storage[key] = item
+        self.nbytes += size
+        for tag in item.tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        evict_at = item.evict_at
+        if evict_at is not None:
+            heapq.heappush(self._expiry, (evict_at, next(self._sequence), key))
+            if len(self._expiry) > 2 * len(self.storage) + self.EXPIRE_BATCH_SIZE:
+                self._rebuild_expiry()
+
+    def _rebuild_expiry(self) -> None:
+        # drops heap records left behind by overwritten keys, amortized O(1)
+        self._expiry = [
+            (item.evict_at, next(self._sequence), key)
+            for key, item in self.storage.items()
+            if item.evict_at is not None
+        ]
+        heapq.heapify(self._expiry)
+
+    def _encode(self, value: V, serializer: Union[Serializer, None]) -> Any:
+        if serializer is None:
+            return value
+
+        data = serializer.dumps(value)
+        if self.compression is not None:
+            data = self.compression.compress(data)
+        return data
+
+    def _decode(self, data: Any, serializer: Union[Serializer, None]) -> V:
+        if serializer is None:
+            return data
+
+        if self.compression is not None:
+            data = self.compression.decompress(data)
+        return serializer.loads(data)
 
     async def save(self, key: K, value: V, ttl: Union[int, float, None] = None) -> None:
-        self.storage[key] = InMemoryStorageItem(value, ttl)
+        self._store(key, InMemoryStorageItem(self._encode(value, self.serializer), ttl))
 
     async def get(self, key: K) -> Union[V, None]:
         item = self.storage.get(key, None)
@@ -47,7 +295,81 @@ class InMemoryStorage(BaseStorage):
         if item is None:
             return None
 
-        return item.value
+        if self.policy is not None:
+            self.policy.access(key)
+
+        ttl = item.ttl
+        if ttl is not None and time.monotonic() - item.start > ttl:
+            return None
+
+        if self.serializer is not None:
+            return self._decode(item.data, self.serializer)
+        return item.data
+
+    async def save_entry(
+        self,
+        key: K,
+        entry: CacheEntry[V],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        value = self._encode(entry.value, serializer or self.serializer)
+        self._store(
+            key,
+            InMemoryStorageItem(
+                value,
+                entry.ttl,
+                entry.stale_ttl,
+                entry.created_at,
+                entry.etag,
+                entry.content_type,
+                entry.tags,
+                entry.compute_time,
+            ),
+        )
+
+    async def get_entry(
+        self, key: K, serializer: Union[Serializer, None] = None
+    ) -> Union[CacheEntry[V], None]:
+        item = self.storage.get(key, None)
+
+        if item is None:
+            return None
+
+        if self.policy is not None:
+            self.policy.access(key)
+
+        entry = item.to_entry(time.monotonic())
+        if entry is None:
+            self._remove(key)
+            return None
+
+        serializer = serializer or self.serializer
+        if serializer is not None:
+            entry.value = self._decode(entry.value, serializer)
+        return entry
+
+    async def delete(self, key: K) -> None:
+        self._remove(key)
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        matcher = re.compile(fnmatch.translate(pattern))
+        keys = [key for key in self.storage if matcher.match(str(key))]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in tags:
+            keys.update(self._tags.get(tag, ()))
+        for key in keys:
+            self._remove(key)
+        return len(keys)
 
     async def clear(self) -> None:
         self.storage = {}
+        self._expiry = []
+        self._tags = {}
+        self.nbytes = 0
+        if self.policy is not None:
+            self.policy.clear()
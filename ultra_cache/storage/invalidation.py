@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import suppress
+import logging
+from typing import Union
+from ultra_cache.storage.base import BaseStorage
+from ultra_cache.storage.redis import RedisStorage
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationListener:
+    """Evicts keys from `local` as soon as they change in `storage`, whichever
+    process changed them.
+
+    Listens on the invalidation channel of `storage`, which has to be set up
+    with one, e.g. to keep the L1 of a `TieredStorage` in sync across nodes.
+    Messages sent while disconnected are lost, so `local` is flushed whenever
+    the connection drops and again once the subscription is back.
+    """
+
+    def __init__(
+        self,
+        storage: RedisStorage,
+        local: BaseStorage,
+        reconnect_delay: Union[int, float] = 1,
+    ) -> None:
+        if storage.invalidation_channel is None:
+            raise ValueError("storage has no invalidation_channel to listen on")
+        self.storage = storage
+        self.local = local
+        self.reconnect_delay = reconnect_delay
+        self.invalidations = 0
+        self.reconnects = 0
+        self.subscribed: Union[asyncio.Event, None] = None
+        self._task: Union[asyncio.Task, None] = None
+
+    async def start(self) -> None:
+        """Starts listening in the background, does not wait for Redis."""
+        if self._task is None:
+            self.subscribed = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _handle(self, data: bytes) -> None:
+        node_id, separator, key = data.decode().partition(":")
+        if node_id == self.storage.node_id:
+            # our own write, `local` is up to date already
+            return
+
+        self.invalidations += 1
+        if separator:
+            await self.local.delete(key)
+        else:
+            await self.local.clear()
+
+    async def _listen(self) -> None:
+        pubsub = self.storage.redis.pubsub()
+        try:
+            await pubsub.subscribe(self.storage.invalidation_channel)
+            await self.local.clear()
+            self.subscribed.set()
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message is not None and message["type"] == "message":
+                    await self._handle(message["data"])
+        finally:
+            self.subscribed.clear()
+            await pubsub.aclose()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning(
+                    "Lost the invalidation channel, reconnecting", exc_info=True
+                )
+                self.reconnects += 1
+                await self.local.clear()
+                await asyncio.sleep(self.reconnect_delay)
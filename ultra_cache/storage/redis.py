@@ -1,32 +1,284 @@
+from contextlib import asynccontextmanager, suppress
+from collections.abc import AsyncIterator, Iterable, Mapping, Sequence
+import math
+import re
+import time
 from typing import TypeVar, Union
-from ultra_cache.storage.base import BaseStorage
+import uuid
+from ultra_cache.compression import Compression
+from ultra_cache.serializers import JsonSerializer, Serializer
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+from ultra_cache.storage.codec import dump_entry, load_entry
 from redis import asyncio as redis
+from redis.asyncio.cluster import RedisCluster
+from redis.exceptions import LockError
 
 K = TypeVar("K")
 V = TypeVar("V")
 
 
+def _escape_glob(value: str) -> str:
+    return re.sub(r"([*?\[\]\\])", r"\\\1", value)
+
+
+# adds ARGV[1] to the tag set KEYS[1], a sorted set scored by the time in ms
+# the member is evicted at, ARGV[2] is its retention in ms, empty when it never
+# expires, and ARGV[3] the time now. Evicted members are dropped on the way and
+# the set lives as long as its longest-lived member, counted from now so that
+# clocks of clients and server need not agree.
+_ADD_TO_TAG = """
+local now = tonumber(ARGV[3])
+local score = '+inf'
+if ARGV[2] ~= '' then
+    score = now + tonumber(ARGV[2])
+end
+redis.call('ZADD', KEYS[1], score, ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[3])
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+local evict_at = tonumber(last[2])
+if evict_at == nil or evict_at == math.huge then
+    redis.call('PERSIST', KEYS[1])
+else
+    redis.call('PEXPIRE', KEYS[1], math.max(1, evict_at - now))
+end
+"""
+
+
 class RedisStorage(BaseStorage):
-    def __init__(self, redis: redis.Redis, prefix: str = "ultra-cache"):
+    """Stores serialized entries, `redis` must not decode responses.
+
+    `redis` may be a `RedisCluster`, entries are then spread over its slots,
+    those whose key shares a `{hash tag}` in the same slot.
+
+    With an `invalidation_channel`, every write, delete and clear is announced
+    on that pub/sub channel so that in-process copies elsewhere can be evicted,
+    see `InvalidationListener`.
+    """
+
+    def __init__(
+        self,
+        redis: Union[redis.Redis, RedisCluster],
+        prefix: str = "ultra-cache",
+        lock_ttl: Union[int, float] = 30,
+        serializer: Union[Serializer, None] = None,
+        compression: Union[Compression, None] = None,
+        invalidation_channel: Union[str, None] = None,
+        batch_size: int = 500,
+    ):
         self.redis = redis
         self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.serializer = serializer or JsonSerializer()
+        self.compression = compression
+        self.invalidation_channel = invalidation_channel
+        # keys scanned and unlinked per round-trip by clear and invalidations
+        self.batch_size = batch_size
+        # tells listeners which messages this instance sent itself
+        self.node_id = uuid.uuid4().hex
 
     @classmethod
     def from_url(
-        cls, connection_string: str, prefix: str = "ultra-cache"
+        cls,
+        connection_string: str,
+        prefix: str = "ultra-cache",
+        serializer: Union[Serializer, None] = None,
+        compression: Union[Compression, None] = None,
+        invalidation_channel: Union[str, None] = None,
     ) -> "RedisStorage":
-        return cls(redis=redis.from_url(connection_string), prefix=prefix)
+        return cls(
+            redis=redis.from_url(connection_string),
+            prefix=prefix,
+            serializer=serializer,
+            compression=compression,
+            invalidation_channel=invalidation_channel,
+        )
+
+    def invalidation_message(self, key: Union[K, None] = None) -> bytes:
+        """`node_id:key`, or only `node_id` when everything was cleared."""
+        if key is None:
+            return self.node_id.encode()
+        return f"{self.node_id}:{key}".encode()
 
     async def save(self, key: K, value: V, ttl: Union[int, float, None] = None) -> None:
-        full_key = f"{self.prefix}:{key}"
-        await self.redis.set(full_key, value, ex=ttl)
+        await self.save_entry(key, CacheEntry(value, ttl=ttl))
 
     async def get(self, key: K) -> Union[V, None]:
+        entry = await self.get_entry(key)
+        if entry is None or entry.stale:
+            return None
+        return entry.value
+
+    async def save_entry(
+        self,
+        key: K,
+        entry: CacheEntry[V],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        await self.save_many({key: entry}, serializer=serializer)
+
+    async def get_entry(
+        self, key: K, serializer: Union[Serializer, None] = None
+    ) -> Union[CacheEntry[V], None]:
         full_key = f"{self.prefix}:{key}"
-        value = await self.redis.get(full_key)
-        return value
+        raw = await self.redis.get(full_key)
+        if raw is None:
+            return None
+        return load_entry(raw, serializer or self.serializer, self.compression)
+
+    async def get_many(
+        self, keys: Sequence[K], serializer: Union[Serializer, None] = None
+    ) -> list[Union[CacheEntry[V], None]]:
+        if not keys:
+            return []
+        serializer = serializer or self.serializer
+        full_keys = [f"{self.prefix}:{key}" for key in keys]
+        if isinstance(self.redis, RedisCluster):
+            # MGET cannot span slots, this splits it per node
+            raws = await self.redis.mget_nonatomic(full_keys)
+        else:
+            raws = await self.redis.mget(full_keys)
+        return [
+            None if raw is None else load_entry(raw, serializer, self.compression)
+            for raw in raws
+        ]
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    async def save_many(
+        self,
+        entries: Mapping[K, CacheEntry[V]],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        serializer = serializer or self.serializer
+        commands = []
+        for key, entry in entries.items():
+            retention = entry.retention
+            commands.append(
+                (
+                    f"{self.prefix}:{key}",
+                    dump_entry(entry, serializer, self.compression),
+                    None if retention is None else math.ceil(retention),
+                    entry.tags,
+                )
+            )
+
+        if len(commands) == 1 and self.invalidation_channel is None:
+            full_key, data, ex, tags = commands[0]
+            if not tags:
+                await self.redis.set(full_key, data, ex=ex)
+                return
+
+        now = int(time.time() * 1000)
+        # a single round-trip, without the cost of a transaction
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for full_key, data, ex, tags in commands:
+                pipe.set(full_key, data, ex=ex)
+                for tag in tags:
+                    pipe.eval(
+                        _ADD_TO_TAG,
+                        1,
+                        self._tag_key(tag),
+                        full_key,
+                        "" if ex is None else ex * 1000,
+                        now,
+                    )
+            if self.invalidation_channel is not None:
+                for key in entries:
+                    pipe.publish(
+                        self.invalidation_channel, self.invalidation_message(key)
+                    )
+            await pipe.execute()
+
+    async def delete_many(self, keys: Sequence[K]) -> None:
+        if not keys:
+            return
+        full_keys = [f"{self.prefix}:{key}" for key in keys]
+        if self.invalidation_channel is None:
+            await self.redis.delete(*full_keys)
+            return
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(*full_keys)
+            for key in keys:
+                pipe.publish(self.invalidation_channel, self.invalidation_message(key))
+            await pipe.execute()
+
+    async def delete(self, key: K) -> None:
+        await self.delete_many([key])
+
+    async def _unlink(self, full_keys: list[bytes], announce: bool = True) -> int:
+        """UNLINK frees memory in the background, unlike DEL."""
+        if not announce or self.invalidation_channel is None:
+            return await self.redis.unlink(*full_keys)
+
+        prefix_length = len(self.prefix) + 1
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.unlink(*full_keys)
+            for full_key in full_keys:
+                pipe.publish(
+                    self.invalidation_channel,
+                    self.invalidation_message(full_key[prefix_length:].decode()),
+                )
+            unlinked, *_ = await pipe.execute()
+        return unlinked
+
+    async def _unlink_matching(self, pattern: str, announce: bool = True) -> int:
+        # SCAN walks the keyspace in small steps, KEYS would block the server
+        deleted = 0
+        batch: list[bytes] = []
+        async for full_key in self.redis.scan_iter(
+            match=pattern, count=self.batch_size
+        ):
+            batch.append(full_key)
+            if len(batch) >= self.batch_size:
+                deleted += await self._unlink(batch, announce)
+                batch = []
+        if batch:
+            deleted += await self._unlink(batch, announce)
+        return deleted
 
     async def clear(self) -> None:
-        keys = await self.redis.keys(f"{self.prefix}:*")
-        if keys:
-            await self.redis.delete(*keys)
+        await self._unlink_matching(f"{_escape_glob(self.prefix)}:*", announce=False)
+        if self.invalidation_channel is not None:
+            await self.redis.publish(
+                self.invalidation_channel, self.invalidation_message()
+            )
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        return await self._unlink_matching(f"{_escape_glob(self.prefix)}:{pattern}")
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        deleted = 0
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            batch: list[bytes] = []
+            async for full_key, _ in self.redis.zscan_iter(
+                tag_key, count=self.batch_size
+            ):
+                batch.append(full_key)
+                if len(batch) >= self.batch_size:
+                    deleted += await self._unlink(batch)
+                    batch = []
+            if batch:
+                deleted += await self._unlink(batch)
+            await self.redis.unlink(tag_key)
+        return deleted
+
+    @asynccontextmanager
+    async def lock(
+        self, key: K, timeout: Union[int, float, None] = None
+    ) -> AsyncIterator[bool]:
+        # lock_ttl bounds how long a crashed holder can block other processes
+        lock = self.redis.lock(
+            f"{self.prefix}:lock:{key}",
+            timeout=self.lock_ttl,
+            blocking_timeout=timeout,
+        )
+        acquired = await lock.acquire()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with suppress(LockError):
+                    await lock.release()
@@ -0,0 +1,193 @@
+import asyncio
+import bisect
+from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator, Iterable, Mapping, Sequence
+import hashlib
+from typing import TypeVar, Union
+
+from ultra_cache.serializers import Serializer
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+def hash_tag(key: Union[bytes, str]) -> bytes:
+    """The part of `key` that decides where it is stored.
+
+    As in Redis Cluster, keys containing a non-empty `{...}` are placed by
+    what is between the first braces only, so that related keys end up
+    together.
+    """
+    key = key if isinstance(key, bytes) else str(key).encode()
+    start = key.find(b"{")
+    if start != -1:
+        end = key.find(b"}", start + 1)
+        if end > start + 1:
+            return key[start + 1 : end]
+    return key
+
+
+def _point(data: bytes) -> int:
+    # hash() differs between processes, placement must not
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of keys to nodes.
+
+    Every node is placed on the ring `replicas` times, a key belongs to the
+    first node found clockwise from it. Adding or removing one of `n` nodes
+    moves only about `1/n` of the keys.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 160) -> None:
+        self.replicas = replicas
+        self._points: list[int] = []
+        self._nodes: list[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(self._points) // self.replicas
+
+    def add(self, node: str) -> None:
+        for replica in range(self.replicas):
+            point = _point(f"{node}#{replica}".encode())
+            i = bisect.bisect(self._points, point)
+            self._points.insert(i, point)
+            self._nodes.insert(i, node)
+
+    def remove(self, node: str) -> None:
+        kept = [(p, n) for p, n in zip(self._points, self._nodes) if n != node]
+        self._points = [p for p, _ in kept]
+        self._nodes = [n for _, n in kept]
+
+    def get(self, key: Union[bytes, str]) -> str:
+        if not self._points:
+            raise LookupError("The ring has no nodes")
+        i = bisect.bisect(self._points, _point(hash_tag(key)))
+        return self._nodes[i % len(self._nodes)]
+
+
+class ShardedStorage(BaseStorage):
+    """Spreads entries over several storages, e.g. a `RedisStorage` per node.
+
+    Keys are placed on `shards` with a `HashRing`, by name when given as a
+    mapping or by position otherwise, so shards are best only appended to.
+    Bulk operations are split per shard and run concurrently, `clear` and
+    invalidations run on every shard at once.
+    """
+
+    def __init__(
+        self,
+        shards: Union[Mapping[str, BaseStorage], Sequence[BaseStorage]],
+        replicas: int = 160,
+    ) -> None:
+        if not isinstance(shards, Mapping):
+            shards = {str(i): shard for i, shard in enumerate(shards)}
+        self.shards: dict[str, BaseStorage] = dict(shards)
+        self.ring = HashRing(self.shards, replicas=replicas)
+
+    def add_shard(self, name: str, shard: BaseStorage) -> None:
+        self.shards[name] = shard
+        self.ring.add(name)
+
+    def remove_shard(self, name: str) -> BaseStorage:
+        self.ring.remove(name)
+        return self.shards.pop(name)
+
+    def shard_for(self, key: K) -> BaseStorage:
+        return self.shards[self.ring.get(key if isinstance(key, bytes) else str(key))]
+
+    def _group(self, keys: Iterable[K]) -> dict[str, list[int]]:
+        """Positions of `keys` per shard name."""
+        groups: dict[str, list[int]] = {}
+        for i, key in enumerate(keys):
+            name = self.ring.get(key if isinstance(key, bytes) else str(key))
+            groups.setdefault(name, []).append(i)
+        return groups
+
+    async def save(self, key: K, value: V, ttl: Union[int, float, None] = None) -> None:
+        await self.shard_for(key).save(key, value, ttl)
+
+    async def get(self, key: K) -> Union[V, None]:
+        return await self.shard_for(key).get(key)
+
+    async def save_entry(
+        self,
+        key: K,
+        entry: CacheEntry[V],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        await self.shard_for(key).save_entry(key, entry, serializer=serializer)
+
+    async def get_entry(
+        self, key: K, serializer: Union[Serializer, None] = None
+    ) -> Union[CacheEntry[V], None]:
+        return await self.shard_for(key).get_entry(key, serializer=serializer)
+
+    async def delete(self, key: K) -> None:
+        await self.shard_for(key).delete(key)
+
+    async def get_many(
+        self, keys: Sequence[K], serializer: Union[Serializer, None] = None
+    ) -> list[Union[CacheEntry[V], None]]:
+        groups = self._group(keys)
+        found = await asyncio.gather(
+            *(
+                self.shards[name].get_many([keys[i] for i in positions], serializer)
+                for name, positions in groups.items()
+            )
+        )
+        entries: list[Union[CacheEntry[V], None]] = [None] * len(keys)
+        for positions, shard_entries in zip(groups.values(), found):
+            for i, entry in zip(positions, shard_entries):
+                entries[i] = entry
+        return entries
+
+    async def save_many(
+        self,
+        entries: Mapping[K, CacheEntry[V]],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        keys = list(entries)
+        await asyncio.gather(
+            *(
+                self.shards[name].save_many(
+                    {keys[i]: entries[keys[i]] for i in positions}, serializer
+                )
+                for name, positions in self._group(keys).items()
+            )
+        )
+
+    async def delete_many(self, keys: Sequence[K]) -> None:
+        await asyncio.gather(
+            *(
+                self.shards[name].delete_many([keys[i] for i in positions])
+                for name, positions in self._group(keys).items()
+            )
+        )
+
+    async def clear(self) -> None:
+        await asyncio.gather(*(shard.clear() for shard in self.shards.values()))
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        deleted = await asyncio.gather(
+            *(shard.invalidate_pattern(pattern) for shard in self.shards.values())
+        )
+        return sum(deleted)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        deleted = await asyncio.gather(
+            *(shard.invalidate_tags(tags) for shard in self.shards.values())
+        )
+        return sum(deleted)
+
+    @asynccontextmanager
+    async def lock(
+        self, key: K, timeout: Union[int, float, None] = None
+    ) -> AsyncIterator[bool]:
+        async with self.shard_for(key).lock(key, timeout=timeout) as acquired:
+            yield acquired
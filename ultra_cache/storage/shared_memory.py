@@ -0,0 +1,302 @@
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+import fnmatch
+import hashlib
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from typing import TypeVar, Union
+import zlib
+
+from ultra_cache.compression import Compression
+from ultra_cache.serializers import JsonSerializer, Serializer
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+from ultra_cache.storage.codec import dump_entry, load_entry, load_metadata
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+MAGIC = b"ucshm\x01"
+# magic, slots, slot size, ways
+_FILE_HEADER = struct.Struct("<6sQII")
+_FILE_HEADER_SIZE = 64
+# checksum, key hash, evict at, created at, key length, data length, the
+# checksum covers everything after it, up to the end of the data
+_SLOT_HEADER = struct.Struct("<IQddII")
+_CHECKSUM = struct.Struct("<I")
+
+
+def _default_path(name: str) -> str:
+    # tmpfs, the file never reaches a disk
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, name)
+
+
+def _key_bytes(key: K) -> bytes:
+    return key if isinstance(key, bytes) else str(key).encode()
+
+
+def _key_hash(key: bytes) -> int:
+    # hash() differs between processes
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class SharedMemoryStorage(BaseStorage):
+    """Stores serialized entries in a memory-mapped file, shared by every
+    process on the host that opens the same `path`, e.g. all workers of a
+    server.
+
+    The file holds a hash table of `slots` fixed-size slots of `slot_size`
+    bytes, grouped in sets of `ways`. A key can only live in its set, which
+    bounds both lookups and capacity: when its set is full, a save evicts the
+    entry of the set that expires first. Entries larger than a slot are not
+    cached.
+
+    Reads take no lock, each slot carries a checksum so that reads racing a
+    write are detected and treated as misses. Writes to a set are serialized
+    across processes with POSIX record locks where available.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike, None] = None,
+        name: str = "ultra-cache",
+        slots: int = 16_384,
+        slot_size: int = 4096,
+        ways: int = 8,
+        serializer: Union[Serializer, None] = None,
+        compression: Union[Compression, None] = None,
+    ) -> None:
+        if slot_size <= _SLOT_HEADER.size:
+            raise ValueError(f"slot_size must be above {_SLOT_HEADER.size} bytes")
+        if slots < ways or slots % ways:
+            raise ValueError("slots must be a multiple of ways")
+
+        self.path = os.fspath(path) if path is not None else _default_path(name)
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ways = ways
+        self.serializer = serializer or JsonSerializer()
+        self.compression = compression
+        # record locks do not exclude threads of the same process
+        self._thread_lock = threading.Lock()
+
+        size = _FILE_HEADER_SIZE + slots * slot_size
+        header = _FILE_HEADER.pack(MAGIC, slots, slot_size, ways)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # the first process to get here lays out the table
+            with self._locked(0, _FILE_HEADER_SIZE):
+                created = os.fstat(self._fd).st_size == 0
+                if created:
+                    # sparse, pages are only allocated once written to
+                    os.ftruncate(self._fd, size)
+                if os.fstat(self._fd).st_size != size:
+                    raise ValueError(self._layout_error())
+                self._map = mmap.mmap(self._fd, size)
+                if created:
+                    self._map[: len(header)] = header
+            if self._map[: len(header)] != header:
+                self._map.close()
+                raise ValueError(self._layout_error())
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _layout_error(self) -> str:
+        return (
+            f"{self.path} holds a table of another layout, remove it or open it "
+            "with the same slots, slot_size and ways"
+        )
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    @contextmanager
+    def _locked(self, start: int, length: int) -> Iterator[None]:
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    def _offset(self, slot: int) -> int:
+        return _FILE_HEADER_SIZE + slot * self.slot_size
+
+    def _set_of(self, key_hash: int) -> range:
+        first = (key_hash % (self.slots // self.ways)) * self.ways
+        return range(first, first + self.ways)
+
+    def _read_header(self, slot: int) -> tuple[int, int, float, float, int, int]:
+        return _SLOT_HEADER.unpack_from(self._map, self._offset(slot))
+
+    def _read(self, slot: int, key: Union[bytes, None] = None) -> Union[bytes, None]:
+        """The entry stored in `slot`, under `key` if given, unless the slot is
+        empty, expired, or being written to."""
+        offset = self._offset(slot)
+        checksum, _, evict_at, _, key_length, data_length = _SLOT_HEADER.unpack_from(
+            self._map, offset
+        )
+        if data_length == 0 or time.time() > evict_at:
+            return None
+        end = offset + _SLOT_HEADER.size + key_length + data_length
+        if end > offset + self.slot_size:
+            return None
+        raw = self._map[offset:end]
+        if zlib.crc32(memoryview(raw)[_CHECKSUM.size :]) != checksum:
+            return None
+        stored_key = raw[_SLOT_HEADER.size : _SLOT_HEADER.size + key_length]
+        if key is not None and stored_key != key:
+            return None
+        return raw[_SLOT_HEADER.size + key_length :]
+
+    def _find(self, key: bytes, key_hash: int) -> Union[int, None]:
+        for slot in self._set_of(key_hash):
+            if self._read_header(slot)[1] == key_hash and self._read(slot, key):
+                return slot
+        return None
+
+    def _write(self, slot: int, header: bytes, payload: bytes) -> None:
+        offset = self._offset(slot)
+        body = header[_CHECKSUM.size :] + payload
+        end = offset + _CHECKSUM.size + len(body)
+        self._map[offset + _CHECKSUM.size : end] = body
+        # last, a reader seeing it with older data sees a mismatch
+        _CHECKSUM.pack_into(self._map, offset, zlib.crc32(body))
+
+    def _clear_slot(self, slot: int) -> None:
+        offset = self._offset(slot)
+        self._map[offset : offset + _SLOT_HEADER.size] = bytes(_SLOT_HEADER.size)
+
+    def _victim(self, key_hash: int, key: bytes) -> int:
+        """The slot of `key`, else an empty or expired one, else the one
+        expiring first."""
+        now = time.time()
+        victim, victim_evict_at = -1, float("inf")
+        for slot in self._set_of(key_hash):
+            _, slot_hash, evict_at, _, _, data_length = self._read_header(slot)
+            if data_length == 0 or now > evict_at:
+                if victim_evict_at > -1:
+                    victim, victim_evict_at = slot, -1
+                continue
+            if slot_hash == key_hash and self._read(slot, key) is not None:
+                return slot
+            if victim == -1 or evict_at < victim_evict_at:
+                victim, victim_evict_at = slot, evict_at
+        return victim
+
+    def _store(self, key: K, entry: CacheEntry, serializer: Serializer) -> None:
+        key = _key_bytes(key)
+        key_hash = _key_hash(key)
+        data = dump_entry(entry, serializer, self.compression)
+        retention = entry.retention
+        evict_at = float("inf") if retention is None else entry.created_at + retention
+        header = _SLOT_HEADER.pack(
+            0, key_hash, evict_at, entry.created_at, len(key), len(data)
+        )
+
+        slots = self._set_of(key_hash)
+        offset = self._offset(slots[0])
+        with self._locked(offset, self.ways * self.slot_size):
+            if len(header) + len(key) + len(data) > self.slot_size:
+                # too large, at least do not keep serving an older value
+                slot = self._find(key, key_hash)
+                if slot is not None:
+                    self._clear_slot(slot)
+                return
+            self._write(self._victim(key_hash, key), header, key + data)
+
+    def _iter_entries(self) -> Iterator[tuple[int, bytes, bytes]]:
+        """Slot, key and encoded entry of everything stored."""
+        for slot in range(self.slots):
+            data = self._read(slot)
+            if data is None:
+                continue
+            key_length = self._read_header(slot)[4]
+            offset = self._offset(slot) + _SLOT_HEADER.size
+            yield slot, self._map[offset : offset + key_length], data
+
+    def _delete_slots(self, slots: Iterable[tuple[int, bytes]]) -> int:
+        deleted = 0
+        for slot, key in slots:
+            first = self._set_of(_key_hash(key))[0]
+            with self._locked(self._offset(first), self.ways * self.slot_size):
+                # may have been replaced since it was read
+                if self._read(slot, key) is not None:
+                    self._clear_slot(slot)
+                    deleted += 1
+        return deleted
+
+    async def save(self, key: K, value: V, ttl: Union[int, float, None] = None) -> None:
+        await self.save_entry(key, CacheEntry(value, ttl=ttl))
+
+    async def get(self, key: K) -> Union[V, None]:
+        entry = await self.get_entry(key)
+        if entry is None or entry.stale:
+            return None
+        return entry.value
+
+    async def save_entry(
+        self,
+        key: K,
+        entry: CacheEntry[V],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        self._store(key, entry, serializer or self.serializer)
+
+    async def get_entry(
+        self, key: K, serializer: Union[Serializer, None] = None
+    ) -> Union[CacheEntry[V], None]:
+        key = _key_bytes(key)
+        key_hash = _key_hash(key)
+        for slot in self._set_of(key_hash):
+            if self._read_header(slot)[1] != key_hash:
+                continue
+            data = self._read(slot, key)
+            if data is not None:
+                return load_entry(data, serializer or self.serializer, self.compression)
+        return None
+
+    async def delete(self, key: K) -> None:
+        key = _key_bytes(key)
+        key_hash = _key_hash(key)
+        slots = self._set_of(key_hash)
+        with self._locked(self._offset(slots[0]), self.ways * self.slot_size):
+            slot = self._find(key, key_hash)
+            if slot is not None:
+                self._clear_slot(slot)
+
+    async def clear(self) -> None:
+        with self._locked(_FILE_HEADER_SIZE, self.slots * self.slot_size):
+            for slot in range(self.slots):
+                self._clear_slot(slot)
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        match = re.compile(fnmatch.translate(pattern)).match
+        return self._delete_slots(
+            (slot, key)
+            for slot, key, _ in self._iter_entries()
+            if match(key.decode(errors="replace"))
+        )
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = set(tags)
+        return self._delete_slots(
+            (slot, key)
+            for slot, key, data in self._iter_entries()
+            if tags.intersection(load_metadata(data).get("g", ()))
+        )
@@ -0,0 +1,269 @@
+from collections.abc import Callable, Iterable
+import fnmatch
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import TypeVar, Union
+
+import anyio
+import anyio.to_thread
+
+from ultra_cache.compression import Compression
+from ultra_cache.serializers import JsonSerializer, Serializer
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+from ultra_cache.storage.codec import dump_entry, load_entry
+
+K = TypeVar("K")
+V = TypeVar("V")
+R = TypeVar("R")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    evict_at REAL
+);
+CREATE INDEX IF NOT EXISTS entries_evict_at ON entries (evict_at);
+CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL REFERENCES entries (key) ON DELETE CASCADE,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+"""
+
+
+class SQLiteStorage(BaseStorage):
+    """Stores serialized entries in a SQLite database on disk, which outlives
+    restarts and may grow larger than memory.
+
+    The database runs in WAL mode, so any number of processes can read while
+    one of them writes, and reads go through a memory map of up to `mmap_size`
+    bytes instead of read calls. Queries run in worker threads bounded by
+    `limiter`, off the event loop.
+
+    Entries past their retention are no longer returned and are deleted on
+    compaction, which also drops the oldest entries until the data fits in
+    `max_bytes`. It runs every `compact_every` saves, or on `compact()`.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        max_bytes: Union[int, None] = None,
+        mmap_size: int = 256 * 1024 * 1024,
+        compact_every: int = 1000,
+        busy_timeout: Union[int, float] = 5,
+        limiter: Union[anyio.CapacityLimiter, int, None] = 4,
+        serializer: Union[Serializer, None] = None,
+        compression: Union[Compression, None] = None,
+    ) -> None:
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        self.mmap_size = mmap_size
+        self.compact_every = compact_every
+        self.busy_timeout = busy_timeout
+        if isinstance(limiter, int):
+            limiter = anyio.CapacityLimiter(limiter)
+        self.limiter = limiter
+        self.serializer = serializer or JsonSerializer()
+        self.compression = compression
+
+        # connections cannot be shared between threads, one per worker thread
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._saves = 0
+
+        connection = self._connection()
+        with connection:
+            connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            return connection
+
+        # autocommit, transactions are opened explicitly where needed
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        # only takes effect on a new database, lets compaction shrink the file
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("PRAGMA journal_mode = WAL")
+        # durable across crashes of the process, not of the host, fine for a cache
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        connection.execute("PRAGMA foreign_keys = ON")
+        self._local.connection = connection
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], R]) -> R:
+        # the clock is read by callers, on the event loop
+        return await anyio.to_thread.run_sync(
+            lambda: fn(self._connection()), limiter=self.limiter
+        )
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def _store(
+        self,
+        connection: sqlite3.Connection,
+        key: str,
+        entry: CacheEntry,
+        data: bytes,
+        now: float,
+    ) -> None:
+        retention = entry.retention
+        evict_at = None if retention is None else entry.created_at + retention
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # replacing the row drops its tags along with it
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            connection.execute(
+                "INSERT INTO entries (key, data, size, stored_at, evict_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, evict_at),
+            )
+            if entry.tags:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)",
+                    [(tag, key) for tag in entry.tags],
+                )
+
+    def _load(
+        self, connection: sqlite3.Connection, key: str, now: float
+    ) -> Union[bytes, None]:
+        row = connection.execute(
+            "SELECT data FROM entries "
+            "WHERE key = ? AND (evict_at IS NULL OR evict_at >= ?)",
+            (key, now),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _compact(self, connection: sqlite3.Connection, now: float) -> int:
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            removed = connection.execute(
+                "DELETE FROM entries WHERE evict_at < ?", (now,)
+            ).rowcount
+            if self.max_bytes is not None:
+                (total,) = connection.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                if total > self.max_bytes:
+                    # the newest entries that fit stay, running sum from the newest
+                    removed += connection.execute(
+                        "DELETE FROM entries WHERE key IN ("
+                        "  SELECT key FROM ("
+                        "    SELECT key, SUM(size) OVER ("
+                        "      ORDER BY stored_at DESC, key"
+                        "    ) AS kept FROM entries"
+                        "  ) WHERE kept > ?"
+                        ")",
+                        (self.max_bytes,),
+                    ).rowcount
+        if removed:
+            connection.execute("PRAGMA incremental_vacuum")
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    async def compact(self) -> int:
+        """Deletes expired entries, then the oldest ones over `max_bytes`,
+        returns how many were deleted."""
+        now = time.time()
+        return await self._run(lambda connection: self._compact(connection, now))
+
+    async def save(self, key: K, value: V, ttl: Union[int, float, None] = None) -> None:
+        await self.save_entry(key, CacheEntry(value, ttl=ttl))
+
+    async def get(self, key: K) -> Union[V, None]:
+        entry = await self.get_entry(key)
+        if entry is None or entry.stale:
+            return None
+        return entry.value
+
+    async def save_entry(
+        self,
+        key: K,
+        entry: CacheEntry[V],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        data = dump_entry(entry, serializer or self.serializer, self.compression)
+        now = time.time()
+        await self._run(
+            lambda connection: self._store(connection, str(key), entry, data, now)
+        )
+
+        self._saves += 1
+        if self._saves >= self.compact_every:
+            self._saves = 0
+            await self.compact()
+
+    async def get_entry(
+        self, key: K, serializer: Union[Serializer, None] = None
+    ) -> Union[CacheEntry[V], None]:
+        now = time.time()
+        data = await self._run(lambda connection: self._load(connection, str(key), now))
+        if data is None:
+            return None
+        return load_entry(data, serializer or self.serializer, self.compression)
+
+    async def delete(self, key: K) -> None:
+        await self._run(
+            lambda connection: connection.execute(
+                "DELETE FROM entries WHERE key = ?", (str(key),)
+            )
+        )
+
+    async def clear(self) -> None:
+        def _clear(connection: sqlite3.Connection) -> None:
+            connection.execute("DELETE FROM entries")
+            connection.execute("PRAGMA incremental_vacuum")
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        await self._run(_clear)
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        # GLOB treats brackets differently, match the way the other storages do
+        match = re.compile(fnmatch.translate(pattern)).match
+
+        def _invalidate(connection: sqlite3.Connection) -> int:
+            connection.create_function(
+                "ultra_cache_match", 1, lambda key: match(key) is not None
+            )
+            return connection.execute(
+                "DELETE FROM entries WHERE ultra_cache_match(key)"
+            ).rowcount
+
+        return await self._run(_invalidate)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        if not tags:
+            return 0
+        placeholders = ", ".join("?" * len(tags))
+        return await self._run(
+            lambda connection: (
+                connection.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    f"(SELECT key FROM tags WHERE tag IN ({placeholders}))",
+                    tags,
+                ).rowcount
+            )
+        )
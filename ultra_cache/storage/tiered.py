@@ -0,0 +1,169 @@
+from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator, Iterable, Mapping, Sequence
+from typing import TypeVar, Union
+from ultra_cache.serializers import Serializer
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+from ultra_cache.storage.inmemory import InMemoryStorage
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class TieredStorage(BaseStorage):
+    """Keeps recently used entries of `l2`, e.g. a `RedisStorage`, in process.
+
+    Reads go to `l1` first and fill it on `l2` hits, writes go to both. `l1`
+    holds whole entries as Python objects, so it must not serialize, and keeps
+    them for at most `l1_ttl` seconds to bound how long other processes'
+    writes to `l2` may go unnoticed.
+    """
+
+    def __init__(
+        self,
+        l2: BaseStorage,
+        l1: Union[BaseStorage, None] = None,
+        l1_ttl: Union[int, float, None] = 5,
+    ) -> None:
+        self.l1 = l1 if l1 is not None else InMemoryStorage(max_entries=10_000)
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> dict[str, Union[int, float]]:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        l2_lookups = lookups - self.l1_hits
+        return {
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "l1_hit_ratio": self.l1_hits / lookups if lookups else 0.0,
+            "l2_hit_ratio": self.l2_hits / l2_lookups if l2_lookups else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+
+    async def _fill_l1(self, key: K, entry: CacheEntry[V]) -> None:
+        ttl = self.l1_ttl
+        retention = entry.retention
+        if retention is not None:
+            # never keep an entry longer than the tier it came from
+            remaining = retention - entry.age
+            if remaining <= 0:
+                return
+            ttl = remaining if ttl is None else min(ttl, remaining)
+        # the entry itself is the value, tagged so that l1 can be invalidated
+        await self.l1.save_entry(key, CacheEntry(entry, ttl=ttl, tags=entry.tags))
+
+    async def save(self, key: K, value: V, ttl: Union[int, float, None] = None) -> None:
+        await self.save_entry(key, CacheEntry(value, ttl=ttl))
+
+    async def get(self, key: K) -> Union[V, None]:
+        entry = await self.get_entry(key)
+        if entry is None or entry.stale:
+            return None
+        return entry.value
+
+    async def save_entry(
+        self,
+        key: K,
+        entry: CacheEntry[V],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        await self.l2.save_entry(key, entry, serializer=serializer)
+        await self._fill_l1(key, entry)
+
+    async def get_entry(
+        self, key: K, serializer: Union[Serializer, None] = None
+    ) -> Union[CacheEntry[V], None]:
+        entry = await self.l1.get(key)
+        if entry is not None and not entry.stale:
+            self.l1_hits += 1
+            return entry
+
+        # a stale copy may have been refreshed in l2 by another process
+        fresher = await self.l2.get_entry(key, serializer=serializer)
+        if fresher is None:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.l1_hits += 1
+            return entry
+
+        self.l2_hits += 1
+        await self._fill_l1(key, fresher)
+        return fresher
+
+    async def get_many(
+        self, keys: Sequence[K], serializer: Union[Serializer, None] = None
+    ) -> list[Union[CacheEntry[V], None]]:
+        entries = [await self.l1.get(key) for key in keys]
+        pending = [i for i, entry in enumerate(entries) if entry is None or entry.stale]
+        self.l1_hits += len(keys) - len(pending)
+        if not pending:
+            return entries
+
+        fresher = await self.l2.get_many([keys[i] for i in pending], serializer)
+        for i, entry in zip(pending, fresher):
+            if entry is None:
+                if entries[i] is None:
+                    self.misses += 1
+                else:
+                    self.l1_hits += 1
+                continue
+
+            self.l2_hits += 1
+            await self._fill_l1(keys[i], entry)
+            entries[i] = entry
+        return entries
+
+    async def save_many(
+        self,
+        entries: Mapping[K, CacheEntry[V]],
+        serializer: Union[Serializer, None] = None,
+    ) -> None:
+        await self.l2.save_many(entries, serializer=serializer)
+        for key, entry in entries.items():
+            await self._fill_l1(key, entry)
+
+    async def delete_many(self, keys: Sequence[K]) -> None:
+        await self.l2.delete_many(keys)
+        await self.l1.delete_many(keys)
+
+    async def delete(self, key: K) -> None:
+        await self.l2.delete(key)
+        await self.l1.delete(key)
+
+    async def clear(self) -> None:
+        await self.l1.clear()
+        await self.l2.clear()
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        deleted = await self.l2.invalidate_pattern(pattern)
+        try:
+            await self.l1.invalidate_pattern(pattern)
+        except NotImplementedError:
+            await self.l1.clear()
+        return deleted
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        deleted = await self.l2.invalidate_tags(tags)
+        try:
+            await self.l1.invalidate_tags(tags)
+        except NotImplementedError:
+            # l1 cannot tell which of its entries are affected
+            await self.l1.clear()
+        return deleted
+
+    @asynccontextmanager
+    async def lock(
+        self, key: K, timeout: Union[int, float, None] = None
+    ) -> AsyncIterator[bool]:
+        async with self.l2.lock(key, timeout=timeout) as acquired:
+            yield acquired
@@ -0,0 +1,103 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import Executor
+import contextvars
+import time
+from typing import TypeVar, Union
+
+import anyio
+import anyio.to_thread
+
+R = TypeVar("R")
+
+
+class Saturated(RuntimeError):
+    """Raised instead of queueing a call once `max_queue` calls are waiting."""
+
+
+class SyncRunner:
+    """Runs sync endpoints in worker threads, apart from the rest of the app.
+
+    Threads are bounded by `limiter`, a `CapacityLimiter` or a number of
+    tokens, or come from a dedicated `executor`. Without either, anyio's
+    default limiter shared with FastAPI is used. Once `max_queue` calls wait
+    for a thread, further calls raise `Saturated`.
+
+    Time spent waiting for a thread and time spent running are tracked apart.
+    """
+
+    def __init__(
+        self,
+        limiter: Union[anyio.CapacityLimiter, int, None] = None,
+        executor: Union[Executor, None] = None,
+        max_queue: Union[int, None] = None,
+    ) -> None:
+        if limiter is not None and executor is not None:
+            raise ValueError("Pass either a limiter or an executor")
+        if isinstance(limiter, int):
+            limiter = anyio.CapacityLimiter(limiter)
+        self.limiter = limiter
+        self.executor = executor
+        self.max_queue = max_queue
+
+        self.in_flight = 0
+        self.calls = 0
+        self.rejected = 0
+        self.queue_seconds = 0.0
+        self.run_seconds = 0.0
+
+    @property
+    def capacity(self) -> int:
+        if self.executor is not None:
+            # ThreadPoolExecutor and ProcessPoolExecutor both keep it there
+            return getattr(self.executor, "_max_workers", 1)
+        limiter = self.limiter or anyio.to_thread.current_default_thread_limiter()
+        return int(limiter.total_tokens)
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.in_flight - self.capacity)
+
+    @property
+    def stats(self) -> dict[str, Union[int, float]]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "queue_seconds": self.queue_seconds,
+            "run_seconds": self.run_seconds,
+        }
+
+    async def run(self, fn: Callable[[], R]) -> R:
+        # the call would wait behind `queued` others
+        if self.max_queue is not None and (
+            self.in_flight - self.capacity >= self.max_queue
+        ):
+            self.rejected += 1
+            raise Saturated(f"{self.queued} calls are already waiting for a thread")
+
+        started = finished = 0.0
+
+        def _timed() -> R:
+            nonlocal started, finished
+            started = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                finished = time.perf_counter()
+
+        self.in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            if self.executor is not None:
+                loop = asyncio.get_running_loop()
+                context = contextvars.copy_context()
+                return await loop.run_in_executor(self.executor, context.run, _timed)
+            return await anyio.to_thread.run_sync(_timed, limiter=self.limiter)
+        finally:
+            self.in_flight -= 1
+            if started and finished:
+                self.calls += 1
+                self.queue_seconds += started - submitted
+                self.run_seconds += finished - started
@@ -1,5 +1,8 @@
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Union
 
 if sys.version_info[0] == 3 and sys.version_info[1] >= 11:
     from datetime import UTC
@@ -12,3 +15,20 @@ def utc_now():
         return datetime.utcnow()
     else:
         return datetime.now(UTC)
+
+
+@lru_cache(maxsize=1024)
+def http_date(timestamp: int) -> str:
+    """An IMF-fixdate, as used by Expires and Last-Modified."""
+    return formatdate(timestamp, usegmt=True)
+
+
+def parse_http_date(value: str) -> Union[float, None]:
+    """The timestamp of an HTTP date, or None when it is malformed."""
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
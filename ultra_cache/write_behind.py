@@ -0,0 +1,139 @@
+import asyncio
+from collections.abc import Callable, Hashable
+import logging
+from typing import Any, Union
+
+from ultra_cache.serializers import Serializer
+from ultra_cache.storage.base import BaseStorage, CacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehind:
+    """Saves entries in the background, off the response path.
+
+    Saves are coalesced per storage and key, only the latest entry of a key is
+    written, and flushed in batches through `save_many`. At most `max_size`
+    keys wait at a time, saves beyond that are dropped. Errors are logged and
+    counted, never raised. `drain` should be awaited on shutdown so pending
+    saves are not lost, `discard` called before invalidating entries so they
+    are not saved after all.
+    """
+
+    def __init__(self, max_size: int = 10_000, batch_size: int = 100) -> None:
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.saved = 0
+        self.dropped = 0
+        self.failed = 0
+        # (storage id, key) -> (storage, key, entry, serializer), in order
+        self._pending: dict[
+            tuple[int, Hashable],
+            tuple[BaseStorage, Hashable, CacheEntry, Union[Serializer, None]],
+        ] = {}
+        self._task: Union[asyncio.Task, None] = None
+        # the batch being saved, with a future resolved once it was
+        self._saving: Union[tuple[list[Any], asyncio.Future], None] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "depth": self.depth,
+            "saved": self.saved,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def submit(
+        self,
+        storage: BaseStorage,
+        key: Hashable,
+        entry: CacheEntry,
+        serializer: Union[Serializer, None] = None,
+    ) -> bool:
+        """Schedules a save, returns False when it was dropped."""
+        slot = (id(storage), key)
+        if slot not in self._pending and len(self._pending) >= self.max_size:
+            self.dropped += 1
+            return False
+
+        self._pending[slot] = (storage, key, entry, serializer)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return True
+
+    def pending(self, storage: BaseStorage, key: Hashable) -> Union[CacheEntry, None]:
+        """The entry waiting to be saved under `key`, so it can be served
+        before it reaches the storage."""
+        pending = self._pending.get((id(storage), key), None)
+        return None if pending is None else pending[2]
+
+    async def discard(
+        self,
+        storage: BaseStorage,
+        match: Union[Callable[[Hashable, CacheEntry], bool], None] = None,
+    ) -> int:
+        """Drops the pending saves to `storage` of the entries `match` accepts,
+        all of them without `match`. Waits for the batch being saved when it
+        holds such an entry. Returns how many saves were dropped."""
+
+        def _matches(pending: tuple) -> bool:
+            pending_storage, key, entry, _ = pending
+            return pending_storage is storage and (match is None or match(key, entry))
+
+        slots = [slot for slot, pending in self._pending.items() if _matches(pending)]
+        for slot in slots:
+            del self._pending[slot]
+
+        saving = self._saving
+        if saving is not None and any(_matches(pending) for pending in saving[0]):
+            await asyncio.shield(saving[1])
+        return len(slots)
+
+    async def _flush(self) -> None:
+        batch = []
+        for slot in list(self._pending)[: self.batch_size]:
+            batch.append(self._pending.pop(slot))
+
+        groups: dict[tuple[int, int], list[Any]] = {}
+        for storage, key, entry, serializer in batch:
+            groups.setdefault((id(storage), id(serializer)), []).append(
+                (storage, key, entry, serializer)
+            )
+        saved = asyncio.get_running_loop().create_future()
+        self._saving = (batch, saved)
+        try:
+            for group in groups.values():
+                storage, _, _, serializer = group[0]
+                try:
+                    await storage.save_many(
+                        {key: entry for _, key, entry, _ in group},
+                        serializer=serializer,
+                    )
+                except Exception:
+                    self.failed += len(group)
+                    logger.exception(
+                        "Saving %d entries in the background failed", len(group)
+                    )
+                else:
+                    self.saved += len(group)
+        finally:
+            self._saving = None
+            saved.set_result(None)
+
+    async def _run(self) -> None:
+        try:
+            while self._pending:
+                await self._flush()
+        finally:
+            self._task = None
+
+    async def drain(self) -> None:
+        """Waits until every pending save was attempted."""
+        while self._task is not None:
+            # a cancelled drain must not cancel the saves
+            await asyncio.shield(self._task)